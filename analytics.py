@@ -0,0 +1,221 @@
+import io
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import String, case, select, type_coerce
+from sqlalchemy.orm import Session
+from models import ReadSessionLocal, ArchivedTask, Section, Task, TaskEvent
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot
+except ImportError:  # charts are optional, the text table is always available
+    pyplot = None
+
+logger = logging.getLogger(__name__)
+
+# Days of burndown/cumulative flow and weeks of velocity shown by the analytics view
+ANALYTICS_DAYS = int(os.getenv('ANALYTICS_DAYS', '30'))
+ANALYTICS_WEEKS = int(os.getenv('ANALYTICS_WEEKS', '8'))
+# Rows of the text burndown table; days in between are skipped evenly
+ANALYTICS_TABLE_ROWS = int(os.getenv('ANALYTICS_TABLE_ROWS', '10'))
+
+# Index of each status in the status arrays and in ProjectAnalytics.flow
+STATUSES = ('todo', 'in_progress', 'done')
+TODO, IN_PROGRESS, DONE = range(len(STATUSES))
+# Event code for an open task archived with its section or project; it leaves the flow
+SHELVED = len(STATUSES)
+CYCLE_PERCENTILES = (50, 85, 95)
+
+@dataclass
+class ProjectHistory:
+    """Columnar task and status-event history of one project"""
+    task_ids: np.ndarray      # int64, sorted
+    created: np.ndarray       # datetime64[s], aligned with task_ids
+    event_task: np.ndarray    # int64
+    event_status: np.ndarray  # int8 index into STATUSES, or SHELVED
+    event_at: np.ndarray      # datetime64[s]
+
+@dataclass
+class ProjectAnalytics:
+    days: np.ndarray          # datetime64[D], oldest first
+    flow: np.ndarray          # tasks per status at the end of each day, shape (len(STATUSES), len(days))
+    week_ends: np.ndarray     # datetime64[D], last day of each velocity week
+    velocity: np.ndarray      # tasks moved to done per week
+    cycle_days: np.ndarray    # CYCLE_PERCENTILES of start-to-done time, in days
+    completed: int            # tasks behind cycle_days
+
+    @property
+    def remaining(self) -> np.ndarray:
+        """Burndown: open tasks at the end of each day"""
+        return self.flow[TODO] + self.flow[IN_PROGRESS]
+
+def _status_code(column):
+    """SQL expression mapping a status column to its STATUSES index; unknown statuses count as todo"""
+    return case({status: code for code, status in enumerate(STATUSES) if code != TODO}, value=column, else_=TODO)
+
+def _raw_time(column):
+    # Skip per-row datetime conversion: SQLite hands back the stored ISO text, which numpy
+    # parses in bulk; other drivers already return datetimes
+    return type_coerce(column, String)
+
+def _fetch(db: Session, statement) -> list:
+    """Raw DBAPI rows of statement, skipping the per-row Row objects of the result layer
+
+    Only for columns that need no result processing: integers, _status_code and _raw_time.
+    """
+    result = db.connection().execute(statement)
+    try:
+        return result.cursor.fetchall()
+    finally:
+        result.close()
+
+def _ints(rows: list, index: int, dtype=np.int64) -> np.ndarray:
+    return np.fromiter((row[index] for row in rows), dtype, len(rows))
+
+def _times(rows: list, index: int) -> np.ndarray:
+    return np.array([row[index] for row in rows], dtype='datetime64[us]').astype('datetime64[s]')
+
+def load_history(db: Session, project_id: int) -> ProjectHistory:
+    """Load hot and archived tasks plus their status events of a project in four queries
+
+    Only plain column values are fetched and converted to arrays in bulk. Tasks changed
+    before task_events existed have no events; their current status is taken as reached
+    at updated_at. Archived tasks that were not done leave the flow at archived_at.
+    """
+    tasks = _fetch(db, select(Task.id, _raw_time(Task.created_at), _status_code(Task.status),
+                              _raw_time(Task.updated_at))
+                   .join(Section, Task.section_id == Section.id)
+                   .where(Section.project_id == project_id))
+    tasks += _fetch(db, select(ArchivedTask.id, _raw_time(ArchivedTask.created_at), _status_code(ArchivedTask.status),
+                               _raw_time(ArchivedTask.updated_at))
+                    .where(ArchivedTask.project_id == project_id))
+    events = _fetch(db, select(TaskEvent.task_id, _status_code(TaskEvent.status), _raw_time(TaskEvent.at))
+                    .where(TaskEvent.project_id == project_id))
+    shelved = _fetch(db, select(ArchivedTask.id, _raw_time(ArchivedTask.archived_at))
+                     .where(ArchivedTask.project_id == project_id, ArchivedTask.status != 'done'))
+
+    task_ids, created, status, updated = _ints(tasks, 0), _times(tasks, 1), _ints(tasks, 2, np.int8), _times(tasks, 3)
+    event_task, event_status, event_at = _ints(events, 0), _ints(events, 1, np.int8), _times(events, 2)
+
+    # Events of tasks that no longer exist would leave tasks in the flow that were never created
+    known = np.isin(event_task, task_ids)
+    event_task, event_status, event_at = event_task[known], event_status[known], event_at[known]
+    legacy = (status != TODO) & ~np.isin(task_ids, event_task)
+    event_task = np.concatenate([event_task, task_ids[legacy]])
+    event_status = np.concatenate([event_status, status[legacy]])
+    event_at = np.concatenate([event_at, updated[legacy]])
+    event_task = np.concatenate([event_task, _ints(shelved, 0)])
+    event_status = np.concatenate([event_status, np.full(len(shelved), SHELVED, np.int8)])
+    event_at = np.concatenate([event_at, _times(shelved, 1)])
+
+    order = np.argsort(task_ids)
+    return ProjectHistory(task_ids[order], created[order], event_task, event_status, event_at)
+
+def compute_analytics(history: ProjectHistory, now: datetime = None, days: int = ANALYTICS_DAYS,
+                      weeks: int = ANALYTICS_WEEKS) -> ProjectAnalytics:
+    """Cumulative flow, burndown, weekly velocity and cycle-time percentiles, without Python loops"""
+    today = np.datetime64((now or datetime.now(timezone.utc)).replace(tzinfo=None), 'D')
+    day_labels = np.arange(today - days + 1, today + 1)
+    day_ends = (day_labels + 1).astype('datetime64[s]')
+
+    # Status events sorted per task in time; each one moves its task out of the previous status
+    order = np.lexsort((history.event_at, history.event_task))
+    task, status, at = history.event_task[order], history.event_status[order], history.event_at[order]
+    first = np.ones(len(task), dtype=bool)
+    first[1:] = task[1:] != task[:-1]
+    previous = np.empty_like(status)
+    previous[1:] = status[:-1]
+    previous[first] = TODO
+    moved = previous != status
+
+    # +1 in todo at creation, +1 in the new and -1 in the previous status at each move;
+    # bin 0 collects everything before the window, the last bin everything after it.
+    # SHELVED gets a row of its own that is dropped, so shelved tasks just leave the flow
+    created = history.created[~np.isnat(history.created)]
+    times = np.concatenate([created, at[moved], at[moved]])
+    codes = np.concatenate([np.full(len(created), TODO), status[moved], previous[moved]]).astype(np.int64)
+    weights = np.concatenate([np.ones(len(created) + moved.sum()), -np.ones(moved.sum())])
+    bins = np.searchsorted(day_ends, times, side='right')
+    deltas = np.bincount(codes * (days + 1) + bins, weights, minlength=(SHELVED + 1) * (days + 1))
+    flow = np.cumsum(deltas.reshape(SHELVED + 1, days + 1)[:len(STATUSES), :days], axis=1).astype(np.int64)
+
+    # Velocity: moves into done per week, the last week ending today
+    week_ends = today - 7 * np.arange(weeks - 1, -1, -1)
+    done_at = at[moved & (status == DONE)].astype('datetime64[D]')
+    week = np.searchsorted(week_ends, done_at, side='left')
+    in_window = (done_at > week_ends[0] - 7) & (week < weeks)
+    velocity = np.bincount(week[in_window], minlength=weeks)
+
+    # Cycle time of tasks whose latest status is done and which finished inside the window:
+    # from their first move to in_progress (or creation, if they skipped it) to that done
+    last = np.ones(len(task), dtype=bool)
+    last[:-1] = task[:-1] != task[1:]
+    finished = last & (status == DONE) & (at >= day_labels[0].astype('datetime64[s]'))
+    finished_task, finished_at = task[finished], at[finished]
+    started = status == IN_PROGRESS
+    started_task, started_index = np.unique(task[started], return_index=True)
+    started_at = at[started][started_index]
+    creation = history.created[np.searchsorted(history.task_ids, finished_task)]
+    if len(started_task):
+        position = np.minimum(np.searchsorted(started_task, finished_task), len(started_task) - 1)
+        start = np.where(started_task[position] == finished_task, started_at[position], creation)
+    else:
+        start = creation
+    elapsed = finished_at - start
+    cycle = np.maximum(elapsed[~np.isnat(elapsed)].astype(np.float64), 0) / 86400
+    cycle_days = np.percentile(cycle, CYCLE_PERCENTILES) if len(cycle) else np.full(len(CYCLE_PERCENTILES), np.nan)
+
+    return ProjectAnalytics(day_labels, flow, week_ends, velocity, cycle_days, len(cycle))
+
+def project_analytics(project_id: int, now: datetime = None) -> ProjectAnalytics:
+    """load_history and compute_analytics in a session of their own, for use off the event loop"""
+    db = ReadSessionLocal()
+    try:
+        return compute_analytics(load_history(db, project_id), now)
+    finally:
+        db.close()
+
+def render_analytics(name: str, analytics: ProjectAnalytics) -> str:
+    """Compact Markdown summary: sampled burndown table, velocity and cycle time"""
+    rows = np.unique(np.linspace(0, len(analytics.days) - 1, min(ANALYTICS_TABLE_ROWS, len(analytics.days))).round()
+                     .astype(int))
+    table = f"{'day':<5}  {'todo':>5}  {'doing':>5}  {'done':>5}  {'open':>5}\n"
+    for i in rows:
+        todo, doing, done = analytics.flow[:, i]
+        table += f"{str(analytics.days[i])[5:]}  {todo:>5}  {doing:>5}  {done:>5}  {analytics.remaining[i]:>5}\n"
+
+    text = f"📈 **تحلیل پروژه {name}**\n\n"
+    text += f"📉 روند کارهای باز ({len(analytics.days)} روز اخیر):\n```\n{table}```\n"
+    text += f"🚀 سرعت هفتگی: {', '.join(str(count) for count in analytics.velocity)}"
+    text += f" (میانگین {analytics.velocity.mean():.1f})\n"
+    if analytics.completed:
+        percentiles = '، '.join(f"p{q}: {value:.1f}" for q, value in zip(CYCLE_PERCENTILES, analytics.cycle_days))
+        text += f"⏱ زمان چرخه (روز): {percentiles} — {analytics.completed} کار\n"
+    else:
+        text += "⏱ زمان چرخه: کاری در این بازه تکمیل نشده است.\n"
+    return text
+
+def render_chart(name: str, analytics: ProjectAnalytics):
+    """PNG with cumulative flow and weekly velocity, or None when matplotlib is not installed"""
+    if pyplot is None:
+        return None
+    figure, (flow_axis, velocity_axis) = pyplot.subplots(2, 1, figsize=(8, 6), height_ratios=(2, 1))
+    try:
+        days = analytics.days.astype('datetime64[D]').astype(datetime)
+        flow_axis.stackplot(days, analytics.flow[DONE], analytics.flow[IN_PROGRESS], analytics.flow[TODO],
+                            labels=('done', 'in progress', 'todo'), colors=('#4caf50', '#ffb300', '#90a4ae'))
+        flow_axis.plot(days, analytics.remaining, color='black', linewidth=1.5, label='open')
+        flow_axis.set_title(name)
+        flow_axis.legend(loc='upper left')
+        velocity_axis.bar([str(day)[5:] for day in analytics.week_ends], analytics.velocity, color='#4caf50')
+        velocity_axis.set_ylabel('done / week')
+        figure.autofmt_xdate()
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png', dpi=100)
+        return buffer.getvalue()
+    finally:
+        pyplot.close(figure)
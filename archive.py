@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, insert, literal, or_, select
+from sqlalchemy.orm import Session
+from models import SessionLocal, ArchivedTask, Section, Task, task_dependencies
+
+logger = logging.getLogger(__name__)
+
+# Tasks done (completed_at) longer ago than this are moved to archived_tasks
+ARCHIVE_AFTER_DAYS = max(1, int(os.getenv('ARCHIVE_AFTER_DAYS', '30')))
+# Rows moved per transaction; keeps each write lock short on SQLite
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+ARCHIVE_INTERVAL = int(os.getenv('ARCHIVE_INTERVAL', '3600'))
+
+ARCHIVED_COLUMNS = ('id', 'title', 'description', 'status', 'section_id', 'project_id', 'assigned_to_id',
+                    'due_date', 'created_at', 'updated_at', 'archived_at', 'priority', 'estimated_hours',
+                    'actual_hours')
+
+def archive_batch(db: Session, criteria, batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+    """Move one batch of tasks matching criteria (Task columns only); returns {project_id: tasks moved}"""
+    rows = db.query(Task.id, Section.project_id).join(Section, Section.id == Task.section_id).filter(
+        *criteria
+    ).order_by(Task.id).limit(batch_size).all()
+    if not rows:
+        return {}
+
+    # Repeat the criteria so a task changed since the SELECT (e.g. reopened) stays hot
+    eligible = (Task.id.in_([task_id for task_id, _ in rows]), *criteria)
+    db.execute(insert(ArchivedTask).from_select(ARCHIVED_COLUMNS, select(
+        Task.id, Task.title, Task.description, Task.status, Task.section_id, Section.project_id,
+        Task.assigned_to_id, Task.due_date, Task.created_at, Task.updated_at,
+        literal(datetime.now(timezone.utc), ArchivedTask.archived_at.type), Task.priority, Task.estimated_hours,
+        Task.actual_hours
+    ).join(Section, Section.id == Task.section_id).where(*eligible)))
+    db.execute(delete(Task).where(*eligible))
+    # Edges of archived tasks are finished business; status history stays for analytics.py.
+    # Task ids are never reused (sqlite_autoincrement), so neither can attach to a new task
+    archived = select(ArchivedTask.id).where(ArchivedTask.id.in_([task_id for task_id, _ in rows]))
+    edges = task_dependencies.c
+    db.execute(delete(task_dependencies).where(or_(edges.task_id.in_(archived), edges.blocked_by_id.in_(archived))))
+    db.commit()
+
+    moved = {}
+    for _, project_id in rows:
+        moved[project_id] = moved.get(project_id, 0) + 1
+    return moved
+
+def archive_tasks(criteria, batch_size: int = ARCHIVE_BATCH_SIZE, session_factory=SessionLocal) -> dict:
+    """Archive all tasks matching criteria, one short transaction per batch; returns {project_id: tasks moved}"""
+    moved = {}
+    while True:
+        db = session_factory()
+        try:
+            batch = archive_batch(db, criteria, batch_size)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        for project_id, count in batch.items():
+            moved[project_id] = moved.get(project_id, 0) + count
+        if sum(batch.values()) < batch_size:
+            return moved
+
+def archive_done_tasks(cutoff: datetime = None, batch_size: int = ARCHIVE_BATCH_SIZE,
+                       session_factory=SessionLocal) -> dict:
+    """Archive tasks done before cutoff (default ARCHIVE_AFTER_DAYS ago)"""
+    cutoff = cutoff or datetime.now(timezone.utc) - timedelta(days=ARCHIVE_AFTER_DAYS)
+    return archive_tasks((Task.status == 'done', Task.completed_at < cutoff), batch_size, session_factory)
+
+def archive_section(section_id: int, batch_size: int = ARCHIVE_BATCH_SIZE, session_factory=SessionLocal) -> int:
+    """Archive every task of a section whatever its status; returns the number moved"""
+    return sum(archive_tasks((Task.section_id == section_id,), batch_size, session_factory).values())
+
+def archive_project(project_id: int, batch_size: int = ARCHIVE_BATCH_SIZE, session_factory=SessionLocal) -> int:
+    """Archive every task of a project whatever its status; returns the number moved"""
+    section_ids = select(Section.id).where(Section.project_id == project_id)
+    return sum(archive_tasks((Task.section_id.in_(section_ids),), batch_size, session_factory).values())
+
+def archived_tasks_page(db: Session, section_id: int, after: int = 0, limit: int = 10):
+    """One keyset page of a section's archived tasks and the id to continue after"""
+    rows = db.query(ArchivedTask.id, ArchivedTask.title, ArchivedTask.status, ArchivedTask.updated_at).filter(
+        ArchivedTask.section_id == section_id, ArchivedTask.id > after
+    ).order_by(ArchivedTask.id).limit(limit + 1).all()
+    next_after = rows[limit - 1].id if len(rows) > limit else None
+    return [tuple(row) for row in rows[:limit]], next_after
+
+async def archive_job(context):
+    """JobQueue callback archiving old done tasks off the event loop"""
+    try:
+        moved = await asyncio.to_thread(archive_done_tasks)
+    except Exception as e:
+        logger.error(f"Error archiving done tasks: {e}")
+        return
+    if moved:
+        logger.info(f"Archived {sum(moved.values())} done tasks from {len(moved)} projects")
+        on_archived = context.job.data
+        if on_archived:
+            on_archived(moved)
+
+def schedule_archival(job_queue, on_archived=None, interval: int = ARCHIVE_INTERVAL):
+    """Run archive_job every interval seconds; on_archived receives {project_id: tasks moved}"""
+    return job_queue.run_repeating(archive_job, interval=interval, first=interval, name='archive_done_tasks',
+                                   data=on_archived)
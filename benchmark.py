@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Load-test and benchmark suite for the bot handlers.
+
+Generates a synthetic SQLite database, replays a realistic mix of callback and
+message updates through button_handler/message_handler with a fake bot and
+reports throughput, latency percentiles and queries per update.
+
+    python benchmark.py --preset small
+    python benchmark.py --preset large --save-baseline
+    python benchmark.py --preset large --compare
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from sqlalchemy import create_engine, event, insert, func, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+import models
+from models import Base, User, Project, Section, Task, create_missing_rollups, project_members
+
+PRESETS = {
+    'tiny': dict(users=20, projects=5, sections=2, tasks=100, members=2, updates=200),
+    'small': dict(users=500, projects=50, sections=4, tasks=10_000, members=5, updates=2_000),
+    'large': dict(users=10_000, projects=1_000, sections=5, tasks=500_000, members=8, updates=10_000),
+}
+
+# Relative weights of update kinds in the replayed traffic
+WORKLOAD_MIX = {
+    'list_projects': 15,
+    'project': 20,
+    'sections': 15,
+    'section': 20,
+    'task': 15,
+    'status': 10,
+    'add_task': 5,
+}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+INSERT_CHUNK = 10_000
+
+def _chunks(rows, size=INSERT_CHUNK):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def generate_dataset(engine, users, projects, sections, tasks, members, seed=0):
+    """Fill an empty database with synthetic users, projects, sections and tasks"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {'id': i, 'telegram_id': 1_000_000 + i, 'username': f'user{i}', 'first_name': f'User {i}',
+             'created_at': now}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(insert(Project), [
+            {'id': i, 'name': f'Project {i}', 'description': 'Synthetic benchmark project',
+             'owner_id': rng.randint(1, users), 'created_at': now}
+            for i in range(1, projects + 1)
+        ])
+        membership = set()
+        for project_id in range(1, projects + 1):
+            for user_id in rng.sample(range(1, users + 1), min(members, users)):
+                membership.add((project_id, user_id))
+        conn.execute(insert(project_members), [
+            {'project_id': project_id, 'user_id': user_id} for project_id, user_id in sorted(membership)
+        ])
+        conn.execute(insert(Section), [
+            {'id': i, 'name': f'Section {i}', 'project_id': (i - 1) // sections + 1, 'created_at': now}
+            for i in range(1, projects * sections + 1)
+        ])
+
+        statuses = ('todo', 'in_progress', 'done')
+        section_count = projects * sections
+        task_rows = []
+        for i in range(1, tasks + 1):
+            created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+            task_rows.append({
+                'id': i, 'title': f'Task {i}', 'description': None, 'status': rng.choice(statuses),
+                'section_id': rng.randint(1, section_count), 'created_at': created, 'updated_at': created,
+            })
+        for chunk in _chunks(task_rows):
+            conn.execute(insert(Task), chunk)
+    # Derived tables init_db would fill on an existing database
+    create_missing_rollups(engine)
+
+def schema_fingerprint() -> str:
+    """Short hash of the SQLite DDL of every table and index, part of the cached dataset's name"""
+    dialect = sqlite.dialect()
+    ddl = []
+    for table in Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        ddl.extend(sorted(str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes))
+    return hashlib.sha1('\n'.join(ddl).encode()).hexdigest()[:10]
+
+def load_dataset(path, **sizes):
+    """Open (and generate on first use) the synthetic database for the given sizes
+
+    path should contain schema_fingerprint(), so datasets built for an older schema are never reused.
+    """
+    fresh = not os.path.exists(path)
+    engine = create_engine(f'sqlite:///{path}')
+    if fresh:
+        start = time.perf_counter()
+        generate_dataset(engine, **sizes)
+        print(f"Generated {path} in {time.perf_counter() - start:.1f}s")
+    return engine
+
+class QueryCounter:
+    """Counts statements executed on an engine"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'after_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+class ErrorCounter(logging.Handler):
+    """Counts ERROR records; the handlers log and swallow their exceptions, so this is how failures show"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+        self.first = None
+
+    def emit(self, record):
+        self.count += 1
+        if self.first is None:
+            self.first = f"{record.name}: {record.getMessage()}"
+
+class FakeBot:
+    """Records outgoing calls instead of talking to Telegram"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def send_message(self, *args, **kwargs):
+        self.calls += 1
+
+class FakeQuery:
+    def __init__(self, data, bot):
+        self.data = data
+        self.bot = bot
+
+    async def answer(self, *args, **kwargs):
+        self.bot.calls += 1
+
+    async def edit_message_text(self, *args, **kwargs):
+        self.bot.calls += 1
+
+class FakeMessage:
+    def __init__(self, text, bot):
+        self.text = text
+        self.bot = bot
+
+    async def reply_text(self, *args, **kwargs):
+        self.bot.calls += 1
+
+def _telegram_user(user_id):
+    return SimpleNamespace(id=1_000_000 + user_id, username=f'user{user_id}', first_name=f'User {user_id}')
+
+def build_workload(engine, updates, seed=0):
+    """Pre-compute (kind, user_id, payload) tuples so generation cost is not measured"""
+    rng = random.Random(seed)
+    with engine.connect() as conn:
+        owners = dict(conn.execute(select(Project.id, Project.owner_id)).all())
+        sections = {}
+        for section_id, project_id in conn.execute(select(Section.id, Section.project_id)):
+            sections.setdefault(project_id, []).append(section_id)
+        max_task = conn.execute(select(func.max(Task.id))).scalar() or 0
+
+    kinds, weights = zip(*WORKLOAD_MIX.items())
+    project_ids = list(owners)
+    workload = []
+    for _ in range(updates):
+        kind = rng.choices(kinds, weights)[0]
+        project_id = rng.choice(project_ids)
+        user_id = owners[project_id]
+        section_id = rng.choice(sections[project_id])
+        task_id = rng.randint(1, max_task)
+        payload = {
+            'list_projects': 'list_projects',
+            'project': f'project_{project_id}',
+            'sections': f'sections_{project_id}',
+            'section': f'section_{section_id}',
+            'task': f'task_{task_id}',
+            'status': f'status_{task_id}_{rng.choice(("todo", "in_progress", "done"))}',
+            'add_task': (f'add_task_{section_id}', f'Benchmark task {rng.randint(1, 10**9)}'),
+        }[kind]
+        workload.append((kind, user_id, payload))
+    return workload
+
+async def replay(workload, counter, errors):
+    """Feed the workload through the real handlers, one update at a time, as the application does
+
+    Samples are (kind, latency, queries, errors logged) per update.
+    """
+    from bot import button_handler, dependency_graph, message_handler, read_model
+    from unit_of_work import begin_unit_of_work, end_unit_of_work
+
+    # Process-wide caches would otherwise serve projects of an earlier run's dataset
+    read_model.clear()
+    dependency_graph.clear()
+    bot = FakeBot()
+    samples = []
+    for kind, user_id, payload in workload:
+        context = SimpleNamespace(user_data={}, bot=bot)
+        if kind == 'add_task':
+            action, text = payload
+            context.user_data['action'] = action
+            update = SimpleNamespace(
+                effective_user=_telegram_user(user_id), message=FakeMessage(text, bot), callback_query=None, bot=bot
+            )
+            handler = message_handler
+        else:
+            update = SimpleNamespace(
+                effective_user=_telegram_user(user_id), callback_query=FakeQuery(payload, bot), message=None, bot=bot
+            )
+            handler = button_handler
+
+        queries_before, errors_before = counter.count, errors.count
+        start = time.perf_counter()
+        await begin_unit_of_work(update, context)
+        await handler(update, context)
+        await end_unit_of_work(update, context)
+        samples.append((kind, time.perf_counter() - start, counter.count - queries_before, errors.count - errors_before))
+    return samples
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(samples, elapsed):
+    """Aggregate raw samples into overall and per-kind statistics"""
+    def stats(rows):
+        latencies = sorted(latency for _, latency, _, _ in rows)
+        return {
+            'updates': len(rows),
+            'p50_ms': _percentile(latencies, 0.50) * 1000,
+            'p95_ms': _percentile(latencies, 0.95) * 1000,
+            'p99_ms': _percentile(latencies, 0.99) * 1000,
+            'queries_per_update': sum(queries for _, _, queries, _ in rows) / len(rows) if rows else 0.0,
+            'errors': sum(errors for _, _, _, errors in rows),
+        }
+
+    report = stats(samples)
+    report['throughput'] = len(samples) / elapsed if elapsed else 0.0
+    report['by_kind'] = {
+        kind: stats([row for row in samples if row[0] == kind]) for kind in sorted({row[0] for row in samples})
+    }
+    return report
+
+def print_report(report):
+    print(f"Throughput: {report['throughput']:.1f} updates/s")
+    header = f"{'kind':<15}{'updates':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>10}{'errors':>8}"
+    print(header)
+    print('-' * len(header))
+    for kind, row in list(report['by_kind'].items()) + [('ALL', report)]:
+        print(f"{kind:<15}{row['updates']:>9}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+              f"{row['p99_ms']:>10.2f}{row['queries_per_update']:>10.1f}{row['errors']:>8}")
+    if report['errors']:
+        print(f"First error: {report['first_error']}")
+
+def compare(report, baseline, tolerance):
+    """Return human readable regressions of the report against a saved baseline"""
+    regressions = []
+    if report['throughput'] < baseline['throughput'] * (1 - tolerance):
+        regressions.append(f"throughput {report['throughput']:.1f} < baseline {baseline['throughput']:.1f}")
+    for kind, row in report['by_kind'].items():
+        base = baseline['by_kind'].get(kind)
+        if not base:
+            continue
+        if row['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{kind} p95 {row['p95_ms']:.2f}ms > baseline {base['p95_ms']:.2f}ms")
+        if row['queries_per_update'] > base['queries_per_update'] + 0.5:
+            regressions.append(
+                f"{kind} queries/update {row['queries_per_update']:.1f} > baseline {base['queries_per_update']:.1f}"
+            )
+    return regressions
+
+def run(preset='small', seed=0, db_dir=None, updates=None):
+    """Generate/load the dataset for a preset, replay the workload and return the report"""
+    sizes = dict(PRESETS[preset])
+    updates = updates or sizes.pop('updates')
+    sizes.pop('updates', None)
+    db_dir = db_dir or tempfile.gettempdir()
+    path = os.path.join(db_dir, f"bench_{preset}_{seed}_{schema_fingerprint()}.db")
+
+    engine = load_dataset(path, seed=seed, **sizes)
+    workload = build_workload(engine, updates, seed=seed)
+
+    # Replay against a throwaway copy so write traffic does not drift the cached dataset
+    work_engine = create_engine('sqlite://')
+    with engine.connect() as source, work_engine.connect() as target:
+        source.connection.dbapi_connection.backup(target.connection.dbapi_connection)
+    previous_bind = models.SessionLocal.kw.get('bind')
+    models.SessionLocal.configure(bind=work_engine)
+    counter = QueryCounter(work_engine)
+    errors = ErrorCounter()
+    logging.getLogger().addHandler(errors)
+
+    try:
+        start = time.perf_counter()
+        samples = asyncio.run(replay(workload, counter, errors))
+        report = summarize(samples, time.perf_counter() - start)
+    finally:
+        logging.getLogger().removeHandler(errors)
+        models.SessionLocal.configure(bind=previous_bind)
+    report.update(preset=preset, seed=seed, first_error=errors.first)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--updates', type=int, help='override the number of replayed updates')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db-dir', help='where generated databases are cached (default: temp dir)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--compare', action='store_true', help='fail if slower than the saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown')
+    args = parser.parse_args(argv)
+    logging.getLogger('bot').setLevel(logging.WARNING)
+
+    report = run(args.preset, args.seed, args.db_dir, args.updates)
+    print_report(report)
+    if report['errors']:
+        # Latencies measured on error paths are meaningless; never compare or save them
+        print(f"❌ {report['errors']} handler errors during replay")
+        return 1
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    if args.compare:
+        baseline = baselines.get(args.preset)
+        if not baseline:
+            print(f"❌ No baseline for preset '{args.preset}' in {args.baseline}")
+            return 1
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"❌ {regression}")
+        if regressions:
+            return 1
+        print("✅ No regressions against baseline")
+
+    if args.save_baseline:
+        baselines[args.preset] = report
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,41 +1,96 @@
+import asyncio
 import logging
+import math
 import os
-from datetime import datetime
+import re
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
+from sqlalchemy import delete, exists, func, or_, tuple_
 from sqlalchemy.orm import Session
-from models import SessionLocal, User, Project, Section, Task
+from sqlalchemy.orm.exc import StaleDataError
+import models
+from models import (
+    init_db, insert_ignore, sqlite_maintenance, User, Project, Section, Task, TaskEvent, project_members
+)
+from analytics import project_analytics, render_analytics, render_chart
+from archive import archive_project, archive_section, archived_tasks_page, schedule_archival
+from deletion import delete_project, delete_section
+from dependencies import DependencyGraph, add_dependency, remove_dependency
+from digest import schedule_daily_digest
+from notifications import channel_notifier
+from read_model import ReadModel
+from rollups import (
+    PRIORITIES, add_task_to_rollup, add_to_rollup, move_task_priority, project_rollup, section_rollup
+)
+from throttle import install_throttle
+from unit_of_work import get_session, install_unit_of_work, release_session
+from metrics import (
+    callback_route, instrument_engine, render_stats, start_metrics_server, timed_handler
+)
+from transport import poll_request, send_request
+from log_pipeline import setup_logging
 load_dotenv()
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Bot token - you can set this as environment variable or replace directly
 BOT_TOKEN = os.getenv('BOT_TOKEN', '')
-print(BOT_TOKEN)
+# Telegram ids allowed to use /stats, comma separated
+ADMIN_IDS = {int(i) for i in os.getenv('ADMIN_IDS', '').split(',') if i.strip()}
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+DB_MAINTENANCE_INTERVAL = int(os.getenv('DB_MAINTENANCE_INTERVAL', '3600'))
+# Point at a local Bot API stand-in (see fake_telegram.py) for offline load tests
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org').rstrip('/')
+# When set, receive updates through a webhook instead of long polling
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or None
+# Worker processes behind the webhook receiver; updates are sharded by user/chat id
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '1'))
+# Tasks per page of the /mytasks view
+MY_TASKS_PAGE_SIZE = int(os.getenv('MY_TASKS_PAGE_SIZE', '10'))
+# Members per page of the member list, and ids/@usernames accepted in one invite message
+MEMBERS_PAGE_SIZE = int(os.getenv('MEMBERS_PAGE_SIZE', '10'))
+MAX_MEMBERS_PER_MESSAGE = int(os.getenv('MAX_MEMBERS_PER_MESSAGE', '50'))
+# Optional in-memory cache behind the show_* views (READ_MODEL=1)
+read_model = ReadModel()
+# Blocked/ready state, ready queue and critical path of projects, maintained on every write
+dependency_graph = DependencyGraph()
+# Candidate blockers offered in the dependency view, and tasks listed in the ready queue
+DEPENDENCY_CHOICES = int(os.getenv('DEPENDENCY_CHOICES', '10'))
+READY_QUEUE_SIZE = int(os.getenv('READY_QUEUE_SIZE', '10'))
+
 def get_db():
-    """Get database session - fixed to return session directly"""
-    return SessionLocal()
+    """Get the update's unit-of-work session (a fresh session outside the application)"""
+    return get_session()
 
 def get_or_create_user(db: Session, telegram_user):
-    """Get or create user - fixed error handling"""
+    """Get or create user with a conflict-free upsert, safe for concurrent first contacts"""
     try:
         user = db.query(User).filter(User.telegram_id == telegram_user.id).first()
         if not user:
-            user = User(
+            db.execute(insert_ignore(db, User.__table__, ['telegram_id']).values(
                 telegram_id=telegram_user.id,
                 username=telegram_user.username,
-                first_name=telegram_user.first_name
-            )
-            db.add(user)
+                first_name=telegram_user.first_name,
+                created_at=datetime.now(timezone.utc)
+            ))
+            db.commit()
+            user = db.query(User).filter(User.telegram_id == telegram_user.id).one()
+        elif user.username != telegram_user.username:
+            # Keep @username lookups for member invites current
+            user.username = telegram_user.username
             db.commit()
-            db.refresh(user)
         return user
     except Exception as e:
         logger.error(f"Error in get_or_create_user: {e}")
         db.rollback()
         raise
 
+@timed_handler()
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start command handler"""
     db = get_db()
@@ -43,6 +98,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = get_or_create_user(db, update.effective_user)
         keyboard = [
             [InlineKeyboardButton("📋 پروژه‌های من", callback_data="list_projects")],
+            [InlineKeyboardButton("📌 کارهای من", callback_data="mytasks")],
             [InlineKeyboardButton("➕ ایجاد پروژه", callback_data="create_project")],
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -54,10 +110,12 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
     except Exception as e:
         logger.error(f"Error in start command: {e}")
+        db.rollback()
         await update.message.reply_text("❌ خطایی رخ داد. لطفاً دوباره تلاش کنید.")
     finally:
-        db.close()
+        release_session(db)
 
+@timed_handler(route=lambda update: callback_route(update.callback_query.data))
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Button callback handler"""
     query = update.callback_query
@@ -86,6 +144,10 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         elif data.startswith("section_"):
             section_id = int(data.split("_")[1])
             await show_tasks(query, db, user, section_id)
+        elif data.startswith("archived_"):
+            parts = data.split("_")
+            after = int(parts[2]) if len(parts) > 2 else 0
+            await show_archived(query, db, user, int(parts[1]), after)
         elif data.startswith("add_task_"):
             section_id = int(data.split("_")[2])
             await query.edit_message_text("عنوان کار را برایم ارسال کنید:")
@@ -93,30 +155,90 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         elif data.startswith("task_"):
             task_id = int(data.split("_")[1])
             await show_task(query, db, user, task_id)
-        elif data.startswith("status_"):
+        elif data == "mytasks":
+            await show_my_tasks(query, db, user)
+        elif data.startswith("mytasks_"):
+            _, last_id, status = data.split("_", 2)
+            await show_my_tasks(query, db, user, (status, int(last_id)))
+        elif data.startswith("assign_"):
+            task_id = int(data.split("_")[1])
+            await show_assignees(query, db, user, task_id)
+        elif data.startswith("assignto_"):
             parts = data.split("_")
-            task_id, status = int(parts[1]), parts[2]
-            await update_task_status(query, db, user, task_id, status)
+            await assign_task(query, db, user, int(parts[1]), int(parts[2]))
+        elif data.startswith("status_"):
+            # status_{task_id}_{version}_{status}; buttons rendered before versioning lack the version
+            parts = data.split("_", 3)
+            if len(parts) == 4 and parts[2].isdigit():
+                task_id, version, status = int(parts[1]), int(parts[2]), parts[3]
+            else:
+                parts = data.split("_", 2)
+                task_id, version, status = int(parts[1]), None, parts[2]
+            await update_task_status(query, db, user, task_id, status, version)
+        elif data.startswith("timer_"):
+            _, task_id, action = data.split("_")
+            await change_timer(query, db, user, int(task_id), action == "start")
+        elif data.startswith("priority_"):
+            _, task_id, priority = data.split("_")
+            await change_priority(query, db, user, int(task_id), priority)
+        elif data.startswith("estimate_"):
+            task_id = int(data.split("_")[1])
+            await query.edit_message_text("برآورد زمان این کار را به ساعت ارسال کنید (مثلاً 2.5):")
+            context.user_data['action'] = f'set_estimate_{task_id}'
+        elif data.startswith("due_"):
+            task_id = int(data.split("_")[1])
+            await query.edit_message_text("مهلت کار را به صورت YYYY-MM-DD ارسال کنید (برای حذف مهلت «-» بفرستید):")
+            context.user_data['action'] = f'set_due_{task_id}'
+        elif data.startswith("analytics_"):
+            project_id = int(data.split("_")[1])
+            await show_analytics(query, db, user, project_id)
+        elif data.startswith("critical_"):
+            project_id = int(data.split("_")[1])
+            await show_critical_path(query, db, user, project_id)
+        elif data.startswith("deps_"):
+            task_id = int(data.split("_")[1])
+            await show_dependencies(query, db, user, task_id)
+        elif data.startswith("adddep_") or data.startswith("rmdep_"):
+            action, task_id, blocker_id = data.split("_")
+            await change_dependency(query, db, user, int(task_id), int(blocker_id), action == "adddep")
         elif data.startswith("add_member_"):
             project_id = int(data.split("_")[2])
-            await query.edit_message_text("شناسه تلگرام کاربری که می‌خواهید اضافه کنید را ارسال کنید:")
+            await query.edit_message_text(
+                "شناسه تلگرام یا نام کاربری (@username) اعضا را ارسال کنید.\n"
+                "می‌توانید چند نفر را با فاصله یا کاما جدا کنید:"
+            )
             context.user_data['action'] = f'add_member_{project_id}'
+        elif data.startswith("members_"):
+            parts = data.split("_")
+            after = int(parts[2]) if len(parts) > 2 else 0
+            await show_members(query, db, user, int(parts[1]), after)
+        elif data.startswith("rmmember_"):
+            parts = data.split("_")
+            await remove_member(query, db, user, int(parts[1]), int(parts[2]))
         elif data.startswith("set_channel_"):
             project_id = int(data.split("_")[2])
             await query.edit_message_text("شناسه کانال را ارسال کنید (با @channel_name یا -100xxxxxxxxx):")
             context.user_data['action'] = f'set_channel_{project_id}'
+        elif data.startswith("confirm_"):
+            _, action, target_id = data.split("_")
+            await confirm_bulk_action(query, action, int(target_id))
+        elif data.startswith("do_"):
+            _, action, target_id = data.split("_")
+            await run_bulk_action(query, db, user, action, int(target_id))
         elif data == "back_to_main":
             keyboard = [
                 [InlineKeyboardButton("📋 پروژه‌های من", callback_data="list_projects")],
+                [InlineKeyboardButton("📌 کارهای من", callback_data="mytasks")],
                 [InlineKeyboardButton("➕ ایجاد پروژه", callback_data="create_project")],
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await query.edit_message_text("منوی اصلی:", reply_markup=reply_markup)
     except Exception as e:
         logger.error(f"Error in button handler: {e}")
+        db.rollback()
         await query.edit_message_text("❌ خطایی رخ داد. لطفاً دوباره تلاش کنید.")
     finally:
-        db.close()
+        release_session(db)
 
 async def list_projects(query, db: Session, user: User):
     """List projects - FIXED: Now properly queries projects for user"""
@@ -148,10 +270,398 @@ async def list_projects(query, db: Session, user: User):
         logger.error(f"Error in list_projects: {e}")
         await query.edit_message_text("❌ خطایی در بارگذاری پروژه‌ها رخ داد.")
 
+STATUS_EMOJI = {"todo": "⭕", "in_progress": "🔄", "done": "✅"}
+STATUS_TEXT = {"todo": "باید انجام شود", "in_progress": "در حال انجام", "done": "تکمیل شده"}
+DEPENDENCY_EMOJI = {"blocked": "⛔", "ready": "🟢"}
+PRIORITY_EMOJI = {"high": "🔴", "medium": "🟡", "low": "🔵"}
+PRIORITY_TEXT = {"high": "بالا", "medium": "متوسط", "low": "پایین"}
+
+def format_hours(hours) -> str:
+    return f"{hours:.2f}".rstrip('0').rstrip('.')
+
+def is_overdue(due_date: datetime, now: datetime = None) -> bool:
+    # SQLite hands back naive datetimes; they were stored as UTC
+    if due_date.tzinfo is None:
+        due_date = due_date.replace(tzinfo=timezone.utc)
+    return due_date < (now or datetime.now(timezone.utc))
+
+def parse_due_date(text: str):
+    """End of the given YYYY-MM-DD day in UTC, so the task is overdue only once that day is over; None if invalid"""
+    try:
+        day = datetime.strptime(text.strip(), '%Y-%m-%d')
+    except ValueError:
+        return None
+    return day.replace(hour=23, minute=59, second=59, tzinfo=timezone.utc)
+
+def render_rollup(rollup: dict) -> str:
+    """Estimate/actual/variance lines of a rollup from rollups.py, by priority and in total"""
+    if not rollup:
+        return ""
+    text = "⏱ زمان (برآورد / واقعی / اختلاف، ساعت):\n"
+    totals = [0, 0.0, 0.0]
+    for priority in PRIORITIES:
+        if priority not in rollup:
+            continue
+        tasks, estimated, actual = rollup[priority]
+        totals = [totals[0] + tasks, totals[1] + estimated, totals[2] + actual]
+        text += (f"{PRIORITY_EMOJI[priority]} {PRIORITY_TEXT[priority]} ({tasks} کار): {format_hours(estimated)} / "
+                 f"{format_hours(actual)} / {actual - estimated:+.2f}\n")
+    tasks, estimated, actual = totals
+    text += f"Σ مجموع ({tasks} کار): {format_hours(estimated)} / {format_hours(actual)} / {actual - estimated:+.2f}\n"
+    return text
+
+def render_project(project_id, name, description, sections_count, tasks_count, owner_name, members_count,
+                   channel_id, is_owner, rollup=None):
+    """Text and keyboard of the project details view; rollup is the project's project_rollup()"""
+    text = f"📋 **{name}**\n\n"
+    text += f"📄 توضیحات: {description or 'بدون توضیحات'}\n"
+    text += f"📊 بخش‌ها: {sections_count}\n"
+    text += f"✅ کل کارها: {tasks_count}\n"
+    text += f"👑 مالک: {owner_name}\n"
+    text += f"👥 اعضا: {members_count}\n"
+    if channel_id:
+        text += f"📢 کانال به‌روزرسانی: {channel_id}\n"
+    if rollup:
+        text += f"\n{render_rollup(rollup)}"
+    
+    keyboard = [
+        [InlineKeyboardButton("📂 مشاهده بخش‌ها", callback_data=f"sections_{project_id}")],
+        [InlineKeyboardButton("➕ افزودن بخش", callback_data=f"add_section_{project_id}")],
+        [InlineKeyboardButton("👥 اعضا", callback_data=f"members_{project_id}")],
+        [InlineKeyboardButton("📈 تحلیل پیشرفت", callback_data=f"analytics_{project_id}")],
+        [InlineKeyboardButton("🧭 مسیر بحرانی و کارهای آماده", callback_data=f"critical_{project_id}")],
+    ]
+    
+    if is_owner:
+        keyboard.extend([
+            [InlineKeyboardButton("👥 افزودن عضو", callback_data=f"add_member_{project_id}")],
+            [InlineKeyboardButton("📢 تنظیم کانال", callback_data=f"set_channel_{project_id}")],
+            [
+                InlineKeyboardButton("🗄 بایگانی پروژه", callback_data=f"confirm_arcproject_{project_id}"),
+                InlineKeyboardButton("🗑 حذف پروژه", callback_data=f"confirm_delproject_{project_id}"),
+            ],
+        ])
+    
+    keyboard.append([InlineKeyboardButton("⬅️ بازگشت", callback_data="list_projects")])
+    return text, InlineKeyboardMarkup(keyboard)
+
+def render_sections(project_id, project_name, sections):
+    """Text and keyboard of the section list; sections are (id, name, tasks_count) tuples"""
+    if not sections:
+        keyboard = [
+            [InlineKeyboardButton("➕ افزودن بخش", callback_data=f"add_section_{project_id}")],
+            [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"project_{project_id}")]
+        ]
+        return "هیچ بخشی یافت نشد.", InlineKeyboardMarkup(keyboard)
+    
+    keyboard = []
+    for section_id, section_name, tasks_count in sections:
+        keyboard.append([InlineKeyboardButton(
+            f"📂 {section_name} ({tasks_count} کار)", 
+            callback_data=f"section_{section_id}"
+        )])
+    
+    keyboard.extend([
+        [InlineKeyboardButton("➕ افزودن بخش", callback_data=f"add_section_{project_id}")],
+        [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"project_{project_id}")]
+    ])
+    return f"بخش‌های {project_name}:", InlineKeyboardMarkup(keyboard)
+
+def render_tasks(section_id, section_name, project_id, tasks, dependency_states=None, rollup=None):
+    """Text and keyboard of the task list; tasks are (id, status, title) tuples
+
+    dependency_states maps task ids to 'blocked' or 'ready' for tasks that have blockers;
+    rollup is the section's section_rollup().
+    """
+    dependency_states = dependency_states or {}
+    if not tasks:
+        keyboard = [
+            [InlineKeyboardButton("➕ افزودن کار", callback_data=f"add_task_{section_id}")],
+            [InlineKeyboardButton("🗄 کارهای بایگانی‌شده", callback_data=f"archived_{section_id}")],
+            [
+                InlineKeyboardButton("🗄 بایگانی بخش", callback_data=f"confirm_arcsection_{section_id}"),
+                InlineKeyboardButton("🗑 حذف بخش", callback_data=f"confirm_delsection_{section_id}"),
+            ],
+            [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"sections_{project_id}")]
+        ]
+        return "هیچ کاری یافت نشد.", InlineKeyboardMarkup(keyboard)
+    
+    keyboard = []
+    for task_id, status, title in tasks:
+        marker = DEPENDENCY_EMOJI.get(dependency_states.get(task_id))
+        keyboard.append([InlineKeyboardButton(
+            f"{STATUS_EMOJI.get(status, '⭕')} {marker + ' ' if marker else ''}{title}", 
+            callback_data=f"task_{task_id}"
+        )])
+    
+    keyboard.extend([
+        [InlineKeyboardButton("➕ افزودن کار", callback_data=f"add_task_{section_id}")],
+        [InlineKeyboardButton("🗄 کارهای بایگانی‌شده", callback_data=f"archived_{section_id}")],
+        [
+            InlineKeyboardButton("🗄 بایگانی بخش", callback_data=f"confirm_arcsection_{section_id}"),
+            InlineKeyboardButton("🗑 حذف بخش", callback_data=f"confirm_delsection_{section_id}"),
+        ],
+        [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"sections_{project_id}")]
+    ])
+    text = f"کارهای {section_name}:"
+    if rollup:
+        text += f"\n\n{render_rollup(rollup)}"
+    return text, InlineKeyboardMarkup(keyboard)
+
+def render_task(task_id, title, description, status, assigned_name, created_at, section_id, version=None,
+                notice=None, priority='medium', estimated_hours=None, actual_hours=0.0, timer_started_at=None,
+                due_date=None):
+    """Text and keyboard of the task details view; status buttons carry the rendered version"""
+    text = f"{notice}\n\n" if notice else ""
+    text += f"{STATUS_EMOJI.get(status, '⭕')} **{title}**\n\n"
+    text += f"📄 توضیحات: {description or 'بدون توضیحات'}\n"
+    text += f"📊 وضعیت: {STATUS_TEXT.get(status, 'نامشخص')}\n"
+    text += f"👤 واگذار شده به: {assigned_name or 'واگذار نشده'}\n"
+    text += f"📅 تاریخ ایجاد: {created_at.strftime('%Y-%m-%d %H:%M')}\n"
+    text += f"🎚 اولویت: {PRIORITY_EMOJI.get(priority, '🟡')} {PRIORITY_TEXT.get(priority, 'متوسط')}\n"
+    text += f"⏳ برآورد: {format_hours(estimated_hours) + ' ساعت' if estimated_hours is not None else 'ثبت نشده'}\n"
+    text += f"⏱ زمان صرف‌شده: {format_hours(actual_hours or 0.0)} ساعت"
+    text += " (در حال ثبت ⏺)\n" if timer_started_at else "\n"
+    if due_date:
+        text += f"⏰ مهلت: {due_date.strftime('%Y-%m-%d')}"
+        text += " (عقب‌افتاده ⚠️)\n" if status != "done" and is_overdue(due_date) else "\n"
+    
+    # Buttons carry the target state, so a double tap or stale message cannot toggle twice
+    next_priority = PRIORITIES[(PRIORITIES.index(priority) + 1) % len(PRIORITIES)] if priority in PRIORITIES else 'high'
+    prefix = f"status_{task_id}_{version}" if version is not None else f"status_{task_id}"
+    keyboard = [
+        [
+            InlineKeyboardButton("⭕ باید انجام شود", callback_data=f"{prefix}_todo"),
+            InlineKeyboardButton("🔄 در حال انجام", callback_data=f"{prefix}_in_progress"),
+            InlineKeyboardButton("✅ تکمیل شده", callback_data=f"{prefix}_done"),
+        ],
+        [
+            InlineKeyboardButton("👤 واگذاری", callback_data=f"assign_{task_id}"),
+            InlineKeyboardButton("⛓ وابستگی‌ها", callback_data=f"deps_{task_id}"),
+            InlineKeyboardButton("⏰ مهلت", callback_data=f"due_{task_id}"),
+        ],
+        [
+            InlineKeyboardButton("⏹ توقف زمان", callback_data=f"timer_{task_id}_stop") if timer_started_at
+            else InlineKeyboardButton("▶️ شروع زمان", callback_data=f"timer_{task_id}_start"),
+            InlineKeyboardButton("⏳ برآورد", callback_data=f"estimate_{task_id}"),
+            InlineKeyboardButton(f"🎚 اولویت: {PRIORITY_TEXT.get(priority, 'متوسط')}",
+                                 callback_data=f"priority_{task_id}_{next_priority}"),
+        ],
+        [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"section_{section_id}")]
+    ]
+    return text, InlineKeyboardMarkup(keyboard)
+
+def render_my_tasks(tasks, next_cursor, first_page: bool = True):
+    """Text and keyboard of the "my tasks" view; tasks are (id, status, title, project_name) tuples"""
+    back = [InlineKeyboardButton("⬅️ بازگشت", callback_data="back_to_main")]
+    if not tasks:
+        return "هیچ کار بازی به شما واگذار نشده است.", InlineKeyboardMarkup([back])
+    
+    text = "📌 کارهای من:\n"
+    keyboard = []
+    current_status = None
+    for task_id, status, title, project_name in tasks:
+        if status != current_status:
+            current_status = status
+            text += f"\n{STATUS_EMOJI.get(status, '⭕')} {STATUS_TEXT.get(status, 'نامشخص')}:\n"
+        text += f"• {title} ({project_name})\n"
+        keyboard.append([InlineKeyboardButton(
+            f"{STATUS_EMOJI.get(status, '⭕')} {title}",
+            callback_data=f"task_{task_id}"
+        )])
+    
+    pages = []
+    if not first_page:
+        pages.append(InlineKeyboardButton("⏮ ابتدا", callback_data="mytasks"))
+    if next_cursor:
+        status, last_id = next_cursor
+        pages.append(InlineKeyboardButton("➡️ بعدی", callback_data=f"mytasks_{last_id}_{status}"))
+    if pages:
+        keyboard.append(pages)
+    keyboard.append(back)
+    return text, InlineKeyboardMarkup(keyboard)
+
+def query_my_tasks(db: Session, user_id: int, after=None, limit: int = MY_TASKS_PAGE_SIZE):
+    """One page of the user's open tasks in projects they can access, and the next page cursor
+
+    Rows come from ix_tasks_assignee_status in (status, id) order, which puts
+    in_progress before todo; after is the (status, id) of the previous page's last row.
+    """
+    query = db.query(Task.id, Task.status, Task.title, Project.name).join(
+        Section, Section.id == Task.section_id
+    ).join(Project, Project.id == Section.project_id).filter(
+        Task.assigned_to_id == user_id,
+        Task.status.in_(("in_progress", "todo")),
+        or_(
+            Project.owner_id == user_id,
+            exists().where(project_members.c.project_id == Project.id, project_members.c.user_id == user_id)
+        )
+    )
+    if after:
+        query = query.filter(tuple_(Task.status, Task.id) > tuple_(*after))
+    rows = query.order_by(Task.status, Task.id).limit(limit + 1).all()
+    next_cursor = (rows[limit - 1].status, rows[limit - 1].id) if len(rows) > limit else None
+    return [tuple(row) for row in rows[:limit]], next_cursor
+
+async def show_my_tasks(query, db: Session, user: User, after=None):
+    """Show the user's open tasks across projects, one keyset page at a time"""
+    try:
+        tasks, next_cursor = query_my_tasks(db, user.id, after)
+        text, reply_markup = render_my_tasks(tasks, next_cursor, first_page=after is None)
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    except Exception as e:
+        logger.error(f"Error in show_my_tasks: {e}")
+        await query.edit_message_text("❌ خطایی در بارگذاری کارها رخ داد.")
+
+@timed_handler()
+async def my_tasks_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/mytasks command showing the first page of the user's open tasks"""
+    db = get_db()
+    try:
+        user = get_or_create_user(db, update.effective_user)
+        tasks, next_cursor = query_my_tasks(db, user.id)
+        text, reply_markup = render_my_tasks(tasks, next_cursor)
+        await update.message.reply_text(text, reply_markup=reply_markup)
+    except Exception as e:
+        logger.error(f"Error in my_tasks command: {e}")
+        db.rollback()
+        await update.message.reply_text("❌ خطایی رخ داد. لطفاً دوباره تلاش کنید.")
+    finally:
+        release_session(db)
+
+def is_project_member(db: Session, project: Project, user_id: int) -> bool:
+    """Owner or member check through ux_project_members, without loading project.members"""
+    if project.owner_id == user_id:
+        return True
+    return db.query(exists().where(
+        project_members.c.project_id == project.id, project_members.c.user_id == user_id
+    )).scalar()
+
+def parse_member_refs(text: str):
+    """Split an invite message into a set of telegram ids and a set of lower-cased usernames"""
+    telegram_ids, usernames = set(), set()
+    for token in re.split(r'[\s,،]+', text.strip()):
+        if token.lstrip('-').isdigit():
+            telegram_ids.add(int(token))
+        elif token.lstrip('@'):
+            usernames.add(token.lstrip('@').lower())
+    return telegram_ids, usernames
+
+def add_members(db: Session, project: Project, telegram_ids, usernames):
+    """Resolve ids and usernames with one query and add them with one INSERT ... ON CONFLICT DO NOTHING
+
+    Returns (resolved user ids, number of new memberships, unresolved references).
+    """
+    conditions = []
+    if telegram_ids:
+        conditions.append(User.telegram_id.in_(telegram_ids))
+    if usernames:
+        conditions.append(func.lower(User.username).in_(usernames))
+    found = db.query(User.id, User.telegram_id, User.username).filter(or_(*conditions)).all() if conditions else []
+    
+    unresolved = sorted(str(telegram_id) for telegram_id in telegram_ids - {row.telegram_id for row in found})
+    unresolved += sorted(f"@{name}" for name in usernames - {(row.username or '').lower() for row in found})
+    user_ids = sorted({row.id for row in found if row.id != project.owner_id})
+    added = 0
+    if user_ids:
+        result = db.execute(insert_ignore(db, project_members, ['project_id', 'user_id']).values([
+            {'project_id': project.id, 'user_id': user_id} for user_id in user_ids
+        ]))
+        added = result.rowcount
+        db.commit()
+        db.expire(project, ['members'])
+    return user_ids, added, unresolved
+
+def render_members(project_id, members, total, next_after, is_owner, first_page: bool = True):
+    """Text and keyboard of the member list; members are (id, first_name, username) tuples"""
+    text = f"👥 اعضای پروژه ({total}):\n\n"
+    keyboard = []
+    for user_id, first_name, username in members:
+        name = first_name or username or str(user_id)
+        text += f"• {name}" + (f" (@{username})" if username else "") + "\n"
+        if is_owner:
+            keyboard.append([InlineKeyboardButton(f"❌ حذف {name}", callback_data=f"rmmember_{project_id}_{user_id}")])
+    if not members:
+        text += "هنوز عضوی اضافه نشده است.\n"
+    
+    pages = []
+    if not first_page:
+        pages.append(InlineKeyboardButton("⏮ ابتدا", callback_data=f"members_{project_id}"))
+    if next_after:
+        pages.append(InlineKeyboardButton("➡️ بعدی", callback_data=f"members_{project_id}_{next_after}"))
+    if pages:
+        keyboard.append(pages)
+    if is_owner:
+        keyboard.append([InlineKeyboardButton("👥 افزودن عضو", callback_data=f"add_member_{project_id}")])
+    keyboard.append([InlineKeyboardButton("⬅️ بازگشت", callback_data=f"project_{project_id}")])
+    return text, InlineKeyboardMarkup(keyboard)
+
+async def show_members(query, db: Session, user: User, project_id: int, after: int = 0):
+    """Show one keyset page of project members, ordered by user id"""
+    try:
+        project = db.get(Project, project_id)
+        if not project or not is_project_member(db, project, user.id):
+            await query.edit_message_text("پروژه یافت نشد یا دسترسی رد شد.")
+            return
+        
+        rows = db.query(User.id, User.first_name, User.username).join(
+            project_members, project_members.c.user_id == User.id
+        ).filter(
+            project_members.c.project_id == project_id, User.id > after
+        ).order_by(User.id).limit(MEMBERS_PAGE_SIZE + 1).all()
+        total = db.query(func.count()).select_from(project_members).filter(
+            project_members.c.project_id == project_id
+        ).scalar()
+        next_after = rows[MEMBERS_PAGE_SIZE - 1].id if len(rows) > MEMBERS_PAGE_SIZE else None
+        text, reply_markup = render_members(
+            project_id, [tuple(row) for row in rows[:MEMBERS_PAGE_SIZE]], total, next_after,
+            project.owner_id == user.id, first_page=not after
+        )
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    except Exception as e:
+        logger.error(f"Error in show_members: {e}")
+        await query.edit_message_text("❌ خطایی در بارگذاری اعضا رخ داد.")
+
+async def remove_member(query, db: Session, user: User, project_id: int, member_id: int):
+    """Remove a member from a project (owner only) and show the member list again"""
+    try:
+        project = db.get(Project, project_id)
+        if not project or project.owner_id != user.id:
+            await query.edit_message_text("❌ پروژه یافت نشد یا شما مالک نیستید.")
+            return
+        
+        db.execute(delete(project_members).where(
+            project_members.c.project_id == project_id, project_members.c.user_id == member_id
+        ))
+        db.commit()
+        db.expire(project, ['members'])
+        read_model.member_removed(project_id, member_id)
+        await show_members(query, db, user, project_id)
+    except Exception as e:
+        logger.error(f"Error in remove_member: {e}")
+        db.rollback()
+        await query.edit_message_text("❌ خطایی در حذف عضو رخ داد.")
+
 async def show_project(query, db: Session, user: User, project_id: int):
     """Show project details - FIXED: Added proper error handling"""
     try:
-        project = db.query(Project).filter(Project.id == project_id).first()
+        if read_model.enabled:
+            record = read_model.get_project(db, project_id)
+            if not record:
+                await query.edit_message_text("پروژه یافت نشد.")
+                return
+            if not record.can_access(user.id):
+                await query.edit_message_text("پروژه یافت نشد یا دسترسی رد شد.")
+                return
+            text, reply_markup = render_project(
+                record.id, record.name, record.description, len(record.section_ids),
+                read_model.project_task_count(record), record.owner_name, len(record.member_ids),
+                record.channel_id, record.owner_id == user.id, project_rollup(db, project_id)
+            )
+            await query.edit_message_text(text, reply_markup=reply_markup, parse_mode='Markdown')
+            return
+        
+        project = db.get(Project, project_id)
         if not project:
             await query.edit_message_text("پروژه یافت نشد.")
             return
@@ -164,29 +674,11 @@ async def show_project(query, db: Session, user: User, project_id: int):
         sections_count = len(project.sections)
         tasks_count = sum(len(section.tasks) for section in project.sections)
         
-        text = f"📋 **{project.name}**\n\n"
-        text += f"📄 توضیحات: {project.description or 'بدون توضیحات'}\n"
-        text += f"📊 بخش‌ها: {sections_count}\n"
-        text += f"✅ کل کارها: {tasks_count}\n"
-        text += f"👑 مالک: {project.owner.first_name}\n"
-        text += f"👥 اعضا: {len(project.members)}\n"
-        if project.channel_id:
-            text += f"📢 کانال به‌روزرسانی: {project.channel_id}\n"
-        
-        keyboard = [
-            [InlineKeyboardButton("📂 مشاهده بخش‌ها", callback_data=f"sections_{project.id}")],
-            [InlineKeyboardButton("➕ افزودن بخش", callback_data=f"add_section_{project.id}")],
-        ]
-        
-        if project.owner_id == user.id:
-            keyboard.extend([
-                [InlineKeyboardButton("👥 افزودن عضو", callback_data=f"add_member_{project.id}")],
-                [InlineKeyboardButton("📢 تنظیم کانال", callback_data=f"set_channel_{project.id}")],
-            ])
-        
-        keyboard.append([InlineKeyboardButton("⬅️ بازگشت", callback_data="list_projects")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
+        text, reply_markup = render_project(
+            project.id, project.name, project.description, sections_count, tasks_count,
+            project.owner.first_name, len(project.members), project.channel_id, project.owner_id == user.id,
+            project_rollup(db, project_id)
+        )
         await query.edit_message_text(text, reply_markup=reply_markup, parse_mode='Markdown')
     except Exception as e:
         logger.error(f"Error in show_project: {e}")
@@ -195,7 +687,21 @@ async def show_project(query, db: Session, user: User, project_id: int):
 async def show_sections(query, db: Session, user: User, project_id: int):
     """Show sections - FIXED: Added proper error handling"""
     try:
-        project = db.query(Project).filter(Project.id == project_id).first()
+        if read_model.enabled:
+            record = read_model.get_project(db, project_id)
+            if not record:
+                await query.edit_message_text("پروژه یافت نشد.")
+                return
+            if not record.can_access(user.id):
+                await query.edit_message_text("پروژه یافت نشد یا دسترسی رد شد.")
+                return
+            text, reply_markup = render_sections(record.id, record.name, [
+                (section.id, section.name, len(section.task_ids)) for section in read_model.project_sections(record)
+            ])
+            await query.edit_message_text(text, reply_markup=reply_markup)
+            return
+        
+        project = db.get(Project, project_id)
         if not project:
             await query.edit_message_text("پروژه یافت نشد.")
             return
@@ -205,31 +711,10 @@ async def show_sections(query, db: Session, user: User, project_id: int):
             await query.edit_message_text("پروژه یافت نشد یا دسترسی رد شد.")
             return
         
-        sections = project.sections
-        if not sections:
-            keyboard = [
-                [InlineKeyboardButton("➕ افزودن بخش", callback_data=f"add_section_{project.id}")],
-                [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"project_{project.id}")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text("هیچ بخشی یافت نشد.", reply_markup=reply_markup)
-            return
-        
-        keyboard = []
-        for section in sections:
-            tasks_count = len(section.tasks)
-            keyboard.append([InlineKeyboardButton(
-                f"📂 {section.name} ({tasks_count} کار)", 
-                callback_data=f"section_{section.id}"
-            )])
-        
-        keyboard.extend([
-            [InlineKeyboardButton("➕ افزودن بخش", callback_data=f"add_section_{project.id}")],
-            [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"project_{project.id}")]
+        text, reply_markup = render_sections(project.id, project.name, [
+            (section.id, section.name, len(section.tasks)) for section in project.sections
         ])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(f"بخش‌های {project.name}:", reply_markup=reply_markup)
+        await query.edit_message_text(text, reply_markup=reply_markup)
     except Exception as e:
         logger.error(f"Error in show_sections: {e}")
         await query.edit_message_text("❌ خطایی در بارگذاری بخش‌ها رخ داد.")
@@ -237,7 +722,22 @@ async def show_sections(query, db: Session, user: User, project_id: int):
 async def show_tasks(query, db: Session, user: User, section_id: int):
     """Show tasks - FIXED: Added proper error handling"""
     try:
-        section = db.query(Section).filter(Section.id == section_id).first()
+        if read_model.enabled:
+            section = read_model.get_section(db, section_id)
+            if not section:
+                await query.edit_message_text("بخش یافت نشد.")
+                return
+            if not read_model.projects[section.project_id].can_access(user.id):
+                await query.edit_message_text("دسترسی رد شد.")
+                return
+            graph = dependency_graph.get(db, section.project_id)
+            text, reply_markup = render_tasks(section.id, section.name, section.project_id, [
+                (task.id, task.status, task.title) for task in read_model.section_tasks(section)
+            ], {task_id: graph.state(task_id) for task_id in section.task_ids}, section_rollup(db, section_id))
+            await query.edit_message_text(text, reply_markup=reply_markup)
+            return
+        
+        section = db.get(Section, section_id)
         if not section:
             await query.edit_message_text("بخش یافت نشد.")
             return
@@ -252,39 +752,253 @@ async def show_tasks(query, db: Session, user: User, section_id: int):
             await query.edit_message_text("دسترسی رد شد.")
             return
         
-        tasks = section.tasks
+        graph = dependency_graph.get(db, project.id)
+        text, reply_markup = render_tasks(section.id, section.name, project.id, [
+            (task.id, task.status, task.title) for task in section.tasks
+        ], {task.id: graph.state(task.id) for task in section.tasks}, section_rollup(db, section_id))
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    except Exception as e:
+        logger.error(f"Error in show_tasks: {e}")
+        await query.edit_message_text("❌ خطایی در بارگذاری کارها رخ داد.")
+
+async def show_archived(query, db: Session, user: User, section_id: int, after: int = 0):
+    """Show one page of a section's archived tasks, read from archived_tasks on demand"""
+    try:
+        section = db.get(Section, section_id)
+        if not section or section.project is None:
+            await query.edit_message_text("بخش یافت نشد.")
+            return
+        if not is_project_member(db, section.project, user.id):
+            await query.edit_message_text("دسترسی رد شد.")
+            return
+        
+        tasks, next_after = archived_tasks_page(db, section_id, after)
+        text = f"🗄 کارهای بایگانی‌شده {section.name}:\n\n"
+        for _, title, status, updated_at in tasks:
+            text += f"{STATUS_EMOJI.get(status, '⭕')} {title}"
+            text += (f" ({updated_at.strftime('%Y-%m-%d')})" if updated_at else "") + "\n"
         if not tasks:
-            keyboard = [
-                [InlineKeyboardButton("➕ افزودن کار", callback_data=f"add_task_{section.id}")],
-                [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"sections_{project.id}")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text("هیچ کاری یافت نشد.", reply_markup=reply_markup)
+            text += "هیچ کار بایگانی‌شده‌ای وجود ندارد.\n"
+        
+        keyboard = []
+        if next_after:
+            keyboard.append([InlineKeyboardButton("➡️ بعدی", callback_data=f"archived_{section_id}_{next_after}")])
+        keyboard.append([InlineKeyboardButton("⬅️ بازگشت", callback_data=f"section_{section_id}")])
+        await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+    except Exception as e:
+        logger.error(f"Error in show_archived: {e}")
+        await query.edit_message_text("❌ خطایی در بارگذاری کارهای بایگانی‌شده رخ داد.")
+
+async def show_analytics(query, db: Session, user: User, project_id: int):
+    """Show burndown, velocity and cycle time of a project, plus a chart when matplotlib is installed"""
+    try:
+        project = db.get(Project, project_id)
+        if not project:
+            await query.edit_message_text("پروژه یافت نشد.")
+            return
+        if not is_project_member(db, project, user.id):
+            await query.edit_message_text("پروژه یافت نشد یا دسترسی رد شد.")
             return
         
+        # Loading and summarizing a large history takes a while; keep the event loop free meanwhile
+        analytics = await asyncio.to_thread(project_analytics, project_id)
+        keyboard = [[InlineKeyboardButton("⬅️ بازگشت", callback_data=f"project_{project_id}")]]
+        await query.edit_message_text(
+            render_analytics(project.name, analytics), reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode='Markdown'
+        )
+        chart = await asyncio.to_thread(render_chart, project.name, analytics)
+        if chart:
+            await query.message.reply_photo(chart)
+    except Exception as e:
+        logger.error(f"Error in show_analytics: {e}")
+        await query.edit_message_text("❌ خطایی در محاسبه تحلیل پروژه رخ داد.")
+
+def render_critical_path(project_id, project_name, graph):
+    """Text and keyboard of the critical path and ready queue of a project"""
+    path = graph.critical_path()
+    text = f"🧭 مسیر بحرانی {project_name}"
+    if path:
+        text += f" ({len(path)} کار باز پشت سر هم):\n"
+        text += "\n".join(f"{i}. {graph.titles[task_id]}" for i, task_id in enumerate(path, 1))
+    else:
+        text += ":\nهیچ کار بازی وجود ندارد."
+    
+    ready = graph.ready_queue(READY_QUEUE_SIZE)
+    text += f"\n\n🟢 کارهای آماده شروع ({len(graph.ready)}):"
+    keyboard = [
+        [InlineKeyboardButton(f"🟢 {graph.titles[task_id]}", callback_data=f"task_{task_id}")] for task_id in ready
+    ]
+    if not ready:
+        text += "\nهیچ کاری آماده نیست."
+    keyboard.append([InlineKeyboardButton("⬅️ بازگشت", callback_data=f"project_{project_id}")])
+    return text, InlineKeyboardMarkup(keyboard)
+
+async def show_critical_path(query, db: Session, user: User, project_id: int):
+    """Show the project's longest chain of open tasks and the tasks that can start now"""
+    try:
+        project = db.get(Project, project_id)
+        if not project or not is_project_member(db, project, user.id):
+            await query.edit_message_text("پروژه یافت نشد یا دسترسی رد شد.")
+            return
+        text, reply_markup = render_critical_path(project_id, project.name, dependency_graph.get(db, project_id))
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    except Exception as e:
+        logger.error(f"Error in show_critical_path: {e}")
+        await query.edit_message_text("❌ خطایی در بارگذاری مسیر بحرانی رخ داد.")
+
+async def show_dependencies(query, db: Session, user: User, task_id: int, notice: str = None):
+    """Show what a task is blocked by, with buttons to remove blockers or add open tasks as blockers"""
+    try:
+        task = db.get(Task, task_id)
+        if not task or task.section is None or task.section.project is None:
+            await query.edit_message_text("کار یافت نشد.")
+            return
+        project = task.section.project
+        if not is_project_member(db, project, user.id):
+            await query.edit_message_text("دسترسی رد شد.")
+            return
+        
+        graph = dependency_graph.get(db, project.id)
+        blockers = sorted(graph.blockers.get(task_id, ()))
+        text = f"{notice}\n\n" if notice else ""
+        text += f"⛓ وابستگی‌های «{task.title}»\n\n"
         keyboard = []
-        for task in tasks:
-            status_emoji = {"todo": "⭕", "in_progress": "🔄", "done": "✅"}
+        if blockers:
+            text += "مسدود شده توسط:\n"
+            for blocker_id in blockers:
+                done = blocker_id not in graph.open
+                text += f"{'✅' if done else '⛔'} {graph.titles[blocker_id]}\n"
+                keyboard.append([InlineKeyboardButton(
+                    f"✖️ حذف {graph.titles[blocker_id]}", callback_data=f"rmdep_{task_id}_{blocker_id}"
+                )])
+        else:
+            text += "این کار به کار دیگری وابسته نیست.\n"
+        
+        candidates = sorted(graph.open - set(blockers) - {task_id}, reverse=True)[:DEPENDENCY_CHOICES]
+        if candidates:
+            text += "\nبرای افزودن، کاری را که باید پیش از این انجام شود انتخاب کنید:"
+        for blocker_id in candidates:
             keyboard.append([InlineKeyboardButton(
-                f"{status_emoji.get(task.status, '⭕')} {task.title}", 
-                callback_data=f"task_{task.id}"
+                f"➕ {graph.titles[blocker_id]}", callback_data=f"adddep_{task_id}_{blocker_id}"
             )])
+        keyboard.append([InlineKeyboardButton("⬅️ بازگشت", callback_data=f"task_{task_id}")])
+        await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+    except Exception as e:
+        logger.error(f"Error in show_dependencies: {e}")
+        await query.edit_message_text("❌ خطایی در بارگذاری وابستگی‌ها رخ داد.")
+
+async def change_dependency(query, db: Session, user: User, task_id: int, blocker_id: int, add: bool):
+    """Add or remove a "blocked by" edge between two tasks of the same project"""
+    try:
+        project_ids = dict(db.query(Task.id, Section.project_id).join(Section, Section.id == Task.section_id).filter(
+            Task.id.in_((task_id, blocker_id))
+        ).all())
+        project_id = project_ids.get(task_id)
+        if project_id is None or project_ids.get(blocker_id) != project_id:
+            await query.edit_message_text("کار یافت نشد.")
+            return
+        if not is_project_member(db, db.get(Project, project_id), user.id):
+            await query.edit_message_text("دسترسی رد شد.")
+            return
         
-        keyboard.extend([
-            [InlineKeyboardButton("➕ افزودن کار", callback_data=f"add_task_{section.id}")],
-            [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"sections_{project.id}")]
-        ])
+        notice = None
+        if not add:
+            remove_dependency(db, task_id, blocker_id)
+            db.commit()
+            dependency_graph.dependency_removed(project_id, task_id, blocker_id)
+        elif add_dependency(db, project_id, task_id, blocker_id):
+            db.commit()
+            dependency_graph.dependency_added(project_id, task_id, blocker_id)
+        else:
+            notice = "❌ این وابستگی یک چرخه ایجاد می‌کند و افزوده نشد."
+        await show_dependencies(query, db, user, task_id, notice)
+    except Exception as e:
+        logger.error(f"Error in change_dependency: {e}")
+        db.rollback()
+        await query.edit_message_text("❌ خطایی در تغییر وابستگی رخ داد.")
+
+# Owner-only bulk actions: confirmation prompt and the view to return to on cancel
+BULK_ACTIONS = {
+    'delproject': ("⚠️ پروژه همراه با همه بخش‌ها و کارهایش حذف شود؟ این عمل قابل بازگشت نیست.", "project_{}"),
+    'arcproject': ("🗄 همه کارهای این پروژه به بایگانی منتقل شوند؟", "project_{}"),
+    'delsection': ("⚠️ بخش همراه با همه کارهایش حذف شود؟ این عمل قابل بازگشت نیست.", "section_{}"),
+    'arcsection': ("🗄 همه کارهای این بخش به بایگانی منتقل شوند؟", "section_{}"),
+}
+
+async def confirm_bulk_action(query, action: str, target_id: int):
+    """Ask for confirmation before deleting or archiving a project or section"""
+    if action not in BULK_ACTIONS:
+        return
+    prompt, back = BULK_ACTIONS[action]
+    keyboard = [[
+        InlineKeyboardButton("✅ بله", callback_data=f"do_{action}_{target_id}"),
+        InlineKeyboardButton("❌ انصراف", callback_data=back.format(target_id)),
+    ]]
+    await query.edit_message_text(prompt, reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def run_bulk_action(query, db: Session, user: User, action: str, target_id: int):
+    """Delete or archive a project/section with chunked set-based statements (owner only)"""
+    try:
+        if action in ('delproject', 'arcproject'):
+            project = db.get(Project, target_id)
+        elif action in ('delsection', 'arcsection'):
+            section = db.get(Section, target_id)
+            project = section.project if section else None
+        else:
+            return
+        if not project or project.owner_id != user.id:
+            await query.edit_message_text("❌ پروژه یافت نشد یا شما مالک نیستید.")
+            return
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(f"کارهای {section.name}:", reply_markup=reply_markup)
+        project_id = project.id
+        operation = {
+            'delproject': delete_project, 'arcproject': archive_project,
+            'delsection': delete_section, 'arcsection': archive_section,
+        }[action]
+        await query.edit_message_text("⏳ در حال انجام...")
+        # Chunks run in their own short transactions, off the event loop
+        db.commit()
+        count = await asyncio.to_thread(operation, target_id)
+        db.expire_all()
+        read_model.invalidate(project_id)
+        dependency_graph.invalidate(project_id)
+        
+        if action == 'delproject':
+            keyboard = [[InlineKeyboardButton("📋 پروژه‌های من", callback_data="list_projects")]]
+            await query.edit_message_text(f"🗑 پروژه و {count} کار حذف شد.", reply_markup=InlineKeyboardMarkup(keyboard))
+        elif action == 'delsection':
+            await show_sections(query, db, user, project_id)
+        elif action == 'arcproject':
+            await show_project(query, db, user, project_id)
+        else:
+            await show_tasks(query, db, user, target_id)
     except Exception as e:
-        logger.error(f"Error in show_tasks: {e}")
-        await query.edit_message_text("❌ خطایی در بارگذاری کارها رخ داد.")
+        logger.error(f"Error in run_bulk_action ({action} {target_id}): {e}")
+        db.rollback()
+        await query.edit_message_text("❌ خطایی در انجام عملیات رخ داد.")
 
-async def show_task(query, db: Session, user: User, task_id: int):
+async def show_task(query, db: Session, user: User, task_id: int, notice: str = None):
     """Show task details - FIXED: Added proper error handling"""
     try:
-        task = db.query(Task).filter(Task.id == task_id).first()
+        if read_model.enabled:
+            task = read_model.get_task(db, task_id)
+            if not task:
+                await query.edit_message_text("کار یافت نشد.")
+                return
+            project = read_model.projects[read_model.sections[task.section_id].project_id]
+            if not project.can_access(user.id):
+                await query.edit_message_text("دسترسی رد شد.")
+                return
+            text, reply_markup = render_task(
+                task.id, task.title, task.description, task.status, task.assigned_name, task.created_at,
+                task.section_id, task.version, notice, task.priority, task.estimated_hours, task.actual_hours,
+                task.timer_started_at, task.due_date
+            )
+            await query.edit_message_text(text, reply_markup=reply_markup, parse_mode='Markdown')
+            return
+        
+        task = db.get(Task, task_id)
         if not task:
             await query.edit_message_text("کار یافت نشد.")
             return
@@ -303,33 +1017,37 @@ async def show_task(query, db: Session, user: User, task_id: int):
             await query.edit_message_text("دسترسی رد شد.")
             return
         
-        status_emoji = {"todo": "⭕", "in_progress": "🔄", "done": "✅"}
-        status_text = {"todo": "باید انجام شود", "in_progress": "در حال انجام", "done": "تکمیل شده"}
-        text = f"{status_emoji.get(task.status, '⭕')} **{task.title}**\n\n"
-        text += f"📄 توضیحات: {task.description or 'بدون توضیحات'}\n"
-        text += f"📊 وضعیت: {status_text.get(task.status, 'نامشخص')}\n"
-        text += f"👤 واگذار شده به: {task.assigned_to.first_name if task.assigned_to else 'واگذار نشده'}\n"
-        text += f"📅 تاریخ ایجاد: {task.created_at.strftime('%Y-%m-%d %H:%M')}\n"
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("⭕ باید انجام شود", callback_data=f"status_{task.id}_todo"),
-                InlineKeyboardButton("🔄 در حال انجام", callback_data=f"status_{task.id}_in_progress"),
-                InlineKeyboardButton("✅ تکمیل شده", callback_data=f"status_{task.id}_done"),
-            ],
-            [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"section_{task.section.id}")]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        text, reply_markup = render_task(
+            task.id, task.title, task.description, task.status,
+            task.assigned_to.first_name if task.assigned_to else None, task.created_at, task.section.id,
+            task.version, notice, task.priority, task.estimated_hours, task.actual_hours, task.timer_started_at,
+            task.due_date
+        )
         await query.edit_message_text(text, reply_markup=reply_markup, parse_mode='Markdown')
     except Exception as e:
         logger.error(f"Error in show_task: {e}")
         await query.edit_message_text("❌ خطایی در بارگذاری جزئیات کار رخ داد.")
 
-async def update_task_status(query, db: Session, user: User, task_id: int, new_status: str):
-    """Update task status - FIXED: Added proper error handling"""
+# Shown above the task when a status/assignment click lost a race with another member
+CONFLICT_NOTICE = "⚠️ این کار هم‌زمان توسط شخص دیگری تغییر کرد؛ وضعیت فعلی نمایش داده شد."
+
+async def show_task_conflict(query, db: Session, user: User, task_id: int, project_id: int):
+    """Discard the failed write and re-render the task's current state with a conflict notice"""
+    db.rollback()
+    read_model.invalidate(project_id)
+    dependency_graph.invalidate(project_id)
+    await show_task(query, db, user, task_id, notice=CONFLICT_NOTICE)
+
+async def update_task_status(query, db: Session, user: User, task_id: int, new_status: str,
+                             expected_version: int = None):
+    """Update task status with compare-and-swap on Task.version
+
+    expected_version is the version the clicked buttons were rendered with; when the
+    task moved on since, nothing is written and the current state is shown instead.
+    """
+    project_id = None
     try:
-        task = db.query(Task).filter(Task.id == task_id).first()
+        task = db.get(Task, task_id)
         if not task:
             await query.edit_message_text("کار یافت نشد.")
             return
@@ -348,14 +1066,28 @@ async def update_task_status(query, db: Session, user: User, task_id: int, new_s
             await query.edit_message_text("دسترسی رد شد.")
             return
         
+        project_id = project.id
+        if expected_version is not None and task.version != expected_version:
+            await show_task_conflict(query, db, user, task_id, project_id)
+            return
+        
         old_status = task.status
+        if old_status == new_status:
+            await show_task(query, db, user, task_id)
+            return
         task.status = new_status
+        task.completed_at = datetime.now(timezone.utc) if new_status == 'done' else None
+        db.add(TaskEvent(task_id=task_id, project_id=project_id, status=new_status))
+        # UPDATE ... WHERE id = ? AND version = ?; raises StaleDataError if another writer got there first
         db.commit()
+        read_model.task_status_changed(task_id, new_status, task.version)
+        dependency_graph.status_changed(project_id, task_id, new_status)
         
         # Send notification to channel only when task is marked as done
         if project.channel_id and new_status == "done":
             try:
-                logger.info(f"Attempting to send completion notification to channel: {project.channel_id}")
+                logger.info("Sending completion notification to channel %s", project.channel_id,
+                            extra={'event': 'channel_notify_attempt'})
                 notification_message = f"✅ **کار تکمیل شد**\n\n"
                 notification_message += f"📋 پروژه: {project.name}\n"
                 notification_message += f"📂 بخش: {task.section.name}\n"
@@ -364,26 +1096,175 @@ async def update_task_status(query, db: Session, user: User, task_id: int, new_s
                 notification_message += f"📊 وضعیت: تکمیل شده ✅\n"
                 notification_message += f"📅 تاریخ تکمیل: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
                 
-                await query.bot.send_message(
-                    chat_id=project.channel_id,
-                    text=notification_message,
-                    parse_mode='Markdown'
-                )
-                logger.info(f"Completion notification sent successfully to channel: {project.channel_id}")
+                if await channel_notifier.send(query.get_bot(), project.channel_id, notification_message, project):
+                    logger.info("Completion notification sent to channel %s", project.channel_id,
+                                extra={'event': 'channel_notify_sent'})
             except Exception as e:
                 logger.error(f"Failed to send completion notification to channel: {e}")
                 logger.error(f"Channel ID: {project.channel_id}, Project: {project.name}")
         else:
             if not project.channel_id:
-                logger.info(f"No channel configured for project: {project.name}")
+                logger.info("No channel configured for project %s", project_id, extra={'event': 'no_channel'})
             if new_status != "done":
-                logger.info(f"Task status changed to {new_status}, no notification needed")
+                logger.info("Task %s status changed to %s, no notification needed", task_id, new_status,
+                            extra={'event': 'status_changed'})
         
         await show_task(query, db, user, task_id)
+    except StaleDataError:
+        logger.info("Concurrent update of task %s, re-rendering current state", task_id,
+                    extra={'event': 'task_conflict'})
+        await show_task_conflict(query, db, user, task_id, project_id)
     except Exception as e:
         logger.error(f"Error in update_task_status: {e}")
+        db.rollback()
         await query.edit_message_text("❌ خطایی در به‌روزرسانی وضعیت کار رخ داد.")
 
+async def show_assignees(query, db: Session, user: User, task_id: int):
+    """Show the project's owner and members as assignment choices for a task"""
+    try:
+        task = db.get(Task, task_id)
+        project = task.section.project if task and task.section else None
+        if not project:
+            await query.edit_message_text("کار یافت نشد.")
+            return
+        if project.owner_id != user.id and user not in project.members:
+            await query.edit_message_text("دسترسی رد شد.")
+            return
+        
+        candidates = [project.owner] + [member for member in project.members if member.id != project.owner_id]
+        keyboard = []
+        for candidate in candidates:
+            mark = "✔️ " if candidate.id == task.assigned_to_id else ""
+            keyboard.append([InlineKeyboardButton(
+                f"{mark}{candidate.first_name or candidate.username or candidate.telegram_id}",
+                callback_data=f"assignto_{task_id}_{candidate.id}"
+            )])
+        if task.assigned_to_id:
+            keyboard.append([InlineKeyboardButton("🚫 لغو واگذاری", callback_data=f"assignto_{task_id}_0")])
+        keyboard.append([InlineKeyboardButton("⬅️ بازگشت", callback_data=f"task_{task_id}")])
+        await query.edit_message_text(f"کار «{task.title}» را به چه کسی واگذار می‌کنید؟", reply_markup=InlineKeyboardMarkup(keyboard))
+    except Exception as e:
+        logger.error(f"Error in show_assignees: {e}")
+        await query.edit_message_text("❌ خطایی در بارگذاری اعضا رخ داد.")
+
+async def assign_task(query, db: Session, user: User, task_id: int, assignee_id: int):
+    """Assign a task to a project member, or unassign it when assignee_id is 0"""
+    project_id = None
+    try:
+        task = db.get(Task, task_id)
+        project = task.section.project if task and task.section else None
+        if not project:
+            await query.edit_message_text("کار یافت نشد.")
+            return
+        if project.owner_id != user.id and user not in project.members:
+            await query.edit_message_text("دسترسی رد شد.")
+            return
+        
+        project_id = project.id
+        assignee = db.get(User, assignee_id) if assignee_id else None
+        if assignee_id and (assignee is None or (assignee.id != project.owner_id and assignee not in project.members)):
+            await query.edit_message_text("❌ این کاربر عضو پروژه نیست.")
+            return
+        
+        task.assigned_to = assignee
+        db.commit()
+        read_model.task_assigned(task_id, task.assigned_to_id, assignee.first_name if assignee else None, task.version)
+        await show_task(query, db, user, task_id)
+    except StaleDataError:
+        logger.info("Concurrent update of task %s, re-rendering current state", task_id,
+                    extra={'event': 'task_conflict'})
+        await show_task_conflict(query, db, user, task_id, project_id)
+    except Exception as e:
+        logger.error(f"Error in assign_task: {e}")
+        db.rollback()
+        await query.edit_message_text("❌ خطایی در واگذاری کار رخ داد.")
+
+def elapsed_hours(started_at: datetime, now: datetime) -> float:
+    # SQLite hands back naive datetimes; they were stored as UTC
+    if started_at.tzinfo is None:
+        started_at = started_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (now - started_at).total_seconds() / 3600)
+
+async def change_timer(query, db: Session, user: User, task_id: int, start: bool):
+    """Start or stop a task's time tracker; stopping adds the elapsed hours to the task and its rollup"""
+    project_id = None
+    try:
+        task = db.get(Task, task_id)
+        project = task.section.project if task and task.section else None
+        if not project:
+            await query.edit_message_text("کار یافت نشد.")
+            return
+        if project.owner_id != user.id and user not in project.members:
+            await query.edit_message_text("دسترسی رد شد.")
+            return
+        
+        project_id = project.id
+        now = datetime.now(timezone.utc)
+        if start and task.timer_started_at is None:
+            task.timer_started_at = now
+        elif not start and task.timer_started_at is not None:
+            hours = elapsed_hours(task.timer_started_at, now)
+            task.actual_hours = (task.actual_hours or 0.0) + hours
+            task.timer_started_at = None
+            add_to_rollup(db, task.section_id, project_id, task.priority, actual_hours=hours)
+        else:
+            # Already in the requested state (double tap or an old message)
+            await show_task(query, db, user, task_id)
+            return
+        # Same compare-and-swap on Task.version as status changes; a lost race also rolls back the rollup
+        db.commit()
+        read_model.task_tracking_changed(task)
+        await show_task(query, db, user, task_id)
+    except StaleDataError:
+        logger.info("Concurrent update of task %s, re-rendering current state", task_id,
+                    extra={'event': 'task_conflict'})
+        await show_task_conflict(query, db, user, task_id, project_id)
+    except Exception as e:
+        logger.error(f"Error in change_timer: {e}")
+        db.rollback()
+        await query.edit_message_text("❌ خطایی در ثبت زمان رخ داد.")
+
+async def change_priority(query, db: Session, user: User, task_id: int, priority: str):
+    """Set a task's priority and move its hours to the matching rollup row"""
+    project_id = None
+    try:
+        task = db.get(Task, task_id)
+        project = task.section.project if task and task.section else None
+        if not project or priority not in PRIORITIES:
+            await query.edit_message_text("کار یافت نشد.")
+            return
+        if project.owner_id != user.id and user not in project.members:
+            await query.edit_message_text("دسترسی رد شد.")
+            return
+        
+        project_id = project.id
+        old_priority = task.priority
+        if old_priority == priority:
+            await show_task(query, db, user, task_id)
+            return
+        task.priority = priority
+        move_task_priority(db, task, project_id, old_priority)
+        db.commit()
+        read_model.task_tracking_changed(task)
+        await show_task(query, db, user, task_id)
+    except StaleDataError:
+        logger.info("Concurrent update of task %s, re-rendering current state", task_id,
+                    extra={'event': 'task_conflict'})
+        await show_task_conflict(query, db, user, task_id, project_id)
+    except Exception as e:
+        logger.error(f"Error in change_priority: {e}")
+        db.rollback()
+        await query.edit_message_text("❌ خطایی در تغییر اولویت رخ داد.")
+
+def parse_hours(text: str):
+    """Non-negative hours from a message ('2.5', '2,5', '۲٫۵'), or None"""
+    try:
+        hours = float(text.strip().replace('٫', '.').replace(',', '.'))
+    except ValueError:
+        return None
+    return hours if math.isfinite(hours) and hours >= 0 else None
+
+@timed_handler()
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Message handler - FIXED: Added proper error handling"""
     if 'action' not in context.user_data:
@@ -399,7 +1280,6 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             project = Project(name=text, owner_id=user.id)
             db.add(project)
             db.commit()
-            db.refresh(project)
             
             keyboard = [[InlineKeyboardButton("📋 مشاهده پروژه‌ها", callback_data="list_projects")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -411,34 +1291,33 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
         elif action.startswith('add_section_'):
             project_id = int(action.split('_')[2])
-            project = db.query(Project).filter(Project.id == project_id).first()
+            project = db.get(Project, project_id)
             
             if project and (project.owner_id == user.id or user in project.members):
                 section = Section(name=text, project_id=project_id)
                 db.add(section)
                 db.commit()
+                read_model.section_added(section)
                 
                 # Send notification to channel if configured
                 if project.channel_id:
                     try:
-                        logger.info(f"Attempting to send section notification to channel: {project.channel_id}")
+                        logger.info("Sending section notification to channel %s", project.channel_id,
+                                    extra={'event': 'channel_notify_attempt'})
                         notification_message = f"📂 **بخش جدید اضافه شد**\n\n"
                         notification_message += f"📋 پروژه: {project.name}\n"
                         notification_message += f"📂 نام بخش: {text}\n"
                         notification_message += f"👤 اضافه شده توسط: {user.first_name}\n"
                         notification_message += f"📅 تاریخ: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
                         
-                        await update.bot.send_message(
-                            chat_id=project.channel_id,
-                            text=notification_message,
-                            parse_mode='Markdown'
-                        )
-                        logger.info(f"Section notification sent successfully to channel: {project.channel_id}")
+                        if await channel_notifier.send(context.bot, project.channel_id, notification_message, project):
+                            logger.info("Section notification sent to channel %s", project.channel_id,
+                                        extra={'event': 'channel_notify_sent'})
                     except Exception as e:
                         logger.error(f"Failed to send section notification to channel: {e}")
                         logger.error(f"Channel ID: {project.channel_id}, Project: {project.name}")
                 else:
-                    logger.info(f"No channel configured for project: {project.name}")
+                    logger.info("No channel configured for project %s", project_id, extra={'event': 'no_channel'})
                 
                 keyboard = [[InlineKeyboardButton("📂 مشاهده بخش‌ها", callback_data=f"sections_{project_id}")]]
                 reply_markup = InlineKeyboardMarkup(keyboard)
@@ -452,7 +1331,7 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         elif action.startswith('add_task_'):
             section_id = int(action.split('_')[2])
-            section = db.query(Section).filter(Section.id == section_id).first()
+            section = db.get(Section, section_id)
             
             if section:
                 # FIXED: Check project relationship
@@ -464,12 +1343,16 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 if project.owner_id == user.id or user in project.members:
                     task = Task(title=text, section_id=section_id)
                     db.add(task)
+                    add_task_to_rollup(db, task, project.id)
                     db.commit()
+                    read_model.task_added(task)
+                    dependency_graph.task_added(project.id, task.id, task.title, task.status)
                     
                     # Send notification to channel if configured
                     if project.channel_id:
                         try:
-                            logger.info(f"Attempting to send task notification to channel: {project.channel_id}")
+                            logger.info("Sending task notification to channel %s", project.channel_id,
+                                        extra={'event': 'channel_notify_attempt'})
                             notification_message = f"📝 **کار جدید اضافه شد**\n\n"
                             notification_message += f"📋 پروژه: {project.name}\n"
                             notification_message += f"📂 بخش: {section.name}\n"
@@ -478,17 +1361,15 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                             notification_message += f"📊 وضعیت: باید انجام شود\n"
                             notification_message += f"📅 تاریخ: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
                             
-                            await update.bot.send_message(
-                                chat_id=project.channel_id,
-                                text=notification_message,
-                                parse_mode='Markdown'
-                            )
-                            logger.info(f"Task notification sent successfully to channel: {project.channel_id}")
+                            if await channel_notifier.send(context.bot, project.channel_id, notification_message, project):
+                                logger.info("Task notification sent to channel %s", project.channel_id,
+                                            extra={'event': 'channel_notify_sent'})
                         except Exception as e:
                             logger.error(f"Failed to send task notification to channel: {e}")
                             logger.error(f"Channel ID: {project.channel_id}, Project: {project.name}")
                     else:
-                        logger.info(f"No channel configured for project: {project.name}")
+                        logger.info("No channel configured for project %s", project.id,
+                                    extra={'event': 'no_channel'})
                     
                     keyboard = [[InlineKeyboardButton("📝 مشاهده کارها", callback_data=f"section_{section_id}")]]
                     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -504,35 +1385,101 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         elif action.startswith('add_member_'):
             project_id = int(action.split('_')[2])
-            project = db.query(Project).filter(Project.id == project_id).first()
+            project = db.get(Project, project_id)
             
             if project and project.owner_id == user.id:
-                try:
-                    telegram_id = int(text)
-                    new_user = db.query(User).filter(User.telegram_id == telegram_id).first()
+                telegram_ids, usernames = parse_member_refs(text)
+                if not telegram_ids and not usernames:
+                    await update.message.reply_text("❌ شناسه تلگرام یا نام کاربری معتبری ارسال نشد.")
+                elif len(telegram_ids) + len(usernames) > MAX_MEMBERS_PER_MESSAGE:
+                    await update.message.reply_text(f"❌ حداکثر {MAX_MEMBERS_PER_MESSAGE} نفر در هر پیام قابل افزودن است.")
+                else:
+                    user_ids, added, unresolved = add_members(db, project, telegram_ids, usernames)
+                    for user_id in user_ids:
+                        read_model.member_added(project_id, user_id)
                     
-                    if new_user:
-                        if new_user not in project.members:
-                            project.members.append(new_user)
-                            db.commit()
-                            await update.message.reply_text(f"✅ کاربر {new_user.first_name} به پروژه اضافه شد!")
-                        else:
-                            await update.message.reply_text("❌ کاربر قبلاً عضو این پروژه است.")
-                    else:
-                        await update.message.reply_text("❌ کاربر یافت نشد. ابتدا باید ربات را شروع کنند.")
-                except ValueError:
-                    await update.message.reply_text("❌ شناسه تلگرام نامعتبر است. لطفاً یک شناسه عددی ارسال کنید.")
+                    reply = f"✅ {added} عضو جدید به پروژه اضافه شد."
+                    if len(user_ids) > added:
+                        reply += f"\nℹ️ {len(user_ids) - added} نفر قبلاً عضو این پروژه بودند."
+                    if unresolved:
+                        reply += f"\n❌ یافت نشد (ابتدا باید ربات را شروع کنند): {', '.join(unresolved)}"
+                    keyboard = [[InlineKeyboardButton("👥 مشاهده اعضا", callback_data=f"members_{project_id}")]]
+                    await update.message.reply_text(reply, reply_markup=InlineKeyboardMarkup(keyboard))
             else:
                 await update.message.reply_text("❌ پروژه یافت نشد یا شما مالک نیستید.")
         
+        elif action.startswith('set_estimate_'):
+            task_id = int(action.split('_')[2])
+            task = db.get(Task, task_id)
+            project = task.section.project if task and task.section else None
+            hours = parse_hours(text)
+            
+            if not project or (project.owner_id != user.id and user not in project.members):
+                await update.message.reply_text("❌ کار یافت نشد یا دسترسی رد شد.")
+            elif hours is None:
+                await update.message.reply_text("❌ لطفاً تعداد ساعت را به صورت عدد ارسال کنید (مثلاً 2.5).")
+            else:
+                keyboard = [[InlineKeyboardButton("📝 مشاهده کار", callback_data=f"task_{task_id}")]]
+                add_to_rollup(db, task.section_id, project.id, task.priority,
+                              estimated_hours=hours - (task.estimated_hours or 0.0))
+                task.estimated_hours = hours
+                try:
+                    db.commit()
+                except StaleDataError:
+                    db.rollback()
+                    read_model.invalidate(project.id)
+                    await update.message.reply_text("⚠️ این کار هم‌زمان تغییر کرد؛ لطفاً دوباره تلاش کنید.",
+                                                    reply_markup=InlineKeyboardMarkup(keyboard))
+                else:
+                    read_model.task_tracking_changed(task)
+                    await update.message.reply_text(f"✅ برآورد {format_hours(hours)} ساعت ثبت شد.",
+                                                    reply_markup=InlineKeyboardMarkup(keyboard))
+        
+        elif action.startswith('set_due_'):
+            task_id = int(action.split('_')[2])
+            task = db.get(Task, task_id)
+            project = task.section.project if task and task.section else None
+            clear = text.strip() == '-'
+            due_date = None if clear else parse_due_date(text)
+            
+            if not project or (project.owner_id != user.id and user not in project.members):
+                await update.message.reply_text("❌ کار یافت نشد یا دسترسی رد شد.")
+            elif due_date is None and not clear:
+                await update.message.reply_text("❌ تاریخ نامعتبر است؛ به صورت YYYY-MM-DD ارسال کنید (مثلاً 2026-11-30).")
+            else:
+                keyboard = [[InlineKeyboardButton("📝 مشاهده کار", callback_data=f"task_{task_id}")]]
+                task.due_date = due_date
+                try:
+                    db.commit()
+                except StaleDataError:
+                    db.rollback()
+                    read_model.invalidate(project.id)
+                    await update.message.reply_text("⚠️ این کار هم‌زمان تغییر کرد؛ لطفاً دوباره تلاش کنید.",
+                                                    reply_markup=InlineKeyboardMarkup(keyboard))
+                else:
+                    read_model.task_due_date_changed(task_id, task.due_date, task.version)
+                    reply = f"✅ مهلت {due_date.strftime('%Y-%m-%d')} ثبت شد." if due_date else "✅ مهلت حذف شد."
+                    await update.message.reply_text(reply, reply_markup=InlineKeyboardMarkup(keyboard))
+        
         elif action.startswith('set_channel_'):
             project_id = int(action.split('_')[2])
-            project = db.query(Project).filter(Project.id == project_id).first()
+            project = db.get(Project, project_id)
             
             if project and project.owner_id == user.id:
-                project.channel_id = text
-                db.commit()
-                await update.message.reply_text(f"✅ کانال به‌روزرسانی به {text} تنظیم شد")
+                try:
+                    # Store the numeric id so renamed channels keep working and sends skip resolution
+                    channel_id = await channel_notifier.resolve(context.bot, text)
+                except TelegramError as e:
+                    logger.info(f"Channel {text} could not be resolved: {e}")
+                    await update.message.reply_text(
+                        "❌ کانال یافت نشد یا ربات به آن دسترسی ندارد. ربات را به عنوان مدیر به کانال اضافه کنید و دوباره تلاش کنید."
+                    )
+                else:
+                    project.channel_id = channel_id
+                    db.commit()
+                    read_model.channel_set(project_id, channel_id)
+                    channel_notifier.reset(channel_id)
+                    await update.message.reply_text(f"✅ کانال به‌روزرسانی به {text} تنظیم شد")
             else:
                 await update.message.reply_text("❌ پروژه یافت نشد یا شما مالک نیستید.")
         
@@ -541,12 +1488,73 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
     except Exception as e:
         logger.error(f"Error in message handler: {e}")
+        db.rollback()
         await update.message.reply_text("❌ خطایی رخ داد. لطفاً دوباره تلاش کنید.")
     finally:
-        db.close()
+        release_session(db)
+
+def invalidate_archived(moved: dict):
+    """Drop projects whose tasks were archived from this process's read model"""
+    for project_id in moved:
+        read_model.invalidate(project_id)
+        dependency_graph.invalidate(project_id)
+
+async def db_maintenance_job(context: ContextTypes.DEFAULT_TYPE):
+    """Periodic WAL checkpoint and PRAGMA optimize, run off the event loop"""
+    try:
+        result = await asyncio.to_thread(sqlite_maintenance)
+        if result:
+            logger.info(f"SQLite maintenance done, wal_checkpoint: {result}")
+    except Exception as e:
+        logger.error(f"Error in database maintenance: {e}")
+
+@timed_handler()
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin-only /stats command showing handler and API latency"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("❌ دسترسی رد شد.")
+        return
+    await update.message.reply_text(render_stats(), parse_mode='Markdown')
+
+def build_application(run_jobs: bool = True, updater: bool = True) -> Application:
+    """Create the Application with all handlers; jobs are scheduled only when run_jobs is set"""
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .base_url(f"{TELEGRAM_API_URL}/bot")
+        .base_file_url(f"{TELEGRAM_API_URL}/file/bot")
+        .request(send_request())
+    )
+    if updater:
+        builder = builder.get_updates_request(poll_request())
+    else:
+        builder = builder.updater(None)
+    application = builder.build()
+    
+    install_throttle(application)
+    install_unit_of_work(application)
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("mytasks", my_tasks_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CallbackQueryHandler(button_handler))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler))
+    
+    if not run_jobs:
+        return application
+    if application.job_queue:
+        schedule_daily_digest(application.job_queue)
+        schedule_archival(application.job_queue, on_archived=invalidate_archived)
+        application.job_queue.run_repeating(
+            db_maintenance_job, interval=DB_MAINTENANCE_INTERVAL, first=DB_MAINTENANCE_INTERVAL,
+            name='db_maintenance'
+        )
+    else:
+        logger.warning("JobQueue not available, daily digest and DB maintenance disabled (install python-telegram-bot[job-queue])")
+    return application
 
 def main():
     """Main function"""
+    setup_logging()
     if BOT_TOKEN == "YOUR_BOT_TOKEN_HERE":
         print("❌ خطا: لطفاً توکن ربات خود را تنظیم کنید!")
         print("1. از @BotFather در تلگرام توکن دریافت کنید")
@@ -554,18 +1562,36 @@ def main():
         return
     
     try:
-        application = Application.builder().token(BOT_TOKEN).build()
+        if WEBHOOK_URL and BOT_WORKERS > 1:
+            # One webhook receiver fanning updates out to worker processes by user/chat id
+            from sharding import run_sharded
+            print(f"🚀 ربات با {BOT_WORKERS} پردازش در حال راه‌اندازی...")
+            run_sharded(BOT_WORKERS)
+            return
+        
+        instrument_engine(init_db())
+        # Analytics and digests run on the read engine (the write engine unless file-backed SQLite)
+        instrument_engine(models.read_engine)
+        application = build_application()
         
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(CallbackQueryHandler(button_handler))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler))
+        if METRICS_PORT:
+            start_metrics_server(METRICS_PORT)
         
         print("🚀 ربات در حال راه‌اندازی...")
         print("برای توقف Ctrl+C را فشار دهید")
-        application.run_polling()
+        if WEBHOOK_URL:
+            application.run_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                url_path=BOT_TOKEN,
+                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{BOT_TOKEN}",
+                secret_token=WEBHOOK_SECRET
+            )
+        else:
+            application.run_polling()
     except Exception as e:
         print(f"❌ خطا در راه‌اندازی ربات: {e}")
         print("مطمئن شوید که توکن ربات شما صحیح است!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
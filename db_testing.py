@@ -0,0 +1,29 @@
+"""
+Database helpers shared by the test suite.
+
+Tests run against in-memory SQLite by default. Set TEST_DATABASE_URL to run the
+same suite against PostgreSQL, e.g. with a throwaway container:
+
+    docker run --rm -d -p 5432:5432 -e POSTGRES_PASSWORD=pm postgres:16
+    TEST_DATABASE_URL=postgresql+psycopg2://postgres:pm@localhost/postgres python -m pytest
+
+or a temporary cluster (initdb -D /tmp/pg && pg_ctl -D /tmp/pg start).
+"""
+
+import os
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from models import Base, create_db_engine
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL', '')
+
+def make_test_engine():
+    """Fresh, empty schema on the configured test backend"""
+    if not TEST_DATABASE_URL:
+        # One shared connection, so work handed to threads (asyncio.to_thread) sees the same database
+        engine = create_engine('sqlite:///:memory:', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    else:
+        engine = create_db_engine(TEST_DATABASE_URL)
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    return engine
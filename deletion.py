@@ -0,0 +1,84 @@
+import logging
+import os
+from sqlalchemy import delete, select
+from models import (
+    SessionLocal, ArchivedTask, Project, Section, Task, TaskEvent, TaskRollup, project_members, task_dependencies
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows deleted per transaction; each chunk is one DELETE ... WHERE id IN (SELECT ... LIMIT n)
+DELETE_BATCH_SIZE = int(os.getenv('DELETE_BATCH_SIZE', '2000'))
+
+def delete_in_chunks(id_column, criteria, batch_size: int = DELETE_BATCH_SIZE, session_factory=SessionLocal) -> int:
+    """Delete rows of id_column's table matching criteria, committing every batch_size rows
+
+    No rows are loaded into Python and the write lock is released between chunks.
+    Returns the number of rows deleted.
+    """
+    deleted = 0
+    while True:
+        db = session_factory()
+        try:
+            result = db.execute(delete(id_column.table).where(
+                id_column.in_(select(id_column).where(*criteria).limit(batch_size))
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+def delete_section(section_id: int, batch_size: int = DELETE_BATCH_SIZE, session_factory=SessionLocal) -> int:
+    """Delete a section with its hot and archived tasks, their history and rollups; returns the number of tasks removed"""
+    edges = task_dependencies.c
+    for task_ids in (select(Task.id).where(Task.section_id == section_id),
+                     select(ArchivedTask.id).where(ArchivedTask.section_id == section_id)):
+        delete_in_chunks(TaskEvent.id, (TaskEvent.task_id.in_(task_ids),), batch_size, session_factory)
+        # Dependency edges are few per task; one statement each side is enough
+        db = session_factory()
+        try:
+            db.execute(delete(task_dependencies).where(edges.task_id.in_(task_ids)))
+            db.execute(delete(task_dependencies).where(edges.blocked_by_id.in_(task_ids)))
+            db.commit()
+        finally:
+            db.close()
+    removed = delete_in_chunks(Task.id, (Task.section_id == section_id,), batch_size, session_factory)
+    removed += delete_in_chunks(ArchivedTask.id, (ArchivedTask.section_id == section_id,), batch_size,
+                                session_factory)
+    db = session_factory()
+    try:
+        db.execute(delete(TaskRollup).where(TaskRollup.section_id == section_id))
+        db.execute(delete(Section).where(Section.id == section_id))
+        db.commit()
+    finally:
+        db.close()
+    logger.info(f"Deleted section {section_id} with {removed} tasks")
+    return removed
+
+def delete_project(project_id: int, batch_size: int = DELETE_BATCH_SIZE, session_factory=SessionLocal) -> int:
+    """Delete a project with its sections, tasks, archived tasks, history, dependencies, rollups and memberships
+
+    Returns the number of tasks removed.
+    """
+    delete_in_chunks(TaskEvent.id, (TaskEvent.project_id == project_id,), batch_size, session_factory)
+    section_ids = select(Section.id).where(Section.project_id == project_id)
+    removed = delete_in_chunks(Task.id, (Task.section_id.in_(section_ids),), batch_size, session_factory)
+    removed += delete_in_chunks(ArchivedTask.id, (ArchivedTask.project_id == project_id,), batch_size,
+                                session_factory)
+    db = session_factory()
+    try:
+        db.execute(delete(project_members).where(project_members.c.project_id == project_id))
+        db.execute(delete(task_dependencies).where(task_dependencies.c.project_id == project_id))
+        db.execute(delete(TaskRollup).where(TaskRollup.project_id == project_id))
+        db.execute(delete(Section).where(Section.project_id == project_id))
+        db.execute(delete(Project).where(Project.id == project_id))
+        db.commit()
+    finally:
+        db.close()
+    logger.info(f"Deleted project {project_id} with {removed} tasks")
+    return removed
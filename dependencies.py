@@ -0,0 +1,256 @@
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from sqlalchemy import delete, exists, select
+from sqlalchemy.orm import Session
+from models import Project, Section, Task, insert_ignore, task_dependencies
+
+logger = logging.getLogger(__name__)
+
+# Projects are reloaded after this many seconds; bounds staleness across worker processes
+DEPENDENCY_GRAPH_TTL = float(os.getenv('DEPENDENCY_GRAPH_TTL', '300'))
+DEPENDENCY_GRAPH_MAX_PROJECTS = int(os.getenv('DEPENDENCY_GRAPH_MAX_PROJECTS', '1000'))
+
+def creates_cycle(db: Session, task_id: int, blocker_id: int) -> bool:
+    """True when blocker_id already depends on task_id, directly or transitively
+
+    Walks the blockers of blocker_id with one recursive query.
+    """
+    if task_id == blocker_id:
+        return True
+    edges = task_dependencies.c
+    reachable = select(edges.blocked_by_id.label('id')).where(edges.task_id == blocker_id).cte(
+        'reachable', recursive=True
+    )
+    reachable = reachable.union(
+        select(edges.blocked_by_id).join(reachable, edges.task_id == reachable.c.id)
+    )
+    return db.query(exists().where(reachable.c.id == task_id)).scalar()
+
+def add_dependency(db: Session, project_id: int, task_id: int, blocker_id: int) -> bool:
+    """Mark task_id as blocked by blocker_id; returns False, writing nothing, if that closes a cycle
+
+    The project row stays locked (SELECT ... FOR UPDATE) until the caller commits, so two
+    workers cannot each add one edge of a cycle. SQLite has no row locks but lets only one
+    writer commit on top of what it read.
+    """
+    db.query(Project.id).filter(Project.id == project_id).with_for_update().scalar()
+    if creates_cycle(db, task_id, blocker_id):
+        return False
+    db.execute(insert_ignore(db, task_dependencies, ['task_id', 'blocked_by_id']).values(
+        task_id=task_id, blocked_by_id=blocker_id, project_id=project_id
+    ))
+    return True
+
+def remove_dependency(db: Session, task_id: int, blocker_id: int):
+    """Drop the edge making task_id wait for blocker_id"""
+    db.execute(delete(task_dependencies).where(
+        task_dependencies.c.task_id == task_id, task_dependencies.c.blocked_by_id == blocker_id
+    ))
+
+class ProjectGraph:
+    """Dependency graph of one project with its ready set and critical-path heights
+
+    height is the number of open tasks on the longest chain that starts at a task and
+    follows its dependents; the critical path starts at the open task with the largest
+    height. Done tasks have height 0 and block nothing. add_dependency keeps the edges
+    acyclic; should a cycle reach the table anyway, heights are capped at the number of
+    open tasks and walks stop at tasks already visited, so nothing loops forever.
+    """
+    __slots__ = ('titles', 'open', 'blockers', 'dependents', 'open_blockers', 'height', 'ready', 'loaded_at')
+
+    def __init__(self):
+        self.titles = {}
+        self.open = set()
+        self.blockers = {}
+        self.dependents = {}
+        self.open_blockers = {}
+        self.height = {}
+        self.ready = set()
+        self.loaded_at = time.monotonic()
+
+    def state(self, task_id: int):
+        """'blocked' or 'ready' for open tasks with dependencies, otherwise None"""
+        if task_id not in self.open or not self.blockers.get(task_id):
+            return None
+        return 'blocked' if self.open_blockers[task_id] else 'ready'
+
+    def critical_path(self):
+        """Task ids of the longest chain of open tasks, first to last"""
+        if not self.open:
+            return []
+        task_id = max(self.open, key=lambda t: (self.height[t], -t))
+        path = [task_id]
+        visited = {task_id}
+        while True:
+            following = [d for d in self.dependents[task_id] if d in self.open and d not in visited]
+            if not following:
+                return path
+            task_id = max(following, key=lambda t: (self.height[t], -t))
+            path.append(task_id)
+            visited.add(task_id)
+
+    def ready_queue(self, limit: int = None):
+        """Open unblocked tasks, those gating the longest chains first"""
+        return sorted(self.ready, key=lambda t: (-self.height[t], t))[:limit]
+
+    # -- maintenance --------------------------------------------------------------
+
+    def add_task(self, task_id: int, title: str, status: str):
+        self.titles[task_id] = title
+        self.blockers.setdefault(task_id, set())
+        self.dependents.setdefault(task_id, set())
+        self.open_blockers.setdefault(task_id, 0)
+        self.height[task_id] = 0
+        if status != 'done':
+            self.open.add(task_id)
+            self.height[task_id] = 1
+            if not self.open_blockers[task_id]:
+                self.ready.add(task_id)
+
+    def set_status(self, task_id: int, status: str):
+        is_open = status != 'done'
+        if task_id not in self.titles or (task_id in self.open) == is_open:
+            return
+        if is_open:
+            self.open.add(task_id)
+            if not self.open_blockers[task_id]:
+                self.ready.add(task_id)
+        else:
+            self.open.discard(task_id)
+            self.ready.discard(task_id)
+        change = 1 if is_open else -1
+        for dependent in self.dependents[task_id]:
+            self.open_blockers[dependent] += change
+            if dependent in self.open:
+                if self.open_blockers[dependent]:
+                    self.ready.discard(dependent)
+                else:
+                    self.ready.add(dependent)
+        self._propagate(task_id)
+
+    def add_edge(self, task_id: int, blocker_id: int):
+        if task_id not in self.titles or blocker_id not in self.titles or blocker_id in self.blockers[task_id]:
+            return
+        self.blockers[task_id].add(blocker_id)
+        self.dependents[blocker_id].add(task_id)
+        if blocker_id in self.open:
+            self.open_blockers[task_id] += 1
+            self.ready.discard(task_id)
+        self._propagate(blocker_id)
+
+    def remove_edge(self, task_id: int, blocker_id: int):
+        if blocker_id not in self.blockers.get(task_id, ()):
+            return
+        self.blockers[task_id].discard(blocker_id)
+        self.dependents[blocker_id].discard(task_id)
+        if blocker_id in self.open:
+            self.open_blockers[task_id] -= 1
+            if task_id in self.open and not self.open_blockers[task_id]:
+                self.ready.add(task_id)
+        self._propagate(blocker_id)
+
+    def _height(self, task_id: int) -> int:
+        if task_id not in self.open:
+            return 0
+        # No chain is longer than the open tasks; the cap ends _propagate on a cycle
+        return min(len(self.open), 1 + max((self.height[d] for d in self.dependents[task_id] if d in self.open),
+                                           default=0))
+
+    def _propagate(self, task_id: int):
+        """Recompute task_id's height and walk up through its blockers only while heights change"""
+        pending = deque([task_id])
+        while pending:
+            current = pending.popleft()
+            height = self._height(current)
+            if height != self.height[current]:
+                self.height[current] = height
+                pending.extend(self.blockers[current])
+
+    def compute_heights(self):
+        """Full computation in reverse topological order, used once on load"""
+        waiting = {t: sum(1 for d in self.dependents[t] if d in self.open) for t in self.open}
+        pending = [t for t, count in waiting.items() if not count]
+        while pending:
+            task_id = pending.pop()
+            self.height[task_id] = self._height(task_id)
+            for blocker in self.blockers[task_id]:
+                if blocker in waiting:
+                    waiting[blocker] -= 1
+                    if not waiting[blocker]:
+                        pending.append(blocker)
+
+class DependencyGraph:
+    """Per-process, lazily loaded dependency graphs kept current by the write paths in bot.py
+
+    Marking a task done only touches its dependents' blocker counts and the heights of
+    tasks upstream of it, instead of rebuilding the project's graph.
+    """
+
+    def __init__(self, ttl: float = DEPENDENCY_GRAPH_TTL, max_projects: int = DEPENDENCY_GRAPH_MAX_PROJECTS):
+        self.ttl = ttl
+        self.max_projects = max_projects
+        self.projects = OrderedDict()
+
+    def get(self, db: Session, project_id: int) -> ProjectGraph:
+        graph = self.projects.get(project_id)
+        if graph is not None and time.monotonic() - graph.loaded_at < self.ttl:
+            self.projects.move_to_end(project_id)
+            return graph
+        return self._load(db, project_id)
+
+    # -- write-through ----------------------------------------------------------
+
+    def task_added(self, project_id: int, task_id: int, title: str, status: str = 'todo'):
+        graph = self.projects.get(project_id)
+        if graph is not None:
+            graph.add_task(task_id, title, status)
+
+    def status_changed(self, project_id: int, task_id: int, status: str):
+        graph = self.projects.get(project_id)
+        if graph is not None:
+            graph.set_status(task_id, status)
+
+    def dependency_added(self, project_id: int, task_id: int, blocker_id: int):
+        graph = self.projects.get(project_id)
+        if graph is not None:
+            graph.add_edge(task_id, blocker_id)
+
+    def dependency_removed(self, project_id: int, task_id: int, blocker_id: int):
+        graph = self.projects.get(project_id)
+        if graph is not None:
+            graph.remove_edge(task_id, blocker_id)
+
+    def invalidate(self, project_id: int):
+        self.projects.pop(project_id, None)
+
+    def clear(self):
+        self.projects.clear()
+
+    # -- loading ----------------------------------------------------------------
+
+    def _load(self, db: Session, project_id: int) -> ProjectGraph:
+        graph = ProjectGraph()
+        for task_id, title, status in db.query(Task.id, Task.title, Task.status).join(
+            Section, Section.id == Task.section_id
+        ).filter(Section.project_id == project_id):
+            graph.add_task(task_id, title, status)
+
+        edges = db.query(task_dependencies.c.task_id, task_dependencies.c.blocked_by_id).filter(
+            task_dependencies.c.project_id == project_id
+        )
+        for task_id, blocker_id in edges:
+            # Archived or deleted blockers are done as far as the graph is concerned
+            if task_id in graph.titles and blocker_id in graph.titles:
+                graph.blockers[task_id].add(blocker_id)
+                graph.dependents[blocker_id].add(task_id)
+                if blocker_id in graph.open:
+                    graph.open_blockers[task_id] += 1
+                    graph.ready.discard(task_id)
+        graph.compute_heights()
+
+        self.projects[project_id] = graph
+        while len(self.projects) > self.max_projects:
+            self.projects.popitem(last=False)
+        return graph
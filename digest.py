@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from models import ReadSessionLocal, ArchivedTask, Project, Section, Task, TaskEvent
+from notifications import channel_notifier
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows roughly 20 messages per minute to the same group/channel and
+# ~30 messages per second overall; one digest per channel only needs the latter.
+DIGEST_SEND_INTERVAL = float(os.getenv('DIGEST_SEND_INTERVAL', '0.05'))
+DIGEST_TIME = os.getenv('DIGEST_TIME', '09:00')
+
+@dataclass
+class ProjectDigest:
+    project_id: int
+    project_name: str
+    channel_id: str
+    total: int = 0
+    done: int = 0
+    completed: int = 0
+    added: int = 0
+    overdue: int = 0
+
+    @property
+    def progress(self) -> int:
+        """Completion percentage of the project"""
+        return round(self.done * 100 / self.total) if self.total else 0
+
+def collect_digests(db: Session, since: datetime, now: datetime = None):
+    """Compute digest counters for every project with a channel in four queries
+
+    Completions come from task_events: updated_at moves on every edit of a task, long
+    after it was done.
+    """
+    now = now or datetime.now(timezone.utc)
+
+    digests = {
+        project_id: ProjectDigest(project_id, name, channel_id)
+        for project_id, name, channel_id in db.query(
+            Project.id, Project.name, Project.channel_id
+        ).filter(Project.channel_id.isnot(None), Project.channel_id != '')
+    }
+    if not digests:
+        return []
+
+    is_done = Task.status == 'done'
+    rows = db.query(
+        Section.project_id,
+        func.count(Task.id),
+        func.sum(case((is_done, 1), else_=0)),
+        func.sum(case((Task.created_at >= since, 1), else_=0)),
+        func.sum(case((~is_done & (Task.due_date < now), 1), else_=0)),
+    ).join(Task, Task.section_id == Section.id).filter(
+        Section.project_id.in_(digests.keys())
+    ).group_by(Section.project_id)
+
+    for project_id, total, done, added, overdue in rows:
+        digest = digests[project_id]
+        digest.total = total
+        digest.done = done or 0
+        digest.added = added or 0
+        digest.overdue = overdue or 0
+
+    for project_id, completed in db.query(TaskEvent.project_id, func.count(TaskEvent.task_id.distinct())).filter(
+        TaskEvent.project_id.in_(digests.keys()), TaskEvent.status == 'done', TaskEvent.at >= since
+    ).group_by(TaskEvent.project_id):
+        digests[project_id].completed = completed
+
+    # Archived tasks still count toward progress; archiving a whole section or project
+    # also moves open ones, which stay unfinished
+    for project_id, archived, archived_done in db.query(
+        ArchivedTask.project_id, func.count(ArchivedTask.id), func.sum(case((ArchivedTask.status == 'done', 1), else_=0))
+    ).filter(ArchivedTask.project_id.in_(digests.keys())).group_by(ArchivedTask.project_id):
+        digests[project_id].total += archived
+        digests[project_id].done += archived_done or 0
+
+    return list(digests.values())
+
+def format_digest(digest: ProjectDigest, now: datetime = None) -> str:
+    """Build the Persian daily summary message for a project channel"""
+    now = now or datetime.now()
+    message = f"📊 **گزارش روزانه پروژه**\n\n"
+    message += f"📋 پروژه: {digest.project_name}\n"
+    message += f"✅ تکمیل شده امروز: {digest.completed}\n"
+    message += f"📝 کارهای جدید: {digest.added}\n"
+    message += f"⏰ کارهای عقب‌افتاده: {digest.overdue}\n"
+    message += f"📈 پیشرفت: {digest.progress}% ({digest.done}/{digest.total})\n"
+    message += f"📅 تاریخ: {now.strftime('%Y-%m-%d')}"
+    return message
+
+async def send_digests(bot, digests, interval: float = DIGEST_SEND_INTERVAL, notifier=None):
+    """Send digests one channel at a time; a failing channel does not stop the rest
+
+    With a notifier (see notifications.py) channels whose circuit is open are skipped.
+    """
+    results = {}
+    for index, digest in enumerate(digests):
+        if index and interval:
+            await asyncio.sleep(interval)
+        if notifier is not None:
+            results[digest.project_id] = await notifier.send(bot, digest.channel_id, format_digest(digest))
+            continue
+        try:
+            await bot.send_message(
+                chat_id=digest.channel_id,
+                text=format_digest(digest),
+                parse_mode='Markdown'
+            )
+            results[digest.project_id] = True
+        except Exception as e:
+            logger.error(f"Failed to send daily digest to channel {digest.channel_id}: {e}")
+            results[digest.project_id] = False
+    return results
+
+def channel_digests(since: datetime, now: datetime = None):
+    """collect_digests in a session of its own, for use off the event loop"""
+    db = ReadSessionLocal()
+    try:
+        return collect_digests(db, since, now)
+    finally:
+        db.close()
+
+async def daily_digest_job(context):
+    """JobQueue callback sending the last 24 hours summary to every project channel"""
+    now = datetime.now(timezone.utc)
+    # Aggregates over every task of every channel project; keep them off the event loop
+    digests = await asyncio.to_thread(channel_digests, now - timedelta(days=1), now)
+
+    results = await send_digests(context.bot, digests, notifier=channel_notifier)
+    failed = sum(1 for sent in results.values() if not sent)
+    logger.info(f"Daily digest sent to {len(results) - failed} channels, {failed} failed")
+
+def schedule_daily_digest(job_queue, at: str = DIGEST_TIME):
+    """Register the daily digest job at the given HH:MM (UTC)"""
+    hour, minute = (int(part) for part in at.split(':'))
+    return job_queue.run_daily(
+        daily_digest_job,
+        time=time(hour, minute, tzinfo=timezone.utc),
+        name='daily_digest'
+    )
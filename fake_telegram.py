@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Telegram Bot API, for offline end-to-end load testing.
+
+Implements getMe, getUpdates, getChat, sendMessage, sendPhoto, editMessageText,
+answerCallbackQuery, setWebhook/deleteWebhook/getWebhookInfo and webhook push, with configurable
+latency, 429 injection, per-chat flood limits and message-size enforcement.
+
+    python fake_telegram.py --port 8081 --latency 0.05 --error-rate 0.01 --rate 50
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=123:fake python bot.py
+"""
+
+import argparse
+import email.parser
+import email.policy
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+import urllib.request
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+MAX_CAPTION_LENGTH = 1024
+MAX_CALLBACK_DATA = 64
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+class FakeTelegramServer:
+    """In-process fake Bot API; thread-safe so it can serve a real bot over HTTP"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, latency_jitter=0.0, error_rate=0.0,
+                 retry_after=1, chat_interval=0.0, max_message_length=MAX_MESSAGE_LENGTH, seed=None):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.chat_interval = chat_interval
+        self.max_message_length = max_message_length
+        self.webhook_url = None
+        self.webhook_secret = None
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Condition()
+        self._updates = deque()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._last_send = {}
+        self.messages = {}
+        self.stats = {'requests': 0, 'rate_limited': 0, 'rejected': 0, 'webhook_pushes': 0, 'webhook_errors': 0}
+
+        self._httpd = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-telegram', daemon=True)
+        self._thread.start()
+        logger.info(f"Fake Telegram Bot API listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    # -- update injection ---------------------------------------------------
+
+    def push_update(self, update: dict):
+        """Queue an update for getUpdates, or deliver it to the webhook if one is set"""
+        with self._lock:
+            update = dict(update, update_id=next(self._update_ids))
+            webhook_url = self.webhook_url
+            if not webhook_url:
+                self._updates.append(update)
+                self._lock.notify_all()
+        if webhook_url:
+            threading.Thread(target=self._deliver_webhook, args=(webhook_url, update), daemon=True).start()
+        return update['update_id']
+
+    def send_text(self, user_id: int, text: str, first_name: str = None):
+        """Simulate a user sending a private text message (or /command) to the bot"""
+        message = self._message(user_id, text, sender=self._user(user_id, first_name))
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return self.push_update({'message': message})
+
+    def press_button(self, user_id: int, data: str, message_id: int = None, first_name: str = None):
+        """Simulate a user pressing an inline keyboard button"""
+        user = self._user(user_id, first_name)
+        message = self.messages.get((user_id, message_id)) or self._message(user_id, '…', sender=self._bot_user())
+        return self.push_update({'callback_query': {
+            'id': str(next(self._update_ids)),
+            'from': user,
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': message,
+        }})
+
+    # -- Bot API methods -----------------------------------------------------
+
+    def api_getMe(self, params):
+        return self._bot_user()
+
+    def api_getUpdates(self, params):
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._updates and self._updates[0]['update_id'] < offset:
+                self._updates.popleft()
+            while not self._updates and time.monotonic() < deadline:
+                self._lock.wait(deadline - time.monotonic())
+            return list(itertools.islice(self._updates, limit))
+
+    def api_sendMessage(self, params):
+        chat_id = self._chat_id(params['chat_id'])
+        self._check_text(params.get('text', ''))
+        self._check_markup(params.get('reply_markup'))
+        self._check_flood(chat_id)
+        message = self._message(chat_id, params['text'], sender=self._bot_user(),
+                                reply_markup=params.get('reply_markup'))
+        with self._lock:
+            self.messages[(chat_id, message['message_id'])] = message
+        return message
+
+    def api_sendPhoto(self, params):
+        chat_id = self._chat_id(params['chat_id'])
+        photo = params['photo']
+        if isinstance(photo, str) and photo.startswith('attach://'):
+            photo = params[photo[len('attach://'):]]
+        if not photo:
+            raise ApiError(400, 'Bad Request: there is no photo in the request')
+        caption = params.get('caption') or ''
+        if len(caption) > MAX_CAPTION_LENGTH:
+            self.stats['rejected'] += 1
+            raise ApiError(400, 'Bad Request: message caption is too long')
+        self._check_markup(params.get('reply_markup'))
+        self._check_flood(chat_id)
+        message = self._message(chat_id, None, sender=self._bot_user(), reply_markup=params.get('reply_markup'))
+        # Uploads arrive as bytes, re-sent photos as a file_id string
+        file_id = photo if isinstance(photo, str) else f"photo-{message['message_id']}"
+        size = {'file_id': file_id, 'file_unique_id': file_id, 'width': 800, 'height': 600}
+        if isinstance(photo, bytes):
+            size['file_size'] = len(photo)
+        message['photo'] = [size]
+        if caption:
+            message['caption'] = caption
+        with self._lock:
+            self.messages[(chat_id, message['message_id'])] = message
+        return message
+
+    def api_editMessageText(self, params):
+        if 'inline_message_id' in params:
+            self._check_text(params.get('text', ''))
+            return True
+        chat_id = self._chat_id(params['chat_id'])
+        self._check_text(params.get('text', ''))
+        self._check_markup(params.get('reply_markup'))
+        key = (chat_id, int(params['message_id']))
+        with self._lock:
+            message = self.messages.get(key) or self._message(chat_id, '', sender=self._bot_user())
+            if message.get('text') == params['text'] and message.get('reply_markup') == params.get('reply_markup'):
+                raise ApiError(400, 'Bad Request: message is not modified')
+            message = dict(message, text=params['text'], edit_date=int(time.time()))
+            if params.get('reply_markup'):
+                message['reply_markup'] = params['reply_markup']
+            self.messages[key] = message
+        return message
+
+    def api_answerCallbackQuery(self, params):
+        return True
+
+    def api_getChat(self, params):
+        chat = self._chat(self._chat_id(params['chat_id']))
+        if chat['type'] == 'private':
+            chat['first_name'] = f"User {chat['id']}"
+        else:
+            chat['title'] = f"Channel {chat['id']}"
+        if isinstance(params['chat_id'], str) and params['chat_id'].startswith('@'):
+            chat['username'] = params['chat_id'][1:]
+        return chat
+
+    def api_setWebhook(self, params):
+        with self._lock:
+            self.webhook_url = params.get('url') or None
+            self.webhook_secret = params.get('secret_token') or None
+        return True
+
+    def api_deleteWebhook(self, params):
+        with self._lock:
+            self.webhook_url = None
+            if str(params.get('drop_pending_updates')).lower() == 'true':
+                self._updates.clear()
+        return True
+
+    def api_getWebhookInfo(self, params):
+        with self._lock:
+            return {'url': self.webhook_url or '', 'has_custom_certificate': False,
+                    'pending_update_count': len(self._updates)}
+
+    # -- helpers -------------------------------------------------------------
+
+    def _bot_user(self):
+        return {'id': 1, 'is_bot': True, 'first_name': 'Fake Bot', 'username': 'fake_bot'}
+
+    @staticmethod
+    def _user(user_id, first_name=None):
+        return {'id': user_id, 'is_bot': False, 'first_name': first_name or f'User {user_id}',
+                'username': f'user{user_id}'}
+
+    @staticmethod
+    def _chat(chat_id):
+        """Chat object for a numeric id or @username; usernames map to a stable channel id"""
+        chat_type = 'private' if isinstance(chat_id, int) and chat_id > 0 else 'channel'
+        if not isinstance(chat_id, int):
+            chat_id = -1000000000000 - zlib.crc32(chat_id.encode()) % 10**9
+        return {'id': chat_id, 'type': chat_type}
+
+    def _message(self, chat_id, text, sender, reply_markup=None):
+        message = {'message_id': next(self._message_ids), 'date': int(time.time()), 'chat': self._chat(chat_id),
+                   'from': sender}
+        if text is not None:
+            message['text'] = text
+        if reply_markup:
+            message['reply_markup'] = reply_markup
+        return message
+
+    @staticmethod
+    def _chat_id(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            if isinstance(value, str) and value.startswith('@'):
+                return value
+            raise ApiError(400, 'Bad Request: chat not found')
+
+    def _check_text(self, text):
+        if not text:
+            raise ApiError(400, 'Bad Request: message text is empty')
+        if len(text) > self.max_message_length:
+            self.stats['rejected'] += 1
+            raise ApiError(400, 'Bad Request: message is too long')
+
+    def _check_markup(self, reply_markup):
+        for row in (reply_markup or {}).get('inline_keyboard', []):
+            for button in row:
+                if len(button.get('callback_data', '').encode()) > MAX_CALLBACK_DATA:
+                    self.stats['rejected'] += 1
+                    raise ApiError(400, 'Bad Request: BUTTON_DATA_INVALID')
+
+    def _check_flood(self, chat_id):
+        if not self.chat_interval:
+            return
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_send.get(chat_id)
+            if last is not None and now - last < self.chat_interval:
+                raise ApiError(429, f'Too Many Requests: retry after {self.retry_after}',
+                               {'retry_after': self.retry_after})
+            self._last_send[chat_id] = now
+
+    def _deliver_webhook(self, url, update):
+        headers = {'Content-Type': 'application/json'}
+        if self.webhook_secret:
+            headers['X-Telegram-Bot-Api-Secret-Token'] = self.webhook_secret
+        request = urllib.request.Request(url, data=json.dumps(update).encode(), headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=10):
+                pass
+            self.stats['webhook_pushes'] += 1
+        except Exception as e:
+            self.stats['webhook_errors'] += 1
+            logger.error(f"Webhook delivery of update {update['update_id']} failed: {e}")
+
+    def _dispatch(self, api_method, params):
+        self.stats['requests'] += 1
+        if self.latency or self.latency_jitter:
+            time.sleep(self.latency + self._rng.uniform(0, self.latency_jitter))
+        handler = getattr(self, f'api_{api_method}', None)
+        if handler is None:
+            raise ApiError(404, 'Not Found: method not found')
+        if api_method != 'getUpdates' and self.error_rate and self._rng.random() < self.error_rate:
+            raise ApiError(429, f'Too Many Requests: retry after {self.retry_after}',
+                           {'retry_after': self.retry_after})
+        return handler(params)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                self._handle(dict(parse_qsl(urlparse(self.path).query)))
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                content_type = self.headers.get('Content-Type', '')
+                if content_type.startswith('application/json'):
+                    params = json.loads(body or '{}')
+                elif content_type.startswith('multipart/form-data'):
+                    params = _decode_multipart(content_type, body)
+                else:
+                    params = {key: _decode_value(value) for key, value in parse_qsl(body.decode())}
+                self._handle(params)
+
+            def _handle(self, params):
+                path = urlparse(self.path).path
+                api_method = path.rsplit('/', 1)[-1]
+                if not path.startswith('/bot'):
+                    self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                    return
+                try:
+                    result = server._dispatch(api_method, params)
+                    self._reply(200, {'ok': True, 'result': result})
+                except ApiError as e:
+                    if e.code == 429:
+                        server.stats['rate_limited'] += 1
+                    payload = {'ok': False, 'error_code': e.code, 'description': e.description}
+                    if e.parameters:
+                        payload['parameters'] = e.parameters
+                    self._reply(e.code, payload)
+                except KeyError as e:
+                    self._reply(400, {'ok': False, 'error_code': 400,
+                                      'description': f'Bad Request: parameter {e} is required'})
+
+            def _reply(self, code, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+class ApiError(Exception):
+    def __init__(self, code, description, parameters=None):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+        self.parameters = parameters
+
+def _decode_value(value):
+    # python-telegram-bot form-encodes nested objects (reply_markup, ...) as JSON
+    if value[:1] in ('{', '['):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+def _decode_multipart(content_type, body):
+    # File uploads (sendPhoto, ...): files become bytes, other fields are decoded like form values
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f'Content-Type: {content_type}\r\n\r\n'.encode() + body
+    )
+    params = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        payload = part.get_payload(decode=True)
+        params[name] = payload if part.get_filename() else _decode_value(payload.decode())
+    return params
+
+def generate_traffic(server, rate, users, duration=None):
+    """Inject /start messages and list_projects button presses at ``rate`` updates/s"""
+    rng = random.Random(0)
+    started = time.monotonic()
+    for count in itertools.count():
+        if duration and time.monotonic() - started >= duration:
+            return count
+        user_id = rng.randint(1, users)
+        if rng.random() < 0.2:
+            server.send_text(user_id, '/start')
+        else:
+            server.press_button(user_id, 'list_projects')
+        time.sleep(max(0.0, started + (count + 1) / rate - time.monotonic()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help='fixed latency per call in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of a 429 per call')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--chat-interval', type=float, default=0.0,
+                        help='minimum seconds between sends to one chat before answering 429')
+    parser.add_argument('--max-length', type=int, default=MAX_MESSAGE_LENGTH)
+    parser.add_argument('--rate', type=float, default=0.0, help='synthetic updates per second to inject')
+    parser.add_argument('--users', type=int, default=100, help='synthetic user ids used by --rate')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeTelegramServer(
+        args.host, args.port, latency=args.latency, latency_jitter=args.jitter, error_rate=args.error_rate,
+        retry_after=args.retry_after, chat_interval=args.chat_interval, max_message_length=args.max_length
+    ).start()
+    try:
+        if args.rate:
+            generate_traffic(server, args.rate, args.users)
+        else:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats))
+        server.stop()
+
+if __name__ == '__main__':
+    main()
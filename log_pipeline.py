@@ -0,0 +1,139 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from metrics import log_records_dropped
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# "json" (one object per line) or "text"
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+# Records waiting for the writer thread; beyond this new records are dropped, never waited for
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+# Records per second and burst allowed per message type, at every level
+LOG_RATE_LIMIT = float(os.getenv('LOG_RATE_LIMIT', '20'))
+LOG_RATE_BURST = int(os.getenv('LOG_RATE_BURST', '100'))
+
+# Fraction of INFO/DEBUG records kept per message type. The type is the record's "event"
+# extra, or module:line for records without one. Override single values with
+# LOG_SAMPLING="event=fraction,...".
+LOG_SAMPLING = {'channel_notify_attempt': 0.1, 'no_channel': 0.01, 'status_changed': 0.1}
+for item in os.getenv('LOG_SAMPLING', '').split(','):
+    if '=' in item:
+        name, value = item.split('=', 1)
+        LOG_SAMPLING[name.strip()] = float(value)
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'event'}
+
+def message_type(record: logging.LogRecord) -> str:
+    return getattr(record, 'event', None) or f"{record.module}:{record.lineno}"
+
+class SamplingFilter(logging.Filter):
+    """Drops records by per-type sampling (below WARNING) and per-type rate limits
+
+    Runs in the caller's thread before the record is queued, so it must stay cheap:
+    one dict lookup, one random draw and a token bucket update per record.
+    """
+
+    def __init__(self, sampling: dict = None, rate: float = LOG_RATE_LIMIT, burst: int = LOG_RATE_BURST):
+        super().__init__()
+        self.sampling = LOG_SAMPLING if sampling is None else sampling
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        kind = message_type(record)
+        if record.levelno < logging.WARNING and random.random() >= self.sampling.get(kind, 1.0):
+            log_records_dropped.inc('sampled')
+            return False
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self.buckets.get(kind, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            allowed = tokens >= 1
+            self.buckets[kind] = (tokens - 1 if allowed else tokens, now)
+        if not allowed:
+            log_records_dropped.inc('rate_limited')
+        return allowed
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record with the message, its type and any extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': message_type(record),
+            'message': record.getMessage(),
+        }
+        entry.update(
+            (key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler that never blocks and leaves message formatting to the writer thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats in the caller's thread; only render what cannot
+        # safely cross threads (tracebacks), keep msg and args for the writer
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc('queue_full')
+
+_listener = None
+
+def setup_logging(level: str = LOG_LEVEL, stream=None, fmt: str = LOG_FORMAT) -> QueueListener:
+    """Route the root logger through a bounded queue to a writer thread; safe to call twice"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    writer = logging.StreamHandler(stream or sys.stderr)
+    if fmt == 'json':
+        writer.setFormatter(JsonFormatter())
+    else:
+        writer.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    handler = LazyQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(handler.queue, writer, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
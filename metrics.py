@@ -0,0 +1,252 @@
+import bisect
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import event
+from sqlalchemy.orm import Mapper
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
+# Per-update SQL counters, set by the handler wrapper and filled by engine events
+_update_stats = ContextVar('update_stats', default=None)
+_lock = threading.Lock()
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label value"""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, label_value: str, value: float):
+        with _lock:
+            counts, total = self.series.get(label_value, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.series[label_value] = (counts, total + value)
+
+    def count(self, label_value: str) -> int:
+        counts, _ = self.series.get(label_value, ((), 0.0))
+        return sum(counts)
+
+    def quantile(self, label_value: str, q: float) -> float:
+        """Upper bound of the bucket containing the q-th quantile"""
+        counts, _ = self.series.get(label_value, ((), 0.0))
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank, seen = q * total, 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_value, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{self.label}="{label_value}",le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{self.label}="{label_value}"}} {total}')
+            lines.append(f'{self.name}_count{{{self.label}="{label_value}"}} {cumulative}')
+        return lines
+
+class Counter:
+    """Monotonic counter, one series per label value"""
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.series = {}
+
+    def inc(self, label_value: str, amount: int = 1):
+        with _lock:
+            self.series[label_value] = self.series.get(label_value, 0) + amount
+
+    def value(self, label_value: str) -> int:
+        return self.series.get(label_value, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+handler_latency = Histogram('bot_handler_latency_seconds', 'Handler latency by handler/callback route', 'handler')
+handler_errors = Counter('bot_handler_errors_total', 'Unhandled handler exceptions', 'handler')
+sql_statements = Histogram('bot_sql_statements_per_update', 'SQL statements executed per update', 'handler',
+                           COUNT_BUCKETS)
+sql_rows = Histogram('bot_sql_rows_per_update', 'SQL rows returned or affected per update', 'handler',
+                     COUNT_BUCKETS)
+api_latency = Histogram('telegram_api_latency_seconds', 'Telegram Bot API call latency', 'method')
+api_errors = Counter('telegram_api_errors_total', 'Failed Telegram Bot API calls', 'method')
+api_pool_wait = Histogram('telegram_api_pool_wait_seconds', 'Time Bot API calls waited for a pooled connection',
+                          'pool')
+api_pool_timeouts = Counter('telegram_api_pool_timeouts_total', 'Bot API calls that found no free connection',
+                            'pool')
+updates_dropped = Counter('bot_updates_dropped_total', 'Updates dropped by the throttle before any handler',
+                          'reason')
+log_records_dropped = Counter('bot_log_records_dropped_total', 'Log records dropped before being written',
+                              'reason')
+
+REGISTRY = [handler_latency, handler_errors, sql_statements, sql_rows, api_latency, api_errors, api_pool_wait,
+            api_pool_timeouts, updates_dropped, log_records_dropped]
+
+def callback_route(data: str) -> str:
+    """Collapse callback data such as 'status_12_done' into its route name 'status'"""
+    parts = []
+    for part in (data or '').split('_'):
+        if part.lstrip('-').isdigit():
+            break
+        parts.append(part)
+    return '_'.join(parts) or 'unknown'
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _update_stats.get()
+    if stats is not None:
+        stats[0] += 1
+        # SELECT rowcount is -1 on SQLite; fetched rows are counted on ORM load below
+        if cursor.rowcount and cursor.rowcount > 0:
+            stats[1] += cursor.rowcount
+
+def instrument_engine(engine):
+    """Count statements and rows for the update currently being handled
+
+    Instrumenting an engine twice is a no-op, so the read engine can be passed even when
+    it is the write engine. Work moved to asyncio.to_thread copies the context and is counted too.
+    """
+    if not event.contains(engine, 'after_cursor_execute', _after_cursor_execute):
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    return engine
+
+@event.listens_for(Mapper, 'load')
+def _on_instance_load(target, context):
+    stats = _update_stats.get()
+    if stats is not None:
+        stats[1] += 1
+
+def timed_handler(name: str = None, route=None):
+    """Decorator recording latency and SQL usage of an update handler
+
+    ``route`` optionally maps the update to a finer label, e.g. the callback route.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(update, context, *args, **kwargs):
+            label = name or func.__name__
+            if route is not None:
+                try:
+                    label = f"{label}:{route(update)}"
+                except Exception:
+                    pass
+            token = _update_stats.set([0, 0])
+            start = time.perf_counter()
+            try:
+                return await func(update, context, *args, **kwargs)
+            except Exception:
+                handler_errors.inc(label)
+                raise
+            finally:
+                handler_latency.observe(label, time.perf_counter() - start)
+                statements, rows = _update_stats.get()
+                sql_statements.observe(label, statements)
+                sql_rows.observe(label, rows)
+                _update_stats.reset(token)
+        return wrapper
+    return decorator
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest recording latency and errors of every Bot API call"""
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        start = time.perf_counter()
+        try:
+            code, payload = await super().do_request(
+                url, method, request_data=request_data, read_timeout=read_timeout,
+                write_timeout=write_timeout, connect_timeout=connect_timeout, pool_timeout=pool_timeout
+            )
+        except Exception:
+            api_errors.inc(api_method)
+            raise
+        finally:
+            api_latency.observe(api_method, time.perf_counter() - start)
+        if code >= 400:
+            api_errors.inc(api_method)
+        return code, payload
+
+def render_prometheus() -> str:
+    """Render all metrics in the Prometheus text exposition format"""
+    with _lock:
+        lines = [line for metric in REGISTRY for line in metric.render()]
+    return '\n'.join(lines) + '\n'
+
+def render_stats() -> str:
+    """Compact per-handler summary for the /stats admin command"""
+    with _lock:
+        labels = sorted(handler_latency.series)
+        methods = sorted(api_latency.series)
+        pools = sorted(api_pool_wait.series)
+        text = "📈 **آمار ربات**\n\n"
+        for label in labels:
+            text += (
+                f"`{label}`: {handler_latency.count(label)} بار، "
+                f"p50 ≤ {handler_latency.quantile(label, 0.5) * 1000:.0f}ms، "
+                f"p95 ≤ {handler_latency.quantile(label, 0.95) * 1000:.0f}ms، "
+                f"SQL p95 ≤ {sql_statements.quantile(label, 0.95):.0f}، "
+                f"خطا: {handler_errors.value(label)}\n"
+            )
+        if methods:
+            text += "\n🌐 **Telegram API**\n"
+            for method in methods:
+                text += (
+                    f"`{method}`: {api_latency.count(method)} بار، "
+                    f"p95 ≤ {api_latency.quantile(method, 0.95) * 1000:.0f}ms، "
+                    f"خطا: {api_errors.value(method)}\n"
+                )
+            for pool in pools:
+                text += (
+                    f"🔌 `{pool}`: انتظار اتصال p95 ≤ {api_pool_wait.quantile(pool, 0.95) * 1000:.0f}ms، "
+                    f"پر بودن: {api_pool_timeouts.value(pool)}\n"
+                )
+        if updates_dropped.series:
+            text += "\n🚦 به‌روزرسانی‌های کنارگذاشته‌شده: " + "، ".join(
+                f"{reason}: {count}" for reason, count in sorted(updates_dropped.series.items())
+            ) + "\n"
+    return text if labels or methods else "هنوز آماری ثبت نشده است."
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port: int, host: str = '127.0.0.1'):
+    """Serve /metrics from a daemon thread so scrapes never touch the event loop"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
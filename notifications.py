@@ -0,0 +1,140 @@
+import logging
+import os
+import time
+from telegram.error import BadRequest, Forbidden
+
+logger = logging.getLogger(__name__)
+
+# Consecutive channel failures before sends are suppressed
+CHANNEL_FAILURE_THRESHOLD = int(os.getenv('CHANNEL_FAILURE_THRESHOLD', '3'))
+# Seconds an open breaker waits before letting one probe message through
+CHANNEL_PROBE_INTERVAL = float(os.getenv('CHANNEL_PROBE_INTERVAL', '600'))
+# Seconds a resolved @username -> chat id mapping is reused
+CHANNEL_CACHE_TTL = float(os.getenv('CHANNEL_CACHE_TTL', '86400'))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+def is_channel_failure(error: Exception) -> bool:
+    """Errors caused by the target channel itself, as opposed to the message or network"""
+    if isinstance(error, Forbidden):
+        return True
+    # e.g. "Chat not found", "Need administrator rights in the channel chat", "CHAT_WRITE_FORBIDDEN";
+    # Markdown parse errors are BadRequest too but say nothing about the channel
+    return isinstance(error, BadRequest) and 'chat' in str(error).lower()
+
+class CircuitBreaker:
+    """Per-channel breaker: closed -> open after repeated failures -> half-open probe"""
+
+    def __init__(self, threshold: int = CHANNEL_FAILURE_THRESHOLD, probe_interval: float = CHANNEL_PROBE_INTERVAL):
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.probe_interval:
+            self.state = HALF_OPEN
+            return True
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+
+    def release_probe(self, now: float = None):
+        """A half-open probe failed for a reason unrelated to the channel; wait another interval"""
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+            self.opened_at = time.monotonic() if now is None else now
+
+    def record_failure(self, now: float = None) -> bool:
+        """Count a failure; True when this failure opened the breaker"""
+        now = time.monotonic() if now is None else now
+        self.failures += 1
+        was_closed = self.state == CLOSED
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            self.state = OPEN
+            self.opened_at = now
+            return was_closed
+        return False
+
+class ChannelNotifier:
+    """Sends project notifications through cached channel ids and per-channel breakers"""
+
+    def __init__(self, threshold: int = CHANNEL_FAILURE_THRESHOLD, probe_interval: float = CHANNEL_PROBE_INTERVAL,
+                 cache_ttl: float = CHANNEL_CACHE_TTL):
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.cache_ttl = cache_ttl
+        self.breakers = {}
+        self.resolved = {}
+        self.suppressed = 0
+
+    def breaker(self, channel_id: str) -> CircuitBreaker:
+        breaker = self.breakers.get(channel_id)
+        if breaker is None:
+            breaker = self.breakers[channel_id] = CircuitBreaker(self.threshold, self.probe_interval)
+        return breaker
+
+    async def resolve(self, bot, channel: str) -> str:
+        """Validate a channel reference with getChat once and return its numeric id as text"""
+        channel = channel.strip()
+        cached = self.resolved.get(channel)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        chat = await bot.get_chat(channel)
+        chat_id = str(chat.id)
+        self.resolved[channel] = (chat_id, time.monotonic() + self.cache_ttl)
+        return chat_id
+
+    def reset(self, channel_id: str):
+        """Forget failures of a channel, e.g. after the owner configured it again"""
+        self.breakers.pop(channel_id, None)
+
+    async def send(self, bot, channel_id: str, text: str, project=None, parse_mode: str = 'Markdown') -> bool:
+        """Send text to a channel unless its breaker is open; never raises"""
+        breaker = self.breaker(channel_id)
+        if not breaker.allow():
+            self.suppressed += 1
+            logger.info("Notification to channel %s suppressed, circuit open", channel_id,
+                        extra={'event': 'notification_suppressed'})
+            return False
+
+        try:
+            chat_id = channel_id
+            if not channel_id.lstrip('-').isdigit():
+                # Channels stored before ids were resolved on configuration
+                chat_id = await self.resolve(bot, channel_id)
+            await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+        except Exception as e:
+            logger.error(f"Failed to send notification to channel {channel_id}: {e}")
+            if not is_channel_failure(e):
+                # Timeouts or a bad message say nothing about the channel, but must not leave the probe slot taken
+                breaker.release_probe()
+            elif breaker.record_failure():
+                logger.warning(f"Circuit opened for channel {channel_id} after {breaker.failures} failures")
+                if project is not None:
+                    await self._alert_owner(bot, project, channel_id)
+            return False
+
+        breaker.record_success()
+        return True
+
+    async def _alert_owner(self, bot, project, channel_id: str):
+        try:
+            await bot.send_message(
+                chat_id=project.owner.telegram_id,
+                text=(
+                    f"⚠️ ارسال اعلان‌های پروژه «{project.name}» به کانال {channel_id} "
+                    f"پس از {self.threshold} خطای پیاپی متوقف شد.\n"
+                    "ربات را به عنوان مدیر به کانال اضافه کنید یا کانال را دوباره تنظیم کنید."
+                )
+            )
+        except Exception as e:
+            logger.error(f"Failed to alert owner of project {project.id} about channel {channel_id}: {e}")
+
+channel_notifier = ChannelNotifier()
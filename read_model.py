@@ -0,0 +1,261 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from models import User, Project, Section, Task, project_members
+
+logger = logging.getLogger(__name__)
+
+READ_MODEL_ENABLED = os.getenv('READ_MODEL', '').lower() in ('1', 'true', 'yes')
+# Upper bound on cached records (projects + sections + tasks) across all projects
+READ_MODEL_MAX_RECORDS = int(os.getenv('READ_MODEL_MAX_RECORDS', '200000'))
+# Projects are reloaded after this many seconds; bounds staleness when several worker
+# processes write to the same project
+READ_MODEL_TTL = float(os.getenv('READ_MODEL_TTL', '30'))
+
+class ProjectRecord:
+    __slots__ = ('id', 'name', 'description', 'owner_id', 'owner_name', 'channel_id', 'member_ids',
+                 'section_ids', 'loaded_at')
+
+    def __init__(self, id, name, description, owner_id, owner_name, channel_id, member_ids):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.owner_id = owner_id
+        self.owner_name = owner_name
+        self.channel_id = channel_id
+        self.member_ids = member_ids
+        self.section_ids = []
+        self.loaded_at = time.monotonic()
+
+    def can_access(self, user_id: int) -> bool:
+        return user_id == self.owner_id or user_id in self.member_ids
+
+class SectionRecord:
+    __slots__ = ('id', 'project_id', 'name', 'task_ids')
+
+    def __init__(self, id, project_id, name):
+        self.id = id
+        self.project_id = project_id
+        self.name = name
+        self.task_ids = []
+
+class TaskRecord:
+    __slots__ = ('id', 'section_id', 'title', 'description', 'status', 'assigned_to_id', 'assigned_name',
+                 'created_at', 'version', 'priority', 'estimated_hours', 'actual_hours', 'timer_started_at',
+                 'due_date')
+
+    def __init__(self, id, section_id, title, description, status, assigned_to_id, assigned_name, created_at,
+                 version=1, priority='medium', estimated_hours=None, actual_hours=0.0, timer_started_at=None,
+                 due_date=None):
+        self.id = id
+        self.section_id = section_id
+        self.title = title
+        self.description = description
+        self.status = status
+        self.assigned_to_id = assigned_to_id
+        self.assigned_name = assigned_name
+        self.created_at = created_at
+        self.version = version
+        self.priority = priority
+        self.estimated_hours = estimated_hours
+        self.actual_hours = actual_hours
+        self.timer_started_at = timer_started_at
+        self.due_date = due_date
+
+class ReadModel:
+    """Per-process, lazily loaded cache of whole projects for the show_* views
+
+    A project is loaded with four set-based queries on first access, kept current by
+    the write paths in bot.py and evicted least-recently-used once the total number of
+    records exceeds max_records.
+    """
+
+    def __init__(self, enabled: bool = READ_MODEL_ENABLED, max_records: int = READ_MODEL_MAX_RECORDS,
+                 ttl: float = READ_MODEL_TTL):
+        self.enabled = enabled
+        self.max_records = max_records
+        self.ttl = ttl
+        self.projects = OrderedDict()
+        self.sections = {}
+        self.tasks = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.projects) + len(self.sections) + len(self.tasks)
+
+    # -- reads ----------------------------------------------------------------
+
+    def get_project(self, db: Session, project_id: int):
+        project = self.projects.get(project_id)
+        if project is not None and time.monotonic() - project.loaded_at < self.ttl:
+            self.projects.move_to_end(project_id)
+            self.hits += 1
+            return project
+        self.misses += 1
+        return self._load(db, project_id)
+
+    def get_section(self, db: Session, section_id: int):
+        section = self.sections.get(section_id)
+        if section is None:
+            project_id = db.query(Section.project_id).filter(Section.id == section_id).scalar()
+            if project_id is None:
+                return None
+        else:
+            project_id = section.project_id
+        if self.get_project(db, project_id) is None:
+            return None
+        return self.sections.get(section_id)
+
+    def get_task(self, db: Session, task_id: int):
+        task = self.tasks.get(task_id)
+        if task is None:
+            project_id = db.query(Section.project_id).join(Task, Task.section_id == Section.id).filter(
+                Task.id == task_id
+            ).scalar()
+            if project_id is None:
+                return None
+        else:
+            project_id = self.sections[task.section_id].project_id
+        if self.get_project(db, project_id) is None:
+            return None
+        return self.tasks.get(task_id)
+
+    def section_tasks(self, section: SectionRecord):
+        return [self.tasks[task_id] for task_id in section.task_ids]
+
+    def project_sections(self, project: ProjectRecord):
+        return [self.sections[section_id] for section_id in project.section_ids]
+
+    def project_task_count(self, project: ProjectRecord) -> int:
+        return sum(len(self.sections[section_id].task_ids) for section_id in project.section_ids)
+
+    # -- write-through ----------------------------------------------------------
+
+    def section_added(self, section: Section):
+        project = self.projects.get(section.project_id)
+        if project is not None:
+            self.sections[section.id] = SectionRecord(section.id, section.project_id, section.name)
+            project.section_ids.append(section.id)
+            self._evict()
+
+    def task_added(self, task: Task, assigned_name: str = None):
+        section = self.sections.get(task.section_id)
+        if section is not None:
+            self.tasks[task.id] = TaskRecord(
+                task.id, task.section_id, task.title, task.description, task.status, task.assigned_to_id,
+                assigned_name, task.created_at, task.version, task.priority or 'medium', task.estimated_hours,
+                task.actual_hours or 0.0, task.timer_started_at, task.due_date
+            )
+            section.task_ids.append(task.id)
+            self._evict()
+
+    def task_status_changed(self, task_id: int, status: str, version: int = None):
+        task = self.tasks.get(task_id)
+        if task is not None:
+            task.status = status
+            if version is not None:
+                task.version = version
+
+    def task_assigned(self, task_id: int, user_id: int, assigned_name: str, version: int = None):
+        task = self.tasks.get(task_id)
+        if task is not None:
+            task.assigned_to_id = user_id
+            task.assigned_name = assigned_name
+            if version is not None:
+                task.version = version
+
+    def task_due_date_changed(self, task_id: int, due_date, version: int = None):
+        task = self.tasks.get(task_id)
+        if task is not None:
+            task.due_date = due_date
+            if version is not None:
+                task.version = version
+
+    def task_tracking_changed(self, task: Task):
+        """Copy priority, estimate, actual hours and timer state after a time tracking write"""
+        record = self.tasks.get(task.id)
+        if record is not None:
+            record.priority = task.priority
+            record.estimated_hours = task.estimated_hours
+            record.actual_hours = task.actual_hours
+            record.timer_started_at = task.timer_started_at
+            record.version = task.version
+
+    def member_added(self, project_id: int, user_id: int):
+        project = self.projects.get(project_id)
+        if project is not None:
+            project.member_ids.add(user_id)
+
+    def member_removed(self, project_id: int, user_id: int):
+        project = self.projects.get(project_id)
+        if project is not None:
+            project.member_ids.discard(user_id)
+
+    def channel_set(self, project_id: int, channel_id: str):
+        project = self.projects.get(project_id)
+        if project is not None:
+            project.channel_id = channel_id
+
+    def invalidate(self, project_id: int):
+        project = self.projects.pop(project_id, None)
+        if project is None:
+            return
+        for section_id in project.section_ids:
+            section = self.sections.pop(section_id, None)
+            for task_id in (section.task_ids if section else ()):
+                self.tasks.pop(task_id, None)
+
+    def clear(self):
+        self.projects.clear()
+        self.sections.clear()
+        self.tasks.clear()
+
+    # -- loading ----------------------------------------------------------------
+
+    def _load(self, db: Session, project_id: int):
+        self.invalidate(project_id)
+        row = db.query(
+            Project.id, Project.name, Project.description, Project.owner_id, Project.channel_id, User.first_name
+        ).outerjoin(User, User.id == Project.owner_id).filter(Project.id == project_id).first()
+        if row is None:
+            return None
+
+        member_ids = {
+            user_id for (user_id,) in db.query(project_members.c.user_id).filter(
+                project_members.c.project_id == project_id
+            )
+        }
+        _, project_name, description, owner_id, channel_id, owner_name = row
+        project = ProjectRecord(project_id, project_name, description, owner_id, owner_name, channel_id, member_ids)
+
+        for section_id, name in db.query(Section.id, Section.name).filter(
+            Section.project_id == project_id
+        ).order_by(Section.id):
+            self.sections[section_id] = SectionRecord(section_id, project_id, name)
+            project.section_ids.append(section_id)
+
+        tasks = db.query(
+            Task.id, Task.section_id, Task.title, Task.description, Task.status, Task.assigned_to_id,
+            User.first_name, Task.created_at, Task.version, Task.priority, Task.estimated_hours, Task.actual_hours,
+            Task.timer_started_at, Task.due_date
+        ).join(Section, Section.id == Task.section_id).outerjoin(User, User.id == Task.assigned_to_id).filter(
+            Section.project_id == project_id
+        ).order_by(Task.id)
+        for row in tasks:
+            record = TaskRecord(*row)
+            self.tasks[record.id] = record
+            self.sections[record.section_id].task_ids.append(record.id)
+
+        self.projects[project_id] = project
+        self._evict()
+        return project
+
+    def _evict(self):
+        while self.size > self.max_records and len(self.projects) > 1:
+            project_id = next(iter(self.projects))
+            logger.debug("Read model evicting project %s", project_id)
+            self.invalidate(project_id)
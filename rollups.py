@@ -0,0 +1,44 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import TaskRollup, insert_accumulate
+
+PRIORITIES = ('high', 'medium', 'low')
+
+def add_to_rollup(db: Session, section_id: int, project_id: int, priority: str, tasks: int = 0,
+                  estimated_hours: float = 0.0, actual_hours: float = 0.0):
+    """Add deltas to the (section, priority) row in the caller's transaction
+
+    One INSERT ... ON CONFLICT DO UPDATE SET x = x + delta, so concurrent writers never
+    overwrite each other's contributions.
+    """
+    db.execute(insert_accumulate(
+        db, TaskRollup.__table__, ['section_id', 'priority'], ('tasks', 'estimated_hours', 'actual_hours')
+    ).values(
+        section_id=section_id, priority=priority, project_id=project_id, tasks=tasks,
+        estimated_hours=estimated_hours, actual_hours=actual_hours
+    ))
+
+def add_task_to_rollup(db: Session, task, project_id: int):
+    """Count a new task under its section and priority"""
+    add_to_rollup(db, task.section_id, project_id, task.priority or 'medium', 1, task.estimated_hours or 0.0,
+                  task.actual_hours or 0.0)
+
+def move_task_priority(db: Session, task, project_id: int, old_priority: str):
+    """Move a task's contribution from its old priority row to its current one"""
+    estimated, actual = task.estimated_hours or 0.0, task.actual_hours or 0.0
+    add_to_rollup(db, task.section_id, project_id, old_priority, -1, -estimated, -actual)
+    add_to_rollup(db, task.section_id, project_id, task.priority, 1, estimated, actual)
+
+def project_rollup(db: Session, project_id: int) -> dict:
+    """{priority: (tasks, estimated_hours, actual_hours)} over the project's sections"""
+    return _rollup(db, TaskRollup.project_id == project_id)
+
+def section_rollup(db: Session, section_id: int) -> dict:
+    return _rollup(db, TaskRollup.section_id == section_id)
+
+def _rollup(db: Session, criterion) -> dict:
+    rows = db.query(
+        TaskRollup.priority, func.sum(TaskRollup.tasks), func.sum(TaskRollup.estimated_hours),
+        func.sum(TaskRollup.actual_hours)
+    ).filter(criterion).group_by(TaskRollup.priority)
+    return {priority: (tasks, estimated, actual) for priority, tasks, estimated, actual in rows if tasks}
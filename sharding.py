@@ -0,0 +1,183 @@
+import asyncio
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import secrets
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Updates buffered per worker before the receiver answers 503 and Telegram retries
+WORKER_QUEUE_SIZE = int(os.getenv('WORKER_QUEUE_SIZE', '1000'))
+WORKER_RESTART_DELAY = 1.0
+
+def shard_key(update: dict) -> int:
+    """Partition key of a raw update: the sender's user id, else the chat id, else update_id
+
+    Routing by user keeps context.user_data and the ordering of one user's clicks in a
+    single worker.
+    """
+    for field in ('message', 'edited_message', 'callback_query', 'inline_query', 'chosen_inline_result',
+                  'channel_post', 'edited_channel_post', 'my_chat_member', 'chat_member'):
+        payload = update.get(field)
+        if not payload:
+            continue
+        sender = payload.get('from')
+        if sender:
+            return sender['id']
+        chat = payload.get('chat') or (payload.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+    return update.get('update_id', 0)
+
+def shard_for(update: dict, workers: int) -> int:
+    return shard_key(update) % workers
+
+async def _worker_loop(index: int, updates):
+    from telegram import Update
+    from bot import build_application, METRICS_PORT
+    import models
+    from metrics import instrument_engine, start_metrics_server
+
+    # Every process builds its own engines/pools; tables were created by the receiver
+    instrument_engine(models.init_db(create_tables=False))
+    instrument_engine(models.read_engine)
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT + 1 + index)
+
+    # Jobs (daily digest, maintenance) run in worker 0 only
+    application = build_application(run_jobs=index == 0, updater=False)
+    loop = asyncio.get_running_loop()
+    async with application:
+        await application.start()
+        logger.info(f"Worker {index} ready (pid {os.getpid()})")
+        while True:
+            data = await loop.run_in_executor(None, updates.get)
+            if data is None:
+                break
+            await application.update_queue.put(Update.de_json(data, application.bot))
+        await application.stop()
+
+def _worker_main(index: int, updates):
+    from log_pipeline import setup_logging
+    setup_logging()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_loop(index, updates))
+
+class _WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Telegram delivers in bursts of parallel connections; the default backlog of 5 resets them
+    request_queue_size = 128
+
+class ShardedReceiver:
+    """Webhook endpoint that hands raw updates to per-worker queues by shard key"""
+
+    def __init__(self, workers: int, listen: str, port: int, url_path: str, secret_token: str = None):
+        context = multiprocessing.get_context('spawn')
+        self.context = context
+        self.queues = [context.Queue(WORKER_QUEUE_SIZE) for _ in range(workers)]
+        self.processes = [None] * workers
+        self.url_path = '/' + url_path.strip('/')
+        self.secret_token = secret_token
+        self.httpd = _WebhookServer((listen, port), self._handler_class())
+
+    def dispatch(self, update: dict) -> bool:
+        """Queue the update on its worker; False when that worker is saturated"""
+        try:
+            self.queues[shard_for(update, len(self.queues))].put(update, timeout=1)
+            return True
+        except queue.Full:
+            return False
+
+    def start_worker(self, index: int):
+        process = self.context.Process(
+            target=_worker_main, args=(index, self.queues[index]), name=f'bot-worker-{index}', daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+
+    def supervise(self):
+        """Restart crashed workers; their queue, and so their shard, is preserved"""
+        for index, process in enumerate(self.processes):
+            if process is None or not process.is_alive():
+                if process is not None:
+                    logger.error(f"Worker {index} exited with {process.exitcode}, restarting")
+                    time.sleep(WORKER_RESTART_DELAY)
+                self.start_worker(index)
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        for updates in self.queues:
+            updates.put(None)
+        for process in self.processes:
+            if process is not None:
+                process.join(timeout=10)
+
+    def _handler_class(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != receiver.url_path:
+                    self.send_error(404)
+                    return
+                if receiver.secret_token and not hmac.compare_digest(
+                    self.headers.get('X-Telegram-Bot-Api-Secret-Token', ''), receiver.secret_token
+                ):
+                    self.send_error(403)
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    update = json.loads(self.rfile.read(length))
+                except ValueError:
+                    self.send_error(400)
+                    return
+                if not receiver.dispatch(update):
+                    self.send_error(503)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+async def _set_webhook(url: str, secret_token: str):
+    from telegram import Bot
+    from bot import BOT_TOKEN, TELEGRAM_API_URL
+
+    async with Bot(BOT_TOKEN, base_url=f"{TELEGRAM_API_URL}/bot") as bot:
+        await bot.set_webhook(url, secret_token=secret_token)
+
+def run_sharded(workers: int):
+    """Run the webhook receiver in this process and ``workers`` bot worker processes"""
+    from bot import BOT_TOKEN, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET
+    from models import init_db, dispose_db
+
+    # Create the schema once here so workers do not race on CREATE TABLE
+    init_db()
+    dispose_db()
+
+    secret_token = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    receiver = ShardedReceiver(workers, WEBHOOK_LISTEN, WEBHOOK_PORT, BOT_TOKEN, secret_token)
+    receiver.supervise()
+    threading.Thread(target=receiver.httpd.serve_forever, name='webhook-receiver', daemon=True).start()
+    asyncio.run(_set_webhook(f"{WEBHOOK_URL.rstrip('/')}/{BOT_TOKEN}", secret_token))
+    logger.info(f"Webhook receiver on {WEBHOOK_LISTEN}:{WEBHOOK_PORT} sharding across {workers} workers")
+
+    try:
+        while True:
+            time.sleep(5)
+            receiver.supervise()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.shutdown()
@@ -0,0 +1,154 @@
+import unittest
+import asyncio
+import time
+from datetime import datetime, timedelta
+from unittest.mock import Mock, AsyncMock, patch
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+import bot
+from analytics import compute_analytics, load_history, project_analytics, render_analytics
+from db_testing import make_test_engine
+from deletion import delete_project
+from models import User, Project, Section, Task, ArchivedTask, TaskEvent
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+def day(offset):
+    return NOW + timedelta(days=offset)
+
+class TestAnalytics(unittest.TestCase):
+    """Test burndown, cumulative flow, velocity and cycle time"""
+
+    def setUp(self):
+        """Set up a project with hot, legacy and archived tasks and their status events"""
+        self.engine = make_test_engine()
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.db = self.Session()
+
+        self.owner = User(telegram_id=1, first_name="Owner")
+        self.stranger = User(telegram_id=2, first_name="Stranger")
+        self.db.add_all([self.owner, self.stranger])
+        self.db.flush()
+        self.project = Project(name="Alpha", owner_id=self.owner.id)
+        self.section = Section(name="Backend", project=self.project)
+        self.db.add_all([self.project, self.section])
+        self.db.flush()
+
+        def task(title, created, status="todo", updated=None):
+            task = Task(title=title, status=status, section_id=self.section.id, created_at=day(created),
+                        updated_at=day(updated if updated is not None else created))
+            self.db.add(task)
+            self.db.flush()
+            return task
+
+        def events(task_id, *moves):
+            self.db.add_all([TaskEvent(task_id=task_id, project_id=self.project.id, status=status, at=day(offset))
+                             for status, offset in moves])
+
+        a = task("A", -10, "done")
+        events(a.id, ("in_progress", -8), ("done", -6))
+        b = task("B", -10, "done")
+        events(b.id, ("done", -3))
+        c = task("C", -5, "in_progress")
+        events(c.id, ("in_progress", -1))
+        task("D", -2)
+        # Finished before task_events existed: only updated_at tells when
+        task("E", -9, "done", updated=-4)
+        self.db.add(ArchivedTask(id=1000, title="F", status="done", section_id=self.section.id,
+                                 project_id=self.project.id, created_at=day(-20), updated_at=day(-15)))
+        events(1000, ("done", -15))
+        self.db.commit()
+
+    def tearDown(self):
+        """Clean up"""
+        self.db.close()
+        self.engine.dispose()
+
+    def test_flow_velocity_and_cycle_time(self):
+        """Daily status counts, weekly completions and cycle-time percentiles"""
+        analytics = compute_analytics(load_history(self.db, self.project.id), now=NOW, days=14, weeks=2)
+
+        self.assertEqual(str(analytics.days[-1]), "2026-10-19")
+        self.assertEqual(analytics.flow[:, -1].tolist(), [1, 1, 4])
+        self.assertEqual(analytics.flow[:, -8].tolist(), [2, 1, 1])
+        self.assertEqual(analytics.remaining[-1], 2)
+        self.assertEqual(analytics.velocity.tolist(), [0, 3])
+        self.assertEqual(analytics.completed, 3)
+        self.assertEqual(analytics.cycle_days.tolist()[0], 5.0)
+
+        text = render_analytics("Alpha", analytics)
+        self.assertIn("تحلیل پروژه Alpha", text)
+        self.assertIn("10-19", text)
+
+    def test_archived_open_tasks_leave_the_flow(self):
+        """An open task archived with its section stops counting as open from archived_at on"""
+        self.db.add(ArchivedTask(id=1001, title="G", status="in_progress", section_id=self.section.id,
+                                 project_id=self.project.id, created_at=day(-12), updated_at=day(-7),
+                                 archived_at=day(-4)))
+        self.db.add(TaskEvent(task_id=1001, project_id=self.project.id, status="in_progress", at=day(-7)))
+        self.db.commit()
+
+        analytics = compute_analytics(load_history(self.db, self.project.id), now=NOW, days=14, weeks=2)
+        self.assertEqual(analytics.flow[:, -1].tolist(), [1, 1, 4])
+        self.assertEqual(analytics.flow[:, -5].tolist(), [2, 0, 3])
+        self.assertEqual(analytics.flow[:, -6].tolist(), [3, 1, 2])
+        self.assertEqual(analytics.velocity.tolist(), [0, 3])
+        self.assertEqual(analytics.completed, 3)
+
+    def test_large_history_is_fast(self):
+        """Loading and summarizing hundreds of thousands of events takes well under a second"""
+        rng = np.random.default_rng(0)
+        tasks, events = 100_000, 300_000
+        start = datetime(2026, 1, 1)
+        created = [start + timedelta(seconds=int(offset)) for offset in rng.integers(0, 200 * 86400, tasks)]
+        connection = self.db.connection()
+        first_id = self.db.query(func.max(Task.id)).scalar() + 1
+        connection.execute(Task.__table__.insert(), [
+            {'id': first_id + i, 'title': "T", 'section_id': self.section.id, 'status': "todo", 'created_at': at,
+             'updated_at': at} for i, at in enumerate(created)
+        ])
+        event_task = rng.integers(0, tasks, events)
+        statuses = np.array(["todo", "in_progress", "done"])[rng.integers(0, 3, events)]
+        delays = rng.integers(0, 60 * 86400, events)
+        connection.execute(TaskEvent.__table__.insert(), [
+            {'task_id': first_id + int(i), 'project_id': self.project.id, 'status': str(status),
+             'at': created[i] + timedelta(seconds=int(delay))} for i, status, delay in zip(event_task, statuses, delays)
+        ])
+        self.db.commit()
+
+        # Best of three runs, so a busy machine does not fail the check
+        timings = []
+        with patch('analytics.ReadSessionLocal', self.Session):
+            for _ in range(3):
+                began = time.perf_counter()
+                analytics = project_analytics(self.project.id, now=datetime(2026, 9, 1))
+                timings.append(time.perf_counter() - began)
+        self.assertLess(min(timings), 1.0)
+        # The fixture tasks of setUp are created after this window
+        self.assertEqual(analytics.flow[:, -1].sum(), tasks)
+
+    def test_status_change_is_logged_and_view_checks_access(self):
+        """Status buttons append to the history, which the analytics view reads"""
+        query = Mock()
+        query.edit_message_text = AsyncMock()
+        query.message.reply_photo = AsyncMock()
+        task_id = self.db.query(Task.id).filter(Task.title == "D").scalar()
+
+        asyncio.run(bot.update_task_status(query, self.db, self.owner, task_id, "in_progress"))
+        self.assertEqual(self.db.query(TaskEvent).filter(TaskEvent.task_id == task_id).count(), 1)
+
+        with patch('analytics.ReadSessionLocal', self.Session):
+            asyncio.run(bot.show_analytics(query, self.db, self.owner, self.project.id))
+        self.assertIn("تحلیل پروژه Alpha", query.edit_message_text.call_args[0][0])
+        asyncio.run(bot.show_analytics(query, self.db, self.stranger, self.project.id))
+        self.assertEqual(query.edit_message_text.call_args[0][0], "پروژه یافت نشد یا دسترسی رد شد.")
+
+    def test_delete_project_removes_history(self):
+        """History goes away with its project"""
+        delete_project(self.project.id, session_factory=self.Session)
+        self.assertEqual(self.db.query(TaskEvent).count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import unittest
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, AsyncMock
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import bot
+from archive import archive_done_tasks, archive_section, archived_tasks_page
+from db_testing import TEST_DATABASE_URL, make_test_engine
+from dependencies import add_dependency
+from digest import collect_digests
+from models import (
+    User, Project, Section, Task, ArchivedTask, TaskEvent, create_missing_completed_at, create_missing_indexes,
+    create_task_id_sequence, task_dependencies
+)
+
+class TestArchive(unittest.TestCase):
+    """Test moving old done tasks into archived_tasks"""
+
+    def setUp(self):
+        """Set up a project with old done, recent done and open tasks"""
+        self.engine = make_test_engine()
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.db = self.Session()
+
+        self.owner = User(telegram_id=1, first_name="Owner")
+        self.stranger = User(telegram_id=2, first_name="Stranger")
+        self.db.add_all([self.owner, self.stranger])
+        self.db.flush()
+        self.project = Project(name="Alpha", owner_id=self.owner.id, channel_id="-100")
+        self.section = Section(name="Backend", project=self.project)
+        self.db.add_all([self.project, self.section])
+        self.db.flush()
+
+        self.now = datetime.now(timezone.utc)
+        old = self.now - timedelta(days=60)
+        self.db.add_all(
+            [Task(title=f"old-{i}", status="done", section_id=self.section.id, updated_at=old, completed_at=old)
+             for i in range(5)]
+            + [Task(title="recent", status="done", section_id=self.section.id, updated_at=self.now,
+                    completed_at=self.now),
+               Task(title="stale-open", status="todo", section_id=self.section.id, updated_at=old)]
+        )
+        self.db.commit()
+
+    def tearDown(self):
+        """Clean up"""
+        self.db.close()
+        self.engine.dispose()
+
+    def test_archive_in_batches(self):
+        """Old done tasks move in batches; recent and open tasks stay hot"""
+        moved = archive_done_tasks(self.now - timedelta(days=30), batch_size=2, session_factory=self.Session)
+
+        self.assertEqual(moved, {self.project.id: 5})
+        self.assertEqual(sorted(title for (title,) in self.db.query(Task.title)), ["recent", "stale-open"])
+        archived = self.db.query(ArchivedTask).order_by(ArchivedTask.id).all()
+        self.assertEqual([task.title for task in archived], [f"old-{i}" for i in range(5)])
+        self.assertTrue(all(task.project_id == self.project.id and task.archived_at for task in archived))
+
+        # Nothing left to move
+        self.assertEqual(archive_done_tasks(self.now - timedelta(days=30), session_factory=self.Session), {})
+
+    def test_age_counts_from_completion(self):
+        """Editing a long-done task does not keep it hot; a task done just now through the bot does"""
+        edited = self.db.query(Task).filter(Task.title == "old-0").one()
+        edited.priority = "high"
+        reopened = self.db.query(Task).filter(Task.title == "old-1").one()
+        self.db.commit()
+        query = Mock()
+        query.edit_message_text = AsyncMock()
+        query.get_bot = Mock(return_value=Mock(send_message=AsyncMock()))
+        for status in ("todo", "done"):
+            asyncio.run(bot.update_task_status(query, self.db, self.owner, reopened.id, status))
+        self.assertIsNotNone(reopened.completed_at)
+
+        archive_done_tasks(self.now - timedelta(days=30), session_factory=self.Session)
+        archived = {title for (title,) in self.db.query(ArchivedTask.title)}
+        self.assertIn("old-0", archived)
+        self.assertNotIn("old-1", archived)
+
+    def test_completed_at_backfilled(self):
+        """Done tasks from before completed_at take their latest done event, else updated_at"""
+        old = (self.now - timedelta(days=60)).replace(tzinfo=None, microsecond=0)
+        done_event = (self.now - timedelta(days=45)).replace(tzinfo=None, microsecond=0)
+        first, second = self.db.query(Task).filter(Task.title.in_(["old-0", "old-1"])).order_by(Task.id)
+        self.db.add(TaskEvent(task_id=first.id, project_id=self.project.id, status="done", at=done_event))
+        self.db.query(Task).update({Task.completed_at: None, Task.updated_at: old})
+        self.db.commit()
+
+        create_missing_completed_at(self.engine)
+        self.db.expire_all()
+        self.assertEqual(first.completed_at, done_event)
+        self.assertEqual((second.completed_at, second.updated_at), (old, old))
+        self.assertIsNone(self.db.query(Task).filter(Task.title == "stale-open").one().completed_at)
+
+    def test_archived_view_and_digest(self):
+        """Archived tasks are paged on demand and still count in the digest"""
+        archive_done_tasks(self.now - timedelta(days=30), session_factory=self.Session)
+
+        page, next_after = archived_tasks_page(self.db, self.section.id, limit=3)
+        self.assertEqual(len(page), 3)
+        rest, last = archived_tasks_page(self.db, self.section.id, after=next_after, limit=3)
+        self.assertEqual((len(rest), last), (2, None))
+
+        digest, = collect_digests(self.db, self.now - timedelta(days=1), self.now)
+        self.assertEqual((digest.total, digest.done), (7, 6))
+
+        query = Mock()
+        query.edit_message_text = AsyncMock()
+        asyncio.run(bot.show_archived(query, self.db, self.owner, self.section.id))
+        self.assertIn("old-0", query.edit_message_text.call_args[0][0])
+        asyncio.run(bot.show_archived(query, self.db, self.stranger, self.section.id))
+        self.assertEqual(query.edit_message_text.call_args[0][0], "دسترسی رد شد.")
+
+    def test_archived_open_tasks_stay_unfinished_in_digest(self):
+        """Archiving a section with open tasks does not report them as done"""
+        self.db.add_all([Task(title=f"open-{i}", status="todo", section_id=self.section.id) for i in range(3)])
+        self.db.commit()
+        self.assertEqual(archive_section(self.section.id, session_factory=self.Session), 10)
+
+        digest, = collect_digests(self.db, self.now - timedelta(days=1), self.now)
+        self.assertEqual((digest.total, digest.done, digest.progress), (10, 6, 60))
+
+    def test_ids_are_not_reused_after_archiving(self):
+        """A task created after the highest id was archived gets a new id and archives cleanly"""
+        first = self.db.query(Task).filter(Task.title == "old-0").one()
+        last = self.db.query(Task).filter(Task.title == "stale-open").one()
+        add_dependency(self.db, self.project.id, last.id, first.id)
+        self.db.add(TaskEvent(task_id=last.id, project_id=self.project.id, status="todo"))
+        self.db.commit()
+        self.assertEqual(archive_section(self.section.id, session_factory=self.Session), 7)
+        self.assertEqual(self.db.query(task_dependencies).count(), 0)
+
+        task = Task(title="after", section_id=self.section.id)
+        self.db.add(task)
+        self.db.commit()
+        self.assertGreater(task.id, last.id)
+        self.assertEqual(self.db.query(TaskEvent).filter(TaskEvent.task_id == task.id).count(), 0)
+        self.assertEqual(archive_section(self.section.id, session_factory=self.Session), 1)
+        self.assertEqual(self.db.query(ArchivedTask).count(), 8)
+
+    @unittest.skipIf(TEST_DATABASE_URL, "SQLite only; other databases never reuse sequence values")
+    def test_existing_table_gets_sequence(self):
+        """Startup rebuilds a tasks table without AUTOINCREMENT, keeping rows and skipping archived ids"""
+        archive_section(self.section.id, session_factory=self.Session)
+        self.db.close()
+        with self.engine.begin() as conn:
+            ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'tasks'")).scalar()
+            conn.execute(text("DROP TABLE tasks"))
+            conn.execute(text(ddl.replace("AUTOINCREMENT", "")))
+            conn.execute(text("INSERT INTO tasks (id, title, section_id, status) VALUES (3, 'legacy', :section, 'todo')"),
+                         {'section': self.section.id})
+        create_task_id_sequence(self.engine)
+        create_task_id_sequence(self.engine)
+        create_missing_indexes(self.engine)
+
+        # Plain SQLite would hand out 4 next, an id already used by an archived task
+        self.db = self.Session()
+        self.assertEqual([title for (title,) in self.db.query(Task.title)], ["legacy"])
+        task = Task(title="after", section_id=self.section.id)
+        self.db.add(task)
+        self.db.commit()
+        self.assertEqual(task.id, 8)
+        with self.engine.connect() as conn:
+            indexes = {name for (name,) in conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'tasks'"
+            ))}
+        self.assertIn('ix_tasks_status_completed', indexes)
+
+if __name__ == '__main__':
+    unittest.main()
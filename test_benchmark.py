@@ -0,0 +1,69 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+from unittest.mock import patch
+
+import benchmark
+import bot
+
+class TestBenchmarkSuite(unittest.TestCase):
+    """Smoke test the benchmark suite on the tiny preset"""
+    
+    def test_tiny_preset_report(self):
+        """Replaying the tiny workload produces a complete report"""
+        with tempfile.TemporaryDirectory() as db_dir:
+            report = benchmark.run('tiny', db_dir=db_dir, updates=50)
+        
+        self.assertEqual(report['updates'], 50)
+        self.assertGreater(report['throughput'], 0)
+        self.assertLessEqual(report['p50_ms'], report['p99_ms'])
+        self.assertGreater(report['queries_per_update'], 0)
+        self.assertTrue(set(report['by_kind']) <= set(benchmark.WORKLOAD_MIX))
+        self.assertEqual(report['errors'], 0)
+    
+    def test_caches_cleared_before_replay(self):
+        """Projects and graphs cached by an earlier run are not served to the next one"""
+        bot.dependency_graph.projects[1] = 'stale graph'
+        bot.read_model.projects[1] = 'stale project'
+        with tempfile.TemporaryDirectory() as db_dir:
+            benchmark.run('tiny', db_dir=db_dir, updates=10)
+        
+        self.assertNotEqual(bot.dependency_graph.projects.get(1), 'stale graph')
+        self.assertNotIn(1, bot.read_model.projects)
+    
+    def test_cache_is_keyed_on_schema(self):
+        """A dataset cached for another schema is not reused"""
+        with tempfile.TemporaryDirectory() as db_dir:
+            benchmark.run('tiny', db_dir=db_dir, updates=10)
+            with patch.object(benchmark, 'schema_fingerprint', return_value='oldschema'):
+                benchmark.run('tiny', db_dir=db_dir, updates=10)
+            self.assertEqual(len(os.listdir(db_dir)), 2)
+    
+    def test_handler_errors_fail_the_run(self):
+        """Errors the handlers log and swallow are counted and make main exit non-zero"""
+        with tempfile.TemporaryDirectory() as db_dir:
+            benchmark.run('tiny', db_dir=db_dir, updates=10)
+            path = os.path.join(db_dir, os.listdir(db_dir)[0])
+            with sqlite3.connect(path) as conn:
+                conn.execute("DROP TABLE task_rollups")
+            
+            report = benchmark.run('tiny', db_dir=db_dir, updates=50)
+            exit_code = benchmark.main(['--preset', 'tiny', '--updates', '50', '--db-dir', db_dir,
+                                        '--baseline', os.path.join(db_dir, 'baseline.json'), '--save-baseline'])
+        
+        self.assertGreater(report['errors'], 0)
+        self.assertEqual(report['errors'], sum(row['errors'] for row in report['by_kind'].values()))
+        self.assertIsNotNone(report['first_error'])
+        self.assertEqual(exit_code, 1)
+    
+    def test_compare_flags_regressions(self):
+        """Slower latency or extra queries against the baseline are reported"""
+        baseline = {'throughput': 100.0, 'by_kind': {'task': {'p95_ms': 10.0, 'queries_per_update': 4.0}}}
+        report = {'throughput': 50.0, 'by_kind': {'task': {'p95_ms': 20.0, 'queries_per_update': 6.0}}}
+        
+        self.assertEqual(len(benchmark.compare(report, baseline, tolerance=0.2)), 3)
+        self.assertEqual(benchmark.compare(baseline, baseline, tolerance=0.2), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ import asyncio
 import os
 import tempfile
 from unittest.mock import Mock, AsyncMock, patch, MagicMock
-from sqlalchemy import create_engine
+from db_testing import make_test_engine
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 
@@ -19,9 +19,8 @@ class TestBotFunctions(unittest.TestCase):
     
     def setUp(self):
         """Set up test database and mock objects"""
-        # Create in-memory SQLite database for testing
-        self.engine = create_engine('sqlite:///:memory:')
-        Base.metadata.create_all(self.engine)
+        # Create test database (in-memory SQLite unless TEST_DATABASE_URL is set)
+        self.engine = make_test_engine()
         self.SessionLocal = sessionmaker(bind=self.engine)
         
         # Create test session
@@ -105,6 +104,7 @@ class TestBotFunctions(unittest.TestCase):
     def tearDown(self):
         """Clean up after tests"""
         self.db.close()
+        self.engine.dispose()
     
     def test_get_or_create_user_new_user(self):
         """Test creating a new user"""
@@ -343,14 +343,14 @@ class TestDatabaseRelationships(unittest.TestCase):
     
     def setUp(self):
         """Set up test database"""
-        self.engine = create_engine('sqlite:///:memory:')
-        Base.metadata.create_all(self.engine)
+        self.engine = make_test_engine()
         self.SessionLocal = sessionmaker(bind=self.engine)
         self.db = self.SessionLocal()
     
     def tearDown(self):
         """Clean up"""
         self.db.close()
+        self.engine.dispose()
     
     def test_project_members_relationship(self):
         """Test project members relationship works correctly"""
@@ -0,0 +1,101 @@
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock
+from telegram.error import BadRequest, Forbidden, NetworkError, TimedOut
+
+from notifications import ChannelNotifier, CircuitBreaker, CLOSED, OPEN, HALF_OPEN, is_channel_failure
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test the per-channel circuit breaker states"""
+
+    def test_opens_after_threshold_and_probes(self):
+        """Breaker opens after repeated failures and lets one probe through later"""
+        breaker = CircuitBreaker(threshold=2, probe_interval=10)
+        self.assertFalse(breaker.record_failure(now=0))
+        self.assertTrue(breaker.record_failure(now=1))
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow(now=5))
+
+        self.assertTrue(breaker.allow(now=11))
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.allow(now=11))
+
+        # A failed probe reopens without reporting a new opening
+        self.assertFalse(breaker.record_failure(now=12))
+        self.assertEqual(breaker.state, OPEN)
+        self.assertTrue(breaker.allow(now=22))
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.failures, 0)
+
+    def test_channel_failure_classification(self):
+        """Only errors about the chat count against the channel"""
+        self.assertTrue(is_channel_failure(Forbidden("bot is not a member of the channel chat")))
+        self.assertTrue(is_channel_failure(BadRequest("Chat not found")))
+        self.assertFalse(is_channel_failure(BadRequest("Can't parse entities")))
+        self.assertFalse(is_channel_failure(NetworkError("timed out")))
+
+class TestChannelNotifier(unittest.TestCase):
+    """Test channel resolution caching and suppressed sends"""
+
+    def setUp(self):
+        self.bot = Mock()
+        self.bot.get_chat = AsyncMock(return_value=Mock(id=-1001234))
+        self.bot.send_message = AsyncMock()
+        self.notifier = ChannelNotifier(threshold=2, probe_interval=60, cache_ttl=60)
+        self.project = Mock(id=1, owner=Mock(telegram_id=42))
+        self.project.name = "Alpha"
+
+    def test_resolve_is_cached(self):
+        """getChat is called once per channel reference"""
+        first = asyncio.run(self.notifier.resolve(self.bot, "@alpha"))
+        second = asyncio.run(self.notifier.resolve(self.bot, " @alpha "))
+        self.assertEqual(first, "-1001234")
+        self.assertEqual(second, "-1001234")
+        self.bot.get_chat.assert_awaited_once_with("@alpha")
+
+    def test_legacy_username_resolved_on_send(self):
+        """Channels stored as @username are sent to their numeric id"""
+        self.assertTrue(asyncio.run(self.notifier.send(self.bot, "@alpha", "hi")))
+        self.bot.send_message.assert_awaited_once_with(chat_id="-1001234", text="hi", parse_mode='Markdown')
+
+    def test_open_circuit_suppresses_and_alerts_owner(self):
+        """After the threshold the owner is told once and further sends are skipped"""
+        self.bot.send_message.side_effect = [Forbidden("bot was kicked"), Forbidden("bot was kicked"), None]
+
+        async def scenario():
+            results = [await self.notifier.send(self.bot, "-1001234", "hi", self.project) for _ in range(4)]
+            return results
+
+        self.assertEqual(asyncio.run(scenario()), [False, False, False, False])
+        # Two channel attempts plus one owner alert; the last two sends never reached Telegram
+        self.assertEqual(self.bot.send_message.await_count, 3)
+        self.assertEqual(self.bot.send_message.await_args_list[2].kwargs['chat_id'], 42)
+        self.assertEqual(self.notifier.suppressed, 2)
+
+    def test_probe_failing_with_timeout_retries_later(self):
+        """A probe that times out reopens the breaker instead of leaving it half-open forever"""
+        breaker = self.notifier.breaker("-1001234")
+        breaker.record_failure(now=0)
+        breaker.record_failure(now=0)
+        self.bot.send_message.side_effect = [TimedOut(), None]
+
+        self.assertFalse(asyncio.run(self.notifier.send(self.bot, "-1001234", "hi")))
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(asyncio.run(self.notifier.send(self.bot, "-1001234", "hi")))
+        self.assertEqual(self.bot.send_message.await_count, 1)
+
+        breaker.opened_at -= 60
+        self.assertTrue(asyncio.run(self.notifier.send(self.bot, "-1001234", "hi")))
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_reset_closes_circuit(self):
+        """Reconfiguring the channel clears its breaker"""
+        breaker = self.notifier.breaker("-1001234")
+        breaker.record_failure()
+        breaker.record_failure()
+        self.notifier.reset("-1001234")
+        self.assertTrue(asyncio.run(self.notifier.send(self.bot, "-1001234", "hi")))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock
+from sqlalchemy.orm import sessionmaker
+
+import bot
+from db_testing import make_test_engine
+from models import User, Project, Section, Task
+
+class TestOptimisticConcurrency(unittest.TestCase):
+    """Test version compare-and-swap on task status updates"""
+
+    def setUp(self):
+        """Set up one task and two members with their own sessions"""
+        self.engine = make_test_engine()
+        Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.db = Session()
+        self.other_db = Session()
+
+        self.owner = User(telegram_id=1, first_name="Owner")
+        self.member = User(telegram_id=2, first_name="Member")
+        self.db.add_all([self.owner, self.member])
+        self.db.flush()
+        project = Project(name="Alpha", owner_id=self.owner.id, members=[self.member])
+        section = Section(name="Backend", project=project)
+        self.task = Task(title="API", status="todo", section=section)
+        self.db.add_all([project, section, self.task])
+        self.db.commit()
+
+        self.query = Mock()
+        self.query.edit_message_text = AsyncMock()
+
+    def tearDown(self):
+        """Clean up"""
+        self.db.close()
+        self.other_db.close()
+        self.engine.dispose()
+
+    def current(self):
+        self.db.expire_all()
+        return self.db.get(Task, self.task.id)
+
+    def test_buttons_carry_version(self):
+        """Status buttons encode the version they were rendered with"""
+        _, markup = bot.render_task(self.task.id, "API", None, "todo", None, self.task.created_at, 1, version=3)
+        self.assertEqual(markup.inline_keyboard[0][1].callback_data, f"status_{self.task.id}_3_in_progress")
+        self.assertEqual(bot.callback_route(markup.inline_keyboard[0][1].callback_data), "status")
+
+    def test_stale_click_is_rejected(self):
+        """A click rendered from an older version does not overwrite the newer state"""
+        asyncio.run(bot.update_task_status(self.query, self.db, self.owner, self.task.id, "done", 1))
+        self.assertEqual((self.current().status, self.current().version), ("done", 2))
+
+        member = self.other_db.get(User, self.member.id)
+        asyncio.run(bot.update_task_status(self.query, self.other_db, member, self.task.id, "in_progress", 1))
+
+        self.assertEqual((self.current().status, self.current().version), ("done", 2))
+        text = self.query.edit_message_text.call_args[0][0]
+        self.assertTrue(text.startswith(bot.CONFLICT_NOTICE))
+        self.assertIn("تکمیل شده", text)
+
+    def test_lost_compare_and_swap(self):
+        """A concurrent commit between read and write surfaces as a conflict, not an overwrite"""
+        stale = self.other_db.get(Task, self.task.id)
+        self.assertEqual(stale.version, 1)
+        asyncio.run(bot.update_task_status(self.query, self.db, self.owner, self.task.id, "done"))
+
+        # other_db still holds version 1 in its identity map, so its UPDATE matches no row
+        member = self.other_db.get(User, self.member.id)
+        asyncio.run(bot.update_task_status(self.query, self.other_db, member, self.task.id, "in_progress"))
+
+        self.assertEqual(self.current().status, "done")
+        self.assertTrue(self.query.edit_message_text.call_args[0][0].startswith(bot.CONFLICT_NOTICE))
+
+if __name__ == '__main__':
+    unittest.main()
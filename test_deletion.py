@@ -0,0 +1,88 @@
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock
+from sqlalchemy import event, insert
+from sqlalchemy.orm import sessionmaker
+
+import bot
+from archive import archive_project
+from db_testing import make_test_engine
+from deletion import delete_in_chunks, delete_project, delete_section
+from models import User, Project, Section, Task, ArchivedTask, project_members
+
+class TestBulkDeletion(unittest.TestCase):
+    """Test chunked set-based deletes and archival of projects and sections"""
+
+    def setUp(self):
+        """Set up two projects; the first one has 2500 tasks over two sections"""
+        self.engine = make_test_engine()
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.db = self.Session()
+
+        self.owner = User(telegram_id=1, first_name="Owner")
+        self.member = User(telegram_id=2, first_name="Member")
+        self.db.add_all([self.owner, self.member])
+        self.db.flush()
+        self.project = Project(name="Big", owner_id=self.owner.id, members=[self.member])
+        self.other = Project(name="Other", owner_id=self.owner.id)
+        self.sections = [Section(name=f"S{i}", project=self.project) for i in range(2)]
+        self.other_section = Section(name="Keep", project=self.other)
+        self.db.add_all([self.project, self.other, self.other_section] + self.sections)
+        self.db.commit()
+
+        self.db.execute(insert(Task), [
+            {'title': f"t{i}", 'status': 'done' if i % 2 else 'todo', 'section_id': self.sections[i % 2].id}
+            for i in range(2500)
+        ] + [{'title': "keep", 'status': 'todo', 'section_id': self.other_section.id}])
+        self.db.commit()
+
+    def tearDown(self):
+        """Clean up"""
+        self.db.close()
+        self.engine.dispose()
+
+    def test_delete_in_chunks(self):
+        """Each chunk is a single DELETE statement in its own transaction"""
+        statements = []
+        event.listen(self.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        deleted = delete_in_chunks(
+            Task.id, (Task.section_id == self.sections[0].id,), batch_size=500, session_factory=self.Session
+        )
+
+        self.assertEqual(deleted, 1250)
+        self.assertEqual(len([s for s in statements if s.lstrip().upper().startswith("DELETE")]), 3)
+        self.assertFalse([s for s in statements if s.lstrip().upper().startswith("SELECT")])
+
+    def test_delete_project(self):
+        """Project deletion removes tasks, archived tasks, sections and memberships only of that project"""
+        archive_project(self.project.id, batch_size=1000, session_factory=self.Session)
+        self.assertEqual(self.db.query(ArchivedTask).count(), 2500)
+
+        removed = delete_project(self.project.id, batch_size=1000, session_factory=self.Session)
+
+        self.assertEqual(removed, 2500)
+        self.assertEqual([title for (title,) in self.db.query(Task.title)], ["keep"])
+        self.assertEqual(self.db.query(ArchivedTask).count(), 0)
+        self.assertEqual([name for (name,) in self.db.query(Section.name)], ["Keep"])
+        self.assertEqual(self.db.query(project_members).count(), 0)
+        self.assertEqual([name for (name,) in self.db.query(Project.name)], ["Other"])
+
+    def test_delete_section(self):
+        """Section deletion leaves sibling sections alone"""
+        removed = delete_section(self.sections[1].id, batch_size=1000, session_factory=self.Session)
+
+        self.assertEqual(removed, 1250)
+        self.assertEqual(self.db.query(Task).filter(Task.section_id == self.sections[0].id).count(), 1250)
+        self.assertIsNone(self.db.query(Section.id).filter(Section.id == self.sections[1].id).scalar())
+
+    def test_only_owner_can_run(self):
+        """Members get an error and nothing is deleted"""
+        query = Mock()
+        query.edit_message_text = AsyncMock()
+        asyncio.run(bot.run_bulk_action(query, self.db, self.member, 'delproject', self.project.id))
+
+        self.assertEqual(query.edit_message_text.call_args[0][0], "❌ پروژه یافت نشد یا شما مالک نیستید.")
+        self.assertEqual(self.db.query(Task).count(), 2501)
+
+if __name__ == '__main__':
+    unittest.main()
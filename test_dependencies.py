@@ -0,0 +1,137 @@
+import unittest
+import asyncio
+import random
+from unittest.mock import Mock, AsyncMock
+from sqlalchemy.orm import sessionmaker
+
+import bot
+from db_testing import make_test_engine
+from dependencies import DependencyGraph, add_dependency, creates_cycle
+from deletion import delete_section
+from models import User, Project, Section, Task, task_dependencies
+
+class TestDependencies(unittest.TestCase):
+    """Test dependency edges, cycle detection and the incrementally maintained graph"""
+
+    def setUp(self):
+        """Set up a project with a chain design -> build -> release and a loose task"""
+        self.engine = make_test_engine()
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.db = self.Session()
+        bot.dependency_graph.clear()
+
+        self.owner = User(telegram_id=1, first_name="Owner")
+        self.stranger = User(telegram_id=2, first_name="Stranger")
+        self.db.add_all([self.owner, self.stranger])
+        self.db.flush()
+        self.project = Project(name="Alpha", owner_id=self.owner.id)
+        self.section = Section(name="Backend", project=self.project)
+        self.db.add_all([self.project, self.section])
+        self.db.flush()
+        self.design, self.build, self.release, self.docs = (
+            Task(title=title, section_id=self.section.id) for title in ("design", "build", "release", "docs")
+        )
+        self.db.add_all([self.design, self.build, self.release, self.docs])
+        self.db.flush()
+        add_dependency(self.db, self.project.id, self.build.id, self.design.id)
+        add_dependency(self.db, self.project.id, self.release.id, self.build.id)
+        self.db.commit()
+
+        self.query = Mock()
+        self.query.edit_message_text = AsyncMock()
+
+    def tearDown(self):
+        """Clean up"""
+        bot.dependency_graph.clear()
+        self.db.close()
+        self.engine.dispose()
+
+    def test_cycle_detection(self):
+        """Edges closing a cycle, directly or through a chain, are refused"""
+        self.assertTrue(creates_cycle(self.db, self.design.id, self.release.id))
+        self.assertTrue(creates_cycle(self.db, self.docs.id, self.docs.id))
+        self.assertFalse(add_dependency(self.db, self.project.id, self.design.id, self.release.id))
+        self.assertTrue(add_dependency(self.db, self.project.id, self.docs.id, self.release.id))
+        self.db.commit()
+        self.assertEqual(self.db.query(task_dependencies).count(), 3)
+
+        asyncio.run(bot.change_dependency(self.query, self.db, self.owner, self.design.id, self.build.id, True))
+        self.assertIn("چرخه", self.query.edit_message_text.call_args[0][0])
+        self.assertEqual(self.db.query(task_dependencies).count(), 3)
+
+    def test_cycle_in_table_does_not_hang(self):
+        """A cycle written behind add_dependency's back still leaves every walk finite"""
+        self.db.execute(task_dependencies.insert().values(
+            task_id=self.design.id, blocked_by_id=self.release.id, project_id=self.project.id
+        ))
+        self.db.commit()
+        graph = DependencyGraph().get(self.db, self.project.id)
+
+        path = graph.critical_path()
+        self.assertEqual(len(path), len(set(path)))
+        graph.add_edge(self.docs.id, self.release.id)
+        graph.set_status(self.release.id, 'done')
+        graph.set_status(self.release.id, 'todo')
+        self.assertTrue(all(height <= len(graph.open) for height in graph.height.values()))
+        self.assertFalse(add_dependency(self.db, self.project.id, self.build.id, self.release.id))
+
+    def test_critical_path_and_ready_queue(self):
+        """The chain is the critical path; completing a blocker readies the next task"""
+        graph = bot.dependency_graph.get(self.db, self.project.id)
+        self.assertEqual(graph.critical_path(), [self.design.id, self.build.id, self.release.id])
+        self.assertEqual(graph.ready_queue(), [self.design.id, self.docs.id])
+        self.assertEqual(graph.state(self.build.id), 'blocked')
+        self.assertIsNone(graph.state(self.docs.id))
+
+        asyncio.run(bot.update_task_status(self.query, self.db, self.owner, self.design.id, "done"))
+
+        self.assertIs(bot.dependency_graph.get(self.db, self.project.id), graph)
+        self.assertEqual(graph.critical_path(), [self.build.id, self.release.id])
+        self.assertEqual(graph.ready_queue(), [self.build.id, self.docs.id])
+        self.assertEqual(graph.state(self.build.id), 'ready')
+
+        asyncio.run(bot.show_critical_path(self.query, self.db, self.owner, self.project.id))
+        self.assertIn("1. build\n2. release", self.query.edit_message_text.call_args[0][0])
+        asyncio.run(bot.show_critical_path(self.query, self.db, self.stranger, self.project.id))
+        self.assertEqual(self.query.edit_message_text.call_args[0][0], "پروژه یافت نشد یا دسترسی رد شد.")
+
+    def test_task_list_indicator(self):
+        """show_tasks marks blocked and ready tasks that have dependencies"""
+        asyncio.run(bot.show_tasks(self.query, self.db, self.owner, self.section.id))
+        labels = [row[0].text for row in self.query.edit_message_text.call_args[1]['reply_markup'].inline_keyboard]
+        self.assertIn("⭕ ⛔ build", labels)
+        self.assertIn("⭕ design", labels)
+
+    def test_incremental_matches_reload(self):
+        """Random status and edge changes leave the graph identical to a fresh load"""
+        rng = random.Random(0)
+        tasks = [Task(title=f"t{i}", section_id=self.section.id) for i in range(40)]
+        self.db.add_all(tasks)
+        self.db.commit()
+        graph = bot.dependency_graph.get(self.db, self.project.id)
+        ids = [task.id for task in tasks]
+
+        for _ in range(200):
+            task_id, other_id = rng.sample(ids, 2)
+            if rng.random() < 0.4 and add_dependency(self.db, self.project.id, task_id, other_id):
+                self.db.commit()
+                bot.dependency_graph.dependency_added(self.project.id, task_id, other_id)
+            else:
+                status = rng.choice(["todo", "in_progress", "done"])
+                self.db.get(Task, task_id).status = status
+                self.db.commit()
+                bot.dependency_graph.status_changed(self.project.id, task_id, status)
+
+        fresh = DependencyGraph().get(self.db, self.project.id)
+        self.assertEqual(graph.open, fresh.open)
+        self.assertEqual(graph.ready, fresh.ready)
+        self.assertEqual(graph.open_blockers, fresh.open_blockers)
+        self.assertEqual({t: graph.height[t] for t in graph.open}, {t: fresh.height[t] for t in fresh.open})
+
+    def test_delete_section_removes_edges(self):
+        """Deleting a section also deletes the edges of its tasks"""
+        delete_section(self.section.id, session_factory=self.Session)
+        self.assertEqual(self.db.query(task_dependencies).count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
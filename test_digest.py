@@ -0,0 +1,159 @@
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+from datetime import datetime, timedelta, timezone
+from db_testing import make_test_engine
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import sessionmaker
+
+import bot
+import digest
+from digest import collect_digests, format_digest, send_digests
+from models import User, Project, Section, Task, TaskEvent, create_missing_columns
+
+class TestDailyDigest(unittest.TestCase):
+    """Test daily digest aggregation and sending"""
+    
+    def setUp(self):
+        """Set up test database with two channel projects and one silent project"""
+        self.engine = make_test_engine()
+        self.Session = sessionmaker(bind=self.engine)
+        self.db = self.Session()
+        
+        self.now = datetime.now(timezone.utc)
+        self.since = self.now - timedelta(days=1)
+        old = self.now - timedelta(days=3)
+        
+        owner = User(telegram_id=1, username="owner", first_name="Owner")
+        self.db.add(owner)
+        self.db.flush()
+        
+        self.alpha = Project(name="Alpha", owner_id=owner.id, channel_id="@alpha")
+        self.beta = Project(name="Beta", owner_id=owner.id, channel_id="@beta")
+        silent = Project(name="Silent", owner_id=owner.id)
+        self.db.add_all([self.alpha, self.beta, silent])
+        self.db.flush()
+        
+        alpha_section = Section(name="Backend", project_id=self.alpha.id)
+        silent_section = Section(name="Misc", project_id=silent.id)
+        self.db.add_all([alpha_section, silent_section])
+        self.db.flush()
+        
+        self.db.add_all([
+            Task(title="old done", section_id=alpha_section.id, status="done", created_at=old, updated_at=old),
+            Task(title="new done", section_id=alpha_section.id, status="done", created_at=old, updated_at=self.now),
+            Task(title="new todo", section_id=alpha_section.id, status="todo", created_at=self.now),
+            Task(title="overdue", section_id=alpha_section.id, status="in_progress", created_at=old,
+                 due_date=old),
+            Task(title="silent", section_id=silent_section.id, status="todo", created_at=self.now),
+        ])
+        self.db.flush()
+        old_done, new_done = self.db.query(Task).filter(Task.status == "done").order_by(Task.id)
+        self.db.add_all([
+            TaskEvent(task_id=old_done.id, project_id=self.alpha.id, status="done", at=old),
+            TaskEvent(task_id=new_done.id, project_id=self.alpha.id, status="done", at=self.now),
+        ])
+        self.db.commit()
+    
+    def tearDown(self):
+        """Clean up"""
+        self.db.close()
+        self.engine.dispose()
+    
+    def test_collect_digests_counts(self):
+        """Only channel projects are summarised, with per-project counters"""
+        digests = {d.project_name: d for d in collect_digests(self.db, self.since, self.now)}
+        
+        self.assertEqual(set(digests), {"Alpha", "Beta"})
+        alpha = digests["Alpha"]
+        self.assertEqual(alpha.total, 4)
+        self.assertEqual(alpha.done, 2)
+        self.assertEqual(alpha.completed, 1)
+        self.assertEqual(alpha.added, 1)
+        self.assertEqual(alpha.overdue, 1)
+        self.assertEqual(alpha.progress, 50)
+        self.assertEqual(digests["Beta"].total, 0)
+        self.assertEqual(digests["Beta"].progress, 0)
+    
+    def test_completed_ignores_later_edits(self):
+        """Editing a task done days ago does not report it as completed again"""
+        task = self.db.query(Task).filter(Task.title == "old done").one()
+        task.priority = "high"
+        self.db.commit()
+        self.assertGreaterEqual(task.updated_at.replace(tzinfo=timezone.utc), self.since)
+        
+        alpha = next(d for d in collect_digests(self.db, self.since, self.now) if d.project_name == "Alpha")
+        self.assertEqual(alpha.completed, 1)
+    
+    def test_daily_digest_job_reads_off_the_event_loop(self):
+        """The job collects in a read session of its own and sends one digest per channel"""
+        notifier = Mock()
+        notifier.send = AsyncMock(return_value=True)
+        context = Mock()
+        with patch.object(digest, 'ReadSessionLocal', self.Session), patch.object(digest, 'channel_notifier', notifier):
+            asyncio.run(digest.daily_digest_job(context))
+        
+        self.assertEqual(sorted(call[0][1] for call in notifier.send.call_args_list), ["@alpha", "@beta"])
+        self.assertIn("50%", notifier.send.call_args_list[0][0][2])
+    
+    def test_format_digest(self):
+        """Digest message contains the project name and progress"""
+        digest = next(d for d in collect_digests(self.db, self.since, self.now) if d.project_name == "Alpha")
+        text = format_digest(digest)
+        self.assertIn("Alpha", text)
+        self.assertIn("50%", text)
+    
+    def test_send_digests_isolates_failures(self):
+        """A failing channel does not prevent delivery to the others"""
+        digests = collect_digests(self.db, self.since, self.now)
+        bot = Mock()
+        bot.send_message = AsyncMock(side_effect=[Exception("chat not found"), None])
+        
+        results = asyncio.run(send_digests(bot, digests, interval=0))
+        
+        self.assertEqual(bot.send_message.await_count, 2)
+        self.assertEqual(sorted(results.values()), [False, True])
+
+    def test_due_date_set_through_bot(self):
+        """Members set or clear a due date by message; past due dates count as overdue"""
+        task = self.db.query(Task).filter(Task.title == "new todo").one()
+        update = Mock()
+        update.effective_user = Mock(id=1, username="owner", first_name="Owner")
+        update.message.reply_text = AsyncMock()
+        context = Mock()
+        yesterday = (self.now - timedelta(days=1)).strftime('%Y-%m-%d')
+        
+        with patch.object(bot, 'get_db', return_value=self.db), patch.object(bot, 'release_session'):
+            for reply in ("tomorrow", yesterday):
+                context.user_data = {'action': f'set_due_{task.id}'}
+                update.message.text = reply
+                asyncio.run(bot.message_handler(update, context))
+            self.assertIn("تاریخ نامعتبر", update.message.reply_text.call_args_list[0][0][0])
+            self.assertEqual(task.due_date.strftime('%Y-%m-%d'), yesterday)
+            alpha = next(d for d in collect_digests(self.db, self.since, self.now) if d.project_name == "Alpha")
+            self.assertEqual(alpha.overdue, 2)
+            
+            query = Mock()
+            query.edit_message_text = AsyncMock()
+            owner = self.db.query(User).filter(User.telegram_id == 1).one()
+            asyncio.run(bot.show_task(query, self.db, owner, task.id))
+            self.assertIn(f"⏰ مهلت: {yesterday} (عقب‌افتاده ⚠️)", query.edit_message_text.call_args[0][0])
+            
+            context.user_data = {'action': f'set_due_{task.id}'}
+            update.message.text = "-"
+            asyncio.run(bot.message_handler(update, context))
+        self.assertIsNone(task.due_date)
+    
+    def test_due_date_column_added_to_existing_database(self):
+        """Databases created before due dates get the column on startup"""
+        self.db.close()
+        with self.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE tasks DROP COLUMN due_date"))
+        create_missing_columns(self.engine)
+        
+        self.assertIn('due_date', {column['name'] for column in inspect(self.engine).get_columns('tasks')})
+        self.db = sessionmaker(bind=self.engine)()
+        self.assertEqual(self.db.query(Task).count(), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import asyncio
+from telegram import Bot
+from telegram.error import BadRequest, RetryAfter
+
+from fake_telegram import FakeTelegramServer
+
+class TestFakeTelegramServer(unittest.TestCase):
+    """Test the local Bot API stand-in through a real python-telegram-bot client"""
+    
+    def setUp(self):
+        """Start a fake server on a free port"""
+        self.server = FakeTelegramServer(port=0, max_message_length=100).start()
+    
+    def tearDown(self):
+        """Stop the server"""
+        self.server.stop()
+    
+    def run_bot(self, coroutine_factory):
+        async def runner():
+            bot = Bot("123:fake", base_url=f"{self.server.url}/bot")
+            async with bot:
+                return await coroutine_factory(bot)
+        return asyncio.run(runner())
+    
+    def test_send_and_edit_message(self):
+        """Messages are stored and can be edited"""
+        async def scenario(bot):
+            message = await bot.send_message(chat_id=42, text="hello")
+            edited = await bot.edit_message_text("bye", chat_id=42, message_id=message.message_id)
+            return message, edited
+        
+        message, edited = self.run_bot(scenario)
+        self.assertEqual(message.text, "hello")
+        self.assertEqual(edited.text, "bye")
+        self.assertEqual(self.server.messages[(42, message.message_id)]['text'], "bye")
+    
+    def test_get_chat_and_send_photo(self):
+        """Channel usernames resolve to a stable id and uploaded photos are stored with their caption"""
+        async def scenario(bot):
+            chat = await bot.get_chat("@alpha")
+            again = await bot.get_chat("@alpha")
+            message = await bot.send_photo(chat_id=chat.id, photo=b"\x89PNG fake chart", caption="📈 chart")
+            resent = await bot.send_photo(chat_id=42, photo=message.photo[-1].file_id)
+            return chat, again, message, resent
+        
+        chat, again, message, resent = self.run_bot(scenario)
+        self.assertEqual((chat.id, chat.type, chat.username), (again.id, "channel", "alpha"))
+        self.assertLess(chat.id, 0)
+        self.assertEqual(message.caption, "📈 chart")
+        self.assertEqual(message.photo[-1].file_size, len(b"\x89PNG fake chart"))
+        self.assertEqual(resent.photo[-1].file_id, message.photo[-1].file_id)
+        self.assertIn((chat.id, message.message_id), self.server.messages)
+    
+    def test_message_size_enforced(self):
+        """Texts over the configured limit are rejected like the real API"""
+        with self.assertRaises(BadRequest):
+            self.run_bot(lambda bot: bot.send_message(chat_id=42, text="x" * 101))
+    
+    def test_rate_limit_injection(self):
+        """A 429 with retry_after is surfaced as RetryAfter"""
+        self.server.error_rate = 1.0
+        with self.assertRaises(RetryAfter):
+            self.run_bot(lambda bot: bot.send_message(chat_id=42, text="hello"))
+        self.assertEqual(self.server.stats['rate_limited'], 1)
+    
+    def test_get_updates(self):
+        """Injected messages and button presses are delivered through getUpdates"""
+        self.server.send_text(7, "/start")
+        self.server.press_button(7, "list_projects")
+        
+        updates = self.run_bot(lambda bot: bot.get_updates(timeout=0))
+        self.assertEqual(updates[0].message.text, "/start")
+        self.assertEqual(updates[1].callback_query.data, "list_projects")
+        
+        remaining = self.run_bot(lambda bot: bot.get_updates(offset=updates[-1].update_id + 1, timeout=0))
+        self.assertEqual(remaining, ())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import io
+import json
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueListener
+
+from log_pipeline import JsonFormatter, LazyQueueHandler, SamplingFilter
+from metrics import log_records_dropped
+
+class SlowStream(io.StringIO):
+    """Stream taking 1ms per write, like a congested disk or pipe"""
+
+    def write(self, text):
+        time.sleep(0.001)
+        return super().write(text)
+
+class Recorder:
+    """Argument remembering which thread rendered it"""
+
+    def __init__(self):
+        self.thread = None
+
+    def __str__(self):
+        self.thread = threading.current_thread()
+        return "rendered"
+
+class TestLogPipeline(unittest.TestCase):
+    """Test the queued, sampled JSON logging pipeline"""
+
+    def setUp(self):
+        """A logger of its own, writing through the pipeline to a slow stream"""
+        self.stream = SlowStream()
+        writer = logging.StreamHandler(self.stream)
+        writer.setFormatter(JsonFormatter())
+        self.handler = LazyQueueHandler(queue.Queue(100_000))
+        self.listener = QueueListener(self.handler.queue, writer)
+        self.logger = logging.getLogger(f"test_log_pipeline.{self.id()}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.handler)
+        self.listener.start()
+
+    def tearDown(self):
+        """Stop the writer thread"""
+        self.listener.stop()
+        self.logger.removeHandler(self.handler)
+
+    def records(self):
+        self.listener.stop()
+        self.listener.start()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_json_records_formatted_off_thread(self):
+        """Messages are rendered by the writer thread, with event and extra fields"""
+        argument = Recorder()
+        self.logger.info("Task %s is %s", 5, argument, extra={'event': 'status_changed', 'project': 2})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            self.logger.exception("Failed")
+
+        first, second = self.records()
+        self.assertEqual((first['message'], first['event'], first['project']),
+                         ("Task 5 is rendered", 'status_changed', 2))
+        self.assertIsNot(argument.thread, threading.current_thread())
+        self.assertEqual(second['level'], 'ERROR')
+        self.assertIn("ValueError: boom", second['exc'])
+        self.assertTrue(second['event'].startswith("test_log_pipeline:"))
+
+    def test_sampling_and_rate_limits(self):
+        """Sampled-out types are dropped below WARNING; every type has its own rate limit"""
+        self.handler.addFilter(SamplingFilter({'noisy': 0.0}, rate=0.001, burst=3))
+        before = log_records_dropped.value('sampled'), log_records_dropped.value('rate_limited')
+        for i in range(5):
+            self.logger.info("noise %s", i, extra={'event': 'noisy'})
+            self.logger.warning("loud %s", i, extra={'event': 'noisy'})
+            self.logger.info("useful %s", i)
+
+        messages = [record['message'] for record in self.records()]
+        self.assertEqual(messages, ["loud 0", "useful 0", "loud 1", "useful 1", "loud 2", "useful 2"])
+        self.assertEqual(log_records_dropped.value('sampled') - before[0], 5)
+        self.assertEqual(log_records_dropped.value('rate_limited') - before[1], 4)
+
+    def test_caller_never_waits_for_io(self):
+        """A slow sink does not slow down the logging call, and a full queue drops instead of blocking"""
+        began = time.perf_counter()
+        for i in range(500):
+            self.logger.info("record %s", i)
+        elapsed = time.perf_counter() - began
+        # The sink alone needs 0.5s for these records
+        self.assertLess(elapsed, 0.25)
+        self.assertEqual(len(self.records()), 500)
+
+        full = LazyQueueHandler(queue.Queue(1))
+        before = log_records_dropped.value('queue_full')
+        for i in range(3):
+            full.handle(logging.LogRecord("x", logging.INFO, __file__, 1, "m", (), None))
+        self.assertEqual(log_records_dropped.value('queue_full') - before, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import bot
+from db_testing import make_test_engine
+from models import User, Project, project_members
+
+class TestBulkMembers(unittest.TestCase):
+    """Test bulk member invites, the member list and removal"""
+
+    def setUp(self):
+        """Set up an owner, a project and a few registered users"""
+        self.engine = make_test_engine()
+        self.db = sessionmaker(bind=self.engine, expire_on_commit=False)()
+
+        self.owner = User(telegram_id=1, username="owner", first_name="Owner")
+        self.users = [User(telegram_id=100 + i, username=f"User{i}", first_name=f"User {i}") for i in range(5)]
+        self.db.add_all([self.owner] + self.users)
+        self.db.flush()
+        self.project = Project(name="Alpha", owner_id=self.owner.id)
+        self.db.add(self.project)
+        self.db.commit()
+
+        self.query = Mock()
+        self.query.edit_message_text = AsyncMock()
+
+    def tearDown(self):
+        """Clean up"""
+        self.db.close()
+        self.engine.dispose()
+
+    def member_ids(self):
+        return {user_id for (user_id,) in self.db.query(project_members.c.user_id)}
+
+    def test_parse_member_refs(self):
+        """Ids and @usernames are split on spaces and (Persian) commas"""
+        telegram_ids, usernames = bot.parse_member_refs("100, @User1 user2،101\n@")
+        self.assertEqual(telegram_ids, {100, 101})
+        self.assertEqual(usernames, {"user1", "user2"})
+
+    def test_add_members_is_set_based(self):
+        """One lookup and one insert add everyone; existing members and the owner are skipped"""
+        self.db.execute(project_members.insert().values(project_id=self.project.id, user_id=self.users[0].id))
+        self.db.commit()
+
+        statements = []
+        event.listen(self.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        user_ids, added, unresolved = bot.add_members(
+            self.db, self.project, {100, 1, 999}, {"user1", "user2", "ghost"}
+        )
+        issued = [s for s in statements if s.lstrip().upper().startswith(("SELECT", "INSERT"))]
+
+        self.assertEqual(added, 2)
+        self.assertEqual(len(user_ids), 3)
+        self.assertEqual(unresolved, ["999", "@ghost"])
+        self.assertEqual(self.member_ids(), {self.users[0].id, self.users[1].id, self.users[2].id})
+        self.assertEqual(len(issued), 2)
+
+    def test_member_pages_and_removal(self):
+        """Members are listed in keyset pages and the owner can remove them"""
+        bot.add_members(self.db, self.project, {user.telegram_id for user in self.users}, set())
+
+        with patch.object(bot, 'MEMBERS_PAGE_SIZE', 3):
+            asyncio.run(bot.show_members(self.query, self.db, self.owner, self.project.id))
+            markup = self.query.edit_message_text.call_args[1]['reply_markup']
+            next_button = markup.inline_keyboard[3][0]
+            self.assertEqual(next_button.callback_data, f"members_{self.project.id}_{self.users[2].id}")
+            self.assertIn("(5)", self.query.edit_message_text.call_args[0][0])
+
+            asyncio.run(bot.remove_member(self.query, self.db, self.owner, self.project.id, self.users[0].id))
+        self.assertNotIn(self.users[0].id, self.member_ids())
+
+        # Members see the list but cannot remove anyone
+        asyncio.run(bot.remove_member(self.query, self.db, self.users[1], self.project.id, self.users[2].id))
+        self.assertIn(self.users[2].id, self.member_ids())
+
+if __name__ == '__main__':
+    unittest.main()
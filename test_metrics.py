@@ -0,0 +1,87 @@
+import unittest
+import asyncio
+from db_testing import make_test_engine
+from sqlalchemy.orm import sessionmaker
+
+import metrics
+from metrics import Histogram, callback_route, instrument_engine, render_prometheus, timed_handler
+from models import User
+
+class TestMetrics(unittest.TestCase):
+    """Test handler instrumentation and metric rendering"""
+    
+    def setUp(self):
+        """Set up an instrumented in-memory database"""
+        self.engine = instrument_engine(make_test_engine())
+        self.SessionLocal = sessionmaker(bind=self.engine)
+        db = self.SessionLocal()
+        db.add_all([User(telegram_id=1, first_name="A"), User(telegram_id=2, first_name="B")])
+        db.commit()
+        db.close()
+    
+    def test_callback_route(self):
+        """Numeric ids and trailing arguments are stripped from callback data"""
+        self.assertEqual(callback_route("status_12_done"), "status")
+        self.assertEqual(callback_route("add_section_3"), "add_section")
+        self.assertEqual(callback_route("back_to_main"), "back_to_main")
+        self.assertEqual(callback_route(None), "unknown")
+    
+    def test_histogram_quantile(self):
+        """Quantiles resolve to the bucket upper bound"""
+        histogram = Histogram('test_seconds', 'test', 'handler', buckets=(0.1, 1.0))
+        for value in (0.05, 0.05, 0.5, 5.0):
+            histogram.observe('h', value)
+        self.assertEqual(histogram.count('h'), 4)
+        self.assertEqual(histogram.quantile('h', 0.5), 0.1)
+        self.assertEqual(histogram.quantile('h', 0.75), 1.0)
+        self.assertEqual(histogram.quantile('h', 0.99), float('inf'))
+    
+    def test_timed_handler_counts_queries(self):
+        """Statements and loaded rows are recorded per update"""
+        @timed_handler(name='test_handler')
+        async def handler(update, context):
+            db = self.SessionLocal()
+            try:
+                return db.query(User).all()
+            finally:
+                db.close()
+        
+        before = metrics.sql_statements.count('test_handler')
+        users = asyncio.run(handler(None, None))
+        
+        self.assertEqual(len(users), 2)
+        self.assertEqual(metrics.sql_statements.count('test_handler'), before + 1)
+        _, statements_total = metrics.sql_statements.series['test_handler']
+        _, rows_total = metrics.sql_rows.series['test_handler']
+        self.assertGreaterEqual(statements_total, 1)
+        self.assertGreaterEqual(rows_total, 2)
+        self.assertIn('bot_handler_latency_seconds_count{handler="test_handler"}', render_prometheus())
+    
+    def test_read_engine_queries_counted_once(self):
+        """A second engine queried from a worker thread is counted; instrumenting twice is a no-op"""
+        instrument_engine(self.engine)
+        read_engine = instrument_engine(instrument_engine(make_test_engine()))
+        ReadSession = sessionmaker(bind=read_engine)
+        
+        def read():
+            db = ReadSession()
+            try:
+                return db.query(User).count()
+            finally:
+                db.close()
+        
+        @timed_handler(name='read_handler')
+        async def handler(update, context):
+            db = self.SessionLocal()
+            try:
+                db.query(User).all()
+            finally:
+                db.close()
+            return await asyncio.to_thread(read)
+        
+        asyncio.run(handler(None, None))
+        _, statements_total = metrics.sql_statements.series['read_handler']
+        self.assertEqual(statements_total, 2)
+
+if __name__ == '__main__':
+    unittest.main()
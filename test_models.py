@@ -0,0 +1,92 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+from sqlalchemy import text
+
+import models
+from models import init_db, dispose_db, create_db_engine, insert_ignore, sqlite_maintenance, SessionLocal, ReadSessionLocal, User
+
+class TestDatabaseSetup(unittest.TestCase):
+    """Test lazy engine creation and configuration"""
+    
+    def tearDown(self):
+        """Drop the global engine between tests"""
+        dispose_db()
+    
+    def test_import_has_no_side_effects(self):
+        """Importing models neither creates an engine nor touches the disk"""
+        with tempfile.TemporaryDirectory() as cwd:
+            subprocess.run(
+                [sys.executable, '-c', 'import models; assert models.engine is None'],
+                cwd=cwd, check=True, env={**os.environ, 'PYTHONPATH': os.path.dirname(os.path.abspath(__file__))}
+            )
+            self.assertEqual(os.listdir(cwd), [])
+    
+    def test_init_db_binds_session(self):
+        """init_db creates tables once and binds SessionLocal"""
+        engine = init_db('sqlite://')
+        self.assertIs(init_db('sqlite:///ignored.db'), engine)
+        self.assertIs(models.engine, engine)
+        
+        db = SessionLocal()
+        db.add(User(telegram_id=1, first_name="A"))
+        db.commit()
+        self.assertEqual(db.query(User).count(), 1)
+        db.close()
+    
+    def test_pragmas_applied_on_connect(self):
+        """SQLite pragmas are executed for every new connection"""
+        engine = create_db_engine('sqlite://', pragmas={'foreign_keys': 'ON'})
+        with engine.connect() as conn:
+            self.assertEqual(conn.execute(text("PRAGMA foreign_keys")).scalar(), 1)
+    
+    def test_file_database_storage_profile(self):
+        """File-backed SQLite uses WAL and a separate read-only pool"""
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = init_db(f"sqlite:///{os.path.join(tmp, 'pm.db')}")
+            with engine.connect() as conn:
+                self.assertEqual(conn.execute(text("PRAGMA journal_mode")).scalar(), 'wal')
+                self.assertEqual(conn.execute(text("PRAGMA busy_timeout")).scalar(), 5000)
+                self.assertEqual(conn.execute(text("PRAGMA foreign_keys")).scalar(), 1)
+            self.assertIsNot(models.read_engine, engine)
+            
+            db = SessionLocal()
+            db.add(User(telegram_id=1, first_name="A"))
+            db.commit()
+            db.close()
+            
+            reader = ReadSessionLocal()
+            self.assertEqual(reader.query(User).count(), 1)
+            reader.add(User(telegram_id=2, first_name="B"))
+            with self.assertRaises(Exception):
+                reader.commit()
+            reader.close()
+            
+            self.assertEqual(sqlite_maintenance()[0], 0)
+            dispose_db()
+    
+    def test_insert_ignore_skips_conflicts(self):
+        """Inserting an existing telegram_id is a no-op instead of an IntegrityError"""
+        init_db('sqlite://')
+        db = SessionLocal()
+        for first_name in ("A", "B"):
+            db.execute(insert_ignore(db, User.__table__, ['telegram_id']).values(telegram_id=7, first_name=first_name))
+        db.commit()
+        
+        users = db.query(User).filter(User.telegram_id == 7).all()
+        self.assertEqual([user.first_name for user in users], ["A"])
+        db.close()
+    
+    def test_telegram_id_fits_64_bits(self):
+        """Telegram ids above 2**31 are stored intact"""
+        init_db('sqlite://')
+        db = SessionLocal()
+        db.add(User(telegram_id=7_000_000_000, first_name="Big"))
+        db.commit()
+        self.assertEqual(db.query(User).one().telegram_id, 7_000_000_000)
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
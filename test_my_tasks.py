@@ -0,0 +1,86 @@
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock
+from sqlalchemy.orm import sessionmaker
+
+import bot
+from db_testing import make_test_engine
+from models import User, Project, Section, Task
+
+class TestMyTasks(unittest.TestCase):
+    """Test the cross-project "my tasks" view and task assignment"""
+
+    def setUp(self):
+        """Set up two projects the member belongs to and one they left"""
+        self.engine = make_test_engine()
+        self.db = sessionmaker(bind=self.engine, expire_on_commit=False)()
+
+        self.owner = User(telegram_id=1, first_name="Owner")
+        self.member = User(telegram_id=2, first_name="Member")
+        self.stranger = User(telegram_id=3, first_name="Stranger")
+        self.db.add_all([self.owner, self.member, self.stranger])
+        self.db.flush()
+
+        sections = []
+        for name, members in (("Alpha", [self.member]), ("Beta", [self.member]), ("Gamma", [])):
+            project = Project(name=name, owner_id=self.owner.id, members=members)
+            section = Section(name="Main", project=project)
+            self.db.add_all([project, section])
+            sections.append(section)
+        self.db.flush()
+
+        self.tasks = []
+        for section in sections:
+            for status in ("todo", "in_progress", "done", "todo"):
+                task = Task(title=f"{section.project.name}-{status}", status=status, section_id=section.id,
+                            assigned_to_id=self.member.id)
+                self.db.add(task)
+                self.tasks.append(task)
+        self.db.commit()
+        self.query = Mock()
+        self.query.edit_message_text = AsyncMock()
+
+    def tearDown(self):
+        """Clean up"""
+        self.db.close()
+        self.engine.dispose()
+
+    def test_keyset_pages(self):
+        """Open tasks of accessible projects come in_progress first and page without overlap"""
+        first, cursor = bot.query_my_tasks(self.db, self.member.id, limit=4)
+        second, last_cursor = bot.query_my_tasks(self.db, self.member.id, after=cursor, limit=4)
+
+        self.assertEqual([status for _, status, _, _ in first], ["in_progress", "in_progress", "todo", "todo"])
+        self.assertEqual(len(second), 2)
+        self.assertIsNone(last_cursor)
+        self.assertEqual(len({task_id for task_id, _, _, _ in first + second}), 6)
+        titles = [title for _, _, title, _ in first + second]
+        self.assertFalse(any(title.startswith("Gamma") or title.endswith("done") for title in titles))
+
+    def test_render_next_page_button(self):
+        """The next page button carries the keyset cursor"""
+        tasks, cursor = bot.query_my_tasks(self.db, self.member.id, limit=1)
+        text, markup = bot.render_my_tasks(tasks, cursor)
+
+        self.assertIn("در حال انجام", text)
+        self.assertEqual(markup.inline_keyboard[-2][0].callback_data, f"mytasks_{cursor[1]}_in_progress")
+        self.assertEqual(bot.callback_route(markup.inline_keyboard[-2][0].callback_data), "mytasks")
+
+    def test_assign_and_unassign(self):
+        """Tasks can be assigned to project members only"""
+        task = self.tasks[0]
+        asyncio.run(bot.assign_task(self.query, self.db, self.owner, task.id, self.owner.id))
+        self.assertEqual(self.db.get(Task, task.id).assigned_to_id, self.owner.id)
+        self.assertIn("Owner", self.query.edit_message_text.call_args[0][0])
+
+        asyncio.run(bot.assign_task(self.query, self.db, self.owner, task.id, self.stranger.id))
+        self.assertEqual(self.query.edit_message_text.call_args[0][0], "❌ این کاربر عضو پروژه نیست.")
+
+        asyncio.run(bot.assign_task(self.query, self.db, self.owner, task.id, 0))
+        self.assertIsNone(self.db.get(Task, task.id).assigned_to_id)
+
+        asyncio.run(bot.assign_task(self.query, self.db, self.stranger, task.id, self.stranger.id))
+        self.assertEqual(self.query.edit_message_text.call_args[0][0], "دسترسی رد شد.")
+
+if __name__ == '__main__':
+    unittest.main()
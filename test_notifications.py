@@ -7,12 +7,13 @@ import asyncio
 from unittest.mock import Mock, AsyncMock
 from datetime import datetime
 from bot import message_handler
-from models import SessionLocal, User, Project, Section, Task
+from models import SessionLocal, init_db, User, Project, Section, Task
 
 async def test_notifications():
     """Test Persian notifications for adding sections, tasks, and completing tasks"""
     
     # Create test database session
+    init_db()
     db = SessionLocal()
     
     try:
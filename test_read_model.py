@@ -0,0 +1,113 @@
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+from sqlalchemy.orm import sessionmaker
+
+import bot
+from db_testing import make_test_engine
+from models import User, Project, Section, Task
+from read_model import ReadModel
+
+class TestReadModel(unittest.TestCase):
+    """Test the in-memory project read model"""
+    
+    def setUp(self):
+        """Set up a project with one section, two tasks and a member"""
+        self.engine = make_test_engine()
+        self.db = sessionmaker(bind=self.engine)()
+        
+        self.owner = User(telegram_id=1, first_name="Owner")
+        self.member = User(telegram_id=2, first_name="Member")
+        self.stranger = User(telegram_id=3, first_name="Stranger")
+        self.db.add_all([self.owner, self.member, self.stranger])
+        self.db.flush()
+        
+        self.project = Project(name="Alpha", owner_id=self.owner.id)
+        self.project.members.append(self.member)
+        self.db.add(self.project)
+        self.db.flush()
+        
+        self.section = Section(name="Backend", project_id=self.project.id)
+        self.db.add(self.section)
+        self.db.flush()
+        
+        self.task = Task(title="API", section_id=self.section.id, status="todo", assigned_to_id=self.member.id)
+        self.db.add_all([self.task, Task(title="DB", section_id=self.section.id, status="done")])
+        self.db.commit()
+        
+        self.model = ReadModel(enabled=True, max_records=100, ttl=60)
+    
+    def tearDown(self):
+        """Clean up"""
+        self.db.close()
+        self.engine.dispose()
+    
+    def test_lazy_load_and_hit(self):
+        """A project is loaded once and then served from memory"""
+        project = self.model.get_project(self.db, self.project.id)
+        
+        self.assertEqual(project.name, "Alpha")
+        self.assertEqual(project.owner_name, "Owner")
+        self.assertTrue(project.can_access(self.member.id))
+        self.assertFalse(project.can_access(self.stranger.id))
+        self.assertEqual(self.model.project_task_count(project), 2)
+        self.assertEqual(self.model.get_task(self.db, self.task.id).assigned_name, "Member")
+        self.assertEqual((self.model.misses, self.model.hits), (1, 1))
+    
+    def test_unknown_ids(self):
+        """Missing projects, sections and tasks resolve to None"""
+        self.assertIsNone(self.model.get_project(self.db, 999))
+        self.assertIsNone(self.model.get_section(self.db, 999))
+        self.assertIsNone(self.model.get_task(self.db, 999))
+    
+    def test_write_through(self):
+        """Write hooks update loaded projects in place"""
+        record = self.model.get_project(self.db, self.project.id)
+        
+        section = Section(name="Frontend", project_id=self.project.id)
+        self.db.add(section)
+        self.db.commit()
+        self.model.section_added(section)
+        task = Task(title="UI", section_id=section.id)
+        self.db.add(task)
+        self.db.commit()
+        self.model.task_added(task)
+        self.model.task_status_changed(self.task.id, "done")
+        self.model.member_added(self.project.id, self.stranger.id)
+        self.model.channel_set(self.project.id, "@alpha")
+        
+        self.assertEqual(len(record.section_ids), 2)
+        self.assertEqual(self.model.project_task_count(record), 3)
+        self.assertEqual(self.model.tasks[self.task.id].status, "done")
+        self.assertTrue(record.can_access(self.stranger.id))
+        self.assertEqual(record.channel_id, "@alpha")
+        self.assertEqual(self.model.misses, 1)
+    
+    def test_lru_eviction(self):
+        """The least recently used project is evicted over the record cap"""
+        other = Project(name="Beta", owner_id=self.owner.id)
+        self.db.add(other)
+        self.db.commit()
+        self.model.max_records = 4
+        
+        self.model.get_project(self.db, self.project.id)
+        self.model.get_project(self.db, other.id)
+        
+        self.assertEqual(list(self.model.projects), [other.id])
+        self.assertEqual(self.model.tasks, {})
+    
+    def test_show_task_from_read_model(self):
+        """show_task renders from the read model when it is enabled"""
+        query = Mock()
+        query.edit_message_text = AsyncMock()
+        with patch.object(bot, 'read_model', self.model):
+            asyncio.run(bot.show_task(query, self.db, self.member, self.task.id))
+            asyncio.run(bot.show_task(query, self.db, self.stranger, self.task.id))
+        
+        first, second = query.edit_message_text.call_args_list
+        self.assertIn("API", first[0][0])
+        self.assertIn("Member", first[0][0])
+        self.assertEqual(second[0][0], "دسترسی رد شد.")
+
+if __name__ == '__main__':
+    unittest.main()
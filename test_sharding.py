@@ -0,0 +1,48 @@
+import unittest
+import json
+import threading
+import urllib.request
+from urllib.error import HTTPError
+
+from sharding import ShardedReceiver, shard_for, shard_key
+
+class TestSharding(unittest.TestCase):
+    """Test update partitioning and the webhook receiver"""
+    
+    def test_shard_key_prefers_sender(self):
+        """Messages and button presses from one user map to the same key"""
+        message = {'update_id': 1, 'message': {'from': {'id': 42}, 'chat': {'id': 42}}}
+        callback = {'update_id': 2, 'callback_query': {'from': {'id': 42}, 'message': {'chat': {'id': 42}}}}
+        channel_post = {'update_id': 3, 'channel_post': {'chat': {'id': -100123}}}
+        
+        self.assertEqual(shard_key(message), 42)
+        self.assertEqual(shard_key(callback), 42)
+        self.assertEqual(shard_key(channel_post), -100123)
+        self.assertEqual(shard_key({'update_id': 9}), 9)
+        self.assertEqual(shard_for(message, 4), shard_for(callback, 4))
+    
+    def test_receiver_routes_to_worker_queue(self):
+        """Authenticated webhook posts land on the queue of their shard"""
+        receiver = ShardedReceiver(2, '127.0.0.1', 0, 'token', secret_token='s3cret')
+        threading.Thread(target=receiver.httpd.serve_forever, daemon=True).start()
+        port = receiver.httpd.server_address[1]
+        update = {'update_id': 1, 'message': {'from': {'id': 7}, 'chat': {'id': 7}, 'text': 'hi'}}
+        
+        def post(secret):
+            request = urllib.request.Request(
+                f'http://127.0.0.1:{port}/token', data=json.dumps(update).encode(),
+                headers={'Content-Type': 'application/json', 'X-Telegram-Bot-Api-Secret-Token': secret}
+            )
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        
+        try:
+            with self.assertRaises(HTTPError):
+                post('wrong')
+            self.assertEqual(post('s3cret'), 200)
+            self.assertEqual(receiver.queues[7 % 2].get(timeout=5), update)
+        finally:
+            receiver.httpd.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
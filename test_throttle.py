@@ -0,0 +1,92 @@
+import unittest
+import asyncio
+from datetime import datetime
+from unittest.mock import Mock, AsyncMock, patch
+from telegram import Chat, Message, Update, User as TelegramUser
+from telegram.ext import Application, ApplicationHandlerStop, MessageHandler, filters
+
+import throttle
+from fake_telegram import FakeTelegramServer
+from metrics import updates_dropped
+from throttle import UpdateThrottle, install_throttle, throttle_update
+from unit_of_work import install_unit_of_work
+
+class TestUpdateThrottle(unittest.TestCase):
+    """Test per-user token buckets and duplicate callback suppression"""
+
+    def setUp(self):
+        """Fresh throttle state for every test"""
+        throttle.update_throttle.clear()
+
+    def test_token_bucket(self):
+        """A burst is accepted, then updates pass at the refill rate"""
+        limiter = UpdateThrottle(rate=2, burst=3)
+        self.assertEqual([limiter.check(1, now=0.0) for _ in range(4)], [None, None, None, 'rate_limited'])
+        self.assertIsNone(limiter.check(2, now=0.0))
+        self.assertIsNone(limiter.check(1, now=0.5))
+        self.assertEqual(limiter.check(1, now=0.5), 'rate_limited')
+
+    def test_duplicate_callbacks(self):
+        """The same button within the window counts once and spends no token"""
+        limiter = UpdateThrottle(rate=1, burst=2, debounce_window=1.0)
+        self.assertIsNone(limiter.check(1, "status_5_1_done", now=0.0))
+        self.assertEqual(limiter.check(1, "status_5_1_done", now=0.3), 'duplicate')
+        self.assertIsNone(limiter.check(1, "task_5", now=0.4))
+        self.assertIsNone(limiter.check(1, "status_5_1_done", now=1.5))
+
+    def test_users_are_bounded(self):
+        """Least recently seen users are forgotten beyond max_users"""
+        limiter = UpdateThrottle(max_users=2)
+        for user_id in (1, 2, 1, 3):
+            limiter.check(user_id, now=0.0)
+        self.assertEqual(list(limiter.buckets), [1, 3])
+
+    def test_dropped_callback_is_answered(self):
+        """A dropped tap is answered, counted and stops further handler groups"""
+        update = Mock()
+        update.effective_user.id = 7
+        update.callback_query.data = "task_1"
+        update.callback_query.answer = AsyncMock()
+        before = updates_dropped.value('duplicate')
+
+        asyncio.run(throttle_update(update, None))
+        with self.assertRaises(ApplicationHandlerStop):
+            asyncio.run(throttle_update(update, None))
+        update.callback_query.answer.assert_awaited_with(None)
+        self.assertEqual(updates_dropped.value('duplicate'), before + 1)
+
+    def test_no_session_for_dropped_updates(self):
+        """Updates over the limit never reach the unit of work or the handlers; the sender is told"""
+        handled = []
+
+        async def handler(update, context):
+            handled.append(update.update_id)
+
+        async def scenario():
+            application = Application.builder().token("123:fake").base_url(f"{server.url}/bot").updater(None).build()
+            install_throttle(application)
+            install_unit_of_work(application)
+            application.add_handler(MessageHandler(filters.TEXT, handler))
+            sender = TelegramUser(9, "Spammer", False)
+            async with application:
+                for update_id in range(1, 5):
+                    message = Message(update_id, datetime.now(), Chat(9, 'private'), from_user=sender, text="hi")
+                    message.set_bot(application.bot)
+                    await application.process_update(Update(update_id, message=message))
+
+        server = FakeTelegramServer(port=0).start()
+        try:
+            with patch.object(throttle.update_throttle, 'rate', 0.001), \
+                    patch.object(throttle.update_throttle, 'burst', 2), \
+                    patch('unit_of_work.SessionLocal') as session_factory:
+                asyncio.run(scenario())
+        finally:
+            server.stop()
+
+        self.assertEqual(handled, [1, 2])
+        self.assertEqual(session_factory.call_count, 2)
+        replies = [message['text'] for (chat_id, _), message in server.messages.items() if chat_id == 9]
+        self.assertEqual(replies, [throttle.RATE_LIMITED_TEXT] * 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, AsyncMock, patch
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+import bot
+from db_testing import make_test_engine
+from deletion import delete_project, delete_section
+from models import User, Project, Section, Task, TaskRollup, create_missing_rollups
+from rollups import add_task_to_rollup, project_rollup, section_rollup
+
+class TestTimeTracking(unittest.TestCase):
+    """Test priorities, estimates, the time tracker and the incrementally kept rollups"""
+
+    def setUp(self):
+        """Set up a project with two sections and three tracked tasks"""
+        self.engine = make_test_engine()
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.db = self.Session()
+        bot.read_model.clear()
+        bot.dependency_graph.clear()
+
+        self.owner = User(telegram_id=1, first_name="Owner")
+        self.stranger = User(telegram_id=2, first_name="Stranger")
+        self.db.add_all([self.owner, self.stranger])
+        self.db.flush()
+        self.project = Project(name="Alpha", owner_id=self.owner.id)
+        self.backend = Section(name="Backend", project=self.project)
+        self.frontend = Section(name="Frontend", project=self.project)
+        self.db.add_all([self.project, self.backend, self.frontend])
+        self.db.flush()
+        self.api = Task(title="API", section_id=self.backend.id, priority='high', estimated_hours=4.0)
+        self.schema = Task(title="Schema", section_id=self.backend.id, estimated_hours=2.0, actual_hours=1.0)
+        self.ui = Task(title="UI", section_id=self.frontend.id, priority='low')
+        self.db.add_all([self.api, self.schema, self.ui])
+        for task in (self.api, self.schema, self.ui):
+            add_task_to_rollup(self.db, task, self.project.id)
+        self.db.commit()
+
+        self.query = Mock()
+        self.query.edit_message_text = AsyncMock()
+
+    def tearDown(self):
+        """Clean up"""
+        bot.read_model.clear()
+        bot.dependency_graph.clear()
+        self.db.close()
+        self.engine.dispose()
+
+    def aggregate(self):
+        """The project's rollup computed from scratch over every task"""
+        rows = self.db.query(
+            Task.priority, func.count(Task.id), func.coalesce(func.sum(Task.estimated_hours), 0.0),
+            func.sum(Task.actual_hours)
+        ).join(Section, Section.id == Task.section_id).filter(
+            Section.project_id == self.project.id
+        ).group_by(Task.priority)
+        return {priority: (tasks, estimated, actual) for priority, tasks, estimated, actual in rows}
+
+    def test_timer_start_and_stop(self):
+        """Stopping adds the elapsed hours to the task and its rollup; repeated taps change nothing"""
+        asyncio.run(bot.change_timer(self.query, self.db, self.owner, self.api.id, True))
+        self.assertIsNotNone(self.api.timer_started_at)
+        self.assertIn("timer_%d_stop" % self.api.id, str(self.query.edit_message_text.call_args))
+
+        started = self.api.timer_started_at
+        asyncio.run(bot.change_timer(self.query, self.db, self.owner, self.api.id, True))
+        self.assertEqual(self.api.timer_started_at, started)
+
+        self.api.timer_started_at = datetime.now(timezone.utc) - timedelta(minutes=90)
+        self.db.commit()
+        for _ in range(2):
+            asyncio.run(bot.change_timer(self.query, self.db, self.owner, self.api.id, False))
+
+        self.assertIsNone(self.api.timer_started_at)
+        self.assertAlmostEqual(self.api.actual_hours, 1.5, places=2)
+        self.assertAlmostEqual(project_rollup(self.db, self.project.id)['high'][2], 1.5, places=2)
+        self.assertIn("⏱ زمان صرف‌شده: 1.5 ساعت", self.query.edit_message_text.call_args[0][0])
+
+        asyncio.run(bot.change_timer(self.query, self.db, self.stranger, self.api.id, True))
+        self.assertEqual(self.query.edit_message_text.call_args[0][0], "دسترسی رد شد.")
+        self.assertIsNone(self.api.timer_started_at)
+
+    def test_writes_keep_rollups_consistent(self):
+        """Priority moves, estimates and new tasks leave the rollup equal to a fresh aggregate"""
+        asyncio.run(bot.change_priority(self.query, self.db, self.owner, self.schema.id, 'high'))
+        asyncio.run(bot.change_priority(self.query, self.db, self.owner, self.ui.id, 'medium'))
+
+        update = Mock()
+        update.effective_user = Mock(id=1, username=None, first_name="Owner")
+        update.message.reply_text = AsyncMock()
+        context = Mock()
+        with patch.object(bot, 'get_db', return_value=self.db), patch.object(bot, 'release_session'):
+            for action, text in ((f'set_estimate_{self.ui.id}', "۲٫۵"), (f'set_estimate_{self.api.id}', "3"),
+                                 (f'set_estimate_{self.ui.id}', "nan"), (f'add_task_{self.frontend.id}', "CSS")):
+                context.user_data = {'action': action}
+                update.message.text = text
+                asyncio.run(bot.message_handler(update, context))
+
+        self.assertEqual(self.ui.estimated_hours, 2.5)
+        self.assertIn("عدد", update.message.reply_text.call_args_list[2][0][0])
+        self.assertEqual(project_rollup(self.db, self.project.id), self.aggregate())
+        self.assertEqual(project_rollup(self.db, self.project.id)['high'], (2, 5.0, 1.0))
+        self.assertEqual(section_rollup(self.db, self.frontend.id), {'medium': (2, 2.5, 0.0)})
+
+    def test_show_project_reads_rollup(self):
+        """The project view shows per-priority and total estimate, actual and variance"""
+        asyncio.run(bot.show_project(self.query, self.db, self.owner, self.project.id))
+        text = self.query.edit_message_text.call_args[0][0]
+        self.assertIn("🔴 بالا (1 کار): 4 / 0 / -4.00", text)
+        self.assertIn("🟡 متوسط (1 کار): 2 / 1 / -1.00", text)
+        self.assertIn("Σ مجموع (3 کار): 6 / 1 / -5.00", text)
+
+        with patch.object(bot.read_model, 'enabled', True):
+            asyncio.run(bot.show_project(self.query, self.db, self.owner, self.project.id))
+        self.assertEqual(self.query.edit_message_text.call_args[0][0], text)
+
+    def test_backfill_and_deletion(self):
+        """Existing databases are backfilled once; deleting a section or project drops its rows"""
+        expected = self.aggregate()
+        self.db.query(TaskRollup).delete()
+        self.db.commit()
+        create_missing_rollups(self.engine)
+        create_missing_rollups(self.engine)
+        self.assertEqual(project_rollup(self.db, self.project.id), expected)
+
+        delete_section(self.frontend.id, session_factory=self.Session)
+        self.assertEqual(set(section_rollup(self.db, self.backend.id)), {'high', 'medium'})
+        self.assertEqual(section_rollup(self.db, self.frontend.id), {})
+        delete_project(self.project.id, session_factory=self.Session)
+        self.assertEqual(self.db.query(TaskRollup).count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import asyncio
+from unittest.mock import patch, AsyncMock
+from telegram.error import TimedOut
+from telegram.request import HTTPXRequest
+
+import transport
+from metrics import api_pool_timeouts, api_pool_wait
+from transport import TunedRequest
+
+URL = "https://api.telegram.org/botTOKEN/"
+
+class TestTunedRequest(unittest.TestCase):
+    """Test the pooled Bot API transport"""
+
+    def test_keepalive_limits(self):
+        """The client keeps pool_size idle connections alive for keepalive_expiry"""
+        request = TunedRequest('test-limits', 4, keepalive_expiry=42)
+        limits = request._client_kwargs['limits']
+        self.assertEqual((limits.max_connections, limits.max_keepalive_connections), (4, 4))
+        self.assertEqual(limits.keepalive_expiry, 42)
+
+    def test_http2_falls_back_without_h2(self):
+        """HTTP/2 is only requested when the h2 package can be imported"""
+        with patch('importlib.util.find_spec', return_value=None):
+            self.assertEqual(transport._http_version('2'), '1.1')
+        self.assertEqual(transport._http_version('1.1'), '1.1')
+
+    def test_method_timeout(self):
+        """Configured methods get their own read timeout unless the caller passes one"""
+        request = TunedRequest('test-method', 2, method_timeouts={'answerCallbackQuery': 1.5})
+        with patch.object(HTTPXRequest, 'do_request', new=AsyncMock(return_value=(200, b'{}'))) as sent:
+            asyncio.run(request.do_request(URL + "answerCallbackQuery", "POST"))
+            self.assertEqual(sent.call_args.kwargs['read_timeout'], 1.5)
+            asyncio.run(request.do_request(URL + "answerCallbackQuery", "POST", read_timeout=7))
+            self.assertEqual(sent.call_args.kwargs['read_timeout'], 7)
+
+    def test_pool_wait_and_timeout(self):
+        """A call waiting longer than pool_timeout for a connection fails and is counted"""
+        async def slow(*args, **kwargs):
+            await asyncio.sleep(0.2)
+            return 200, b'{}'
+
+        async def run():
+            request = TunedRequest('test-pool', 1, pool_timeout=0.05)
+            first = asyncio.create_task(request.do_request(URL + "sendMessage", "POST"))
+            await asyncio.sleep(0)
+            with self.assertRaises(TimedOut):
+                await request.do_request(URL + "sendMessage", "POST")
+            await first
+            # The slot is free again once the first call finished
+            await request.do_request(URL + "sendMessage", "POST", pool_timeout=1)
+
+        with patch.object(HTTPXRequest, 'do_request', new=slow):
+            asyncio.run(run())
+
+        self.assertEqual(api_pool_timeouts.value('test-pool'), 1)
+        self.assertEqual(api_pool_wait.count('test-pool'), 2)
+
+if __name__ == '__main__':
+    unittest.main()
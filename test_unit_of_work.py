@@ -0,0 +1,75 @@
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock
+from sqlalchemy import event
+
+import bot
+from models import init_db, dispose_db, SessionLocal, User, Project, Section, Task
+from unit_of_work import begin_unit_of_work, end_unit_of_work, current_session, get_session, release_session
+
+class TestUnitOfWork(unittest.TestCase):
+    """Test the request-scoped session middleware"""
+    
+    def setUp(self):
+        """Bind SessionLocal to a fresh in-memory database"""
+        self.engine = init_db('sqlite://')
+        db = SessionLocal()
+        self.owner = User(telegram_id=1, first_name="Owner")
+        db.add(self.owner)
+        db.flush()
+        project = Project(name="Alpha", owner_id=self.owner.id)
+        db.add(project)
+        db.flush()
+        section = Section(name="Backend", project_id=project.id)
+        db.add(section)
+        db.flush()
+        self.task = Task(title="API", section_id=section.id, status="todo")
+        db.add(self.task)
+        db.commit()
+        db.close()
+    
+    def tearDown(self):
+        """Drop the global engine"""
+        dispose_db()
+    
+    def test_session_shared_within_update(self):
+        """Nested get_session calls share one session that release does not close"""
+        async def scenario():
+            await begin_unit_of_work(None, None)
+            session = get_session()
+            self.assertIs(get_session(), session)
+            release_session(session)
+            self.assertIs(current_session(), session)
+            
+            session.add(User(telegram_id=2, first_name="New"))
+            await end_unit_of_work(None, None)
+            self.assertIsNone(current_session())
+        
+        asyncio.run(scenario())
+        db = SessionLocal()
+        self.assertEqual(db.query(User).count(), 2)
+        db.close()
+    
+    def test_status_update_has_no_refresh_queries(self):
+        """show_task after update_task_status is served from the identity map"""
+        statements = []
+        event.listen(self.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        query = Mock()
+        query.edit_message_text = AsyncMock()
+        
+        async def scenario():
+            await begin_unit_of_work(None, None)
+            db = get_session()
+            user = db.get(User, self.owner.id)
+            await bot.update_task_status(query, db, user, self.task.id, "in_progress")
+            await end_unit_of_work(None, None)
+        
+        asyncio.run(scenario())
+        
+        selects_after_update = [s for s in statements[statements.index(
+            next(s for s in statements if s.startswith('UPDATE'))):] if s.startswith('SELECT')]
+        self.assertEqual(selects_after_update, [])
+        self.assertIn("API", query.edit_message_text.call_args[0][0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from telegram import Update
+from telegram.ext import Application, ApplicationHandlerStop, TypeHandler
+from metrics import updates_dropped
+from unit_of_work import BEGIN_GROUP
+
+logger = logging.getLogger(__name__)
+
+# Runs before the unit of work opens a session, so dropped updates cost no database work
+THROTTLE_GROUP = BEGIN_GROUP - 1
+
+# Sustained updates per second per user, and how many may arrive at once; 0 disables throttling
+THROTTLE_RATE = float(os.getenv('THROTTLE_RATE', '2'))
+THROTTLE_BURST = int(os.getenv('THROTTLE_BURST', '8'))
+# Repeated taps on the same button by the same user within this many seconds count once
+DEBOUNCE_WINDOW = float(os.getenv('DEBOUNCE_WINDOW', '1.0'))
+# Users whose buckets are kept; the least recently seen are forgotten first
+THROTTLE_MAX_USERS = int(os.getenv('THROTTLE_MAX_USERS', '10000'))
+
+RATE_LIMITED_TEXT = "⏳ درخواست‌ها زیاد است؛ لطفاً چند لحظه صبر کنید."
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst; each accepted update takes one"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at', 'last_data', 'last_at')
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = now
+        # Last accepted callback data, for debouncing
+        self.last_data = None
+        self.last_at = 0.0
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class UpdateThrottle:
+    """Per-user token buckets plus duplicate callback suppression"""
+
+    def __init__(self, rate: float = THROTTLE_RATE, burst: int = THROTTLE_BURST,
+                 debounce_window: float = DEBOUNCE_WINDOW, max_users: int = THROTTLE_MAX_USERS):
+        self.rate = rate
+        self.burst = burst
+        self.debounce_window = debounce_window
+        self.max_users = max_users
+        self.buckets = OrderedDict()
+
+    def check(self, user_id: int, callback_data: str = None, now: float = None):
+        """None when the update may run, otherwise 'duplicate' or 'rate_limited'"""
+        now = time.monotonic() if now is None else now
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            bucket = self.buckets[user_id] = TokenBucket(self.rate, self.burst, now)
+            if len(self.buckets) > self.max_users:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(user_id)
+
+        # Duplicates are checked first so a double tap does not also spend a token
+        if (callback_data is not None and callback_data == bucket.last_data
+                and now - bucket.last_at < self.debounce_window):
+            return 'duplicate'
+        if not bucket.take(now):
+            return 'rate_limited'
+        if callback_data is not None:
+            bucket.last_data = callback_data
+            bucket.last_at = now
+        return None
+
+    def clear(self):
+        self.buckets.clear()
+
+update_throttle = UpdateThrottle()
+
+async def throttle_update(update: Update, context):
+    """Stop duplicate or over-rate updates before any other handler group runs"""
+    user = update.effective_user
+    if user is None:
+        return
+    query = update.callback_query
+    reason = update_throttle.check(user.id, query.data if query else None)
+    if reason is None:
+        return
+
+    updates_dropped.inc(reason)
+    logger.debug("Dropped update %s from user %s: %s", update.update_id, user.id, reason,
+                 extra={'event': 'update_dropped'})
+    if query:
+        # Every tap has its own query id; answer it so the client's spinner stops
+        try:
+            await query.answer(RATE_LIMITED_TEXT if reason == 'rate_limited' else None)
+        except Exception as e:
+            logger.error(f"Failed to answer dropped callback query: {e}")
+    elif update.message:
+        # Typed input is not kept; tell the user so they resend it (a pending action stays set)
+        try:
+            await update.message.reply_text(RATE_LIMITED_TEXT)
+        except Exception as e:
+            logger.error(f"Failed to reply to dropped message: {e}")
+    raise ApplicationHandlerStop
+
+def install_throttle(application: Application):
+    """Register throttle_update ahead of the unit of work; no-op when THROTTLE_RATE is 0"""
+    if update_throttle.rate > 0:
+        application.add_handler(TypeHandler(Update, throttle_update), group=THROTTLE_GROUP)
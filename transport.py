@@ -0,0 +1,98 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+import httpx
+from telegram.error import TimedOut
+from telegram.request import BaseRequest
+from metrics import InstrumentedRequest, api_pool_timeouts, api_pool_wait
+
+logger = logging.getLogger(__name__)
+
+# Connections for outbound calls (sendMessage, editMessageText, ...); getUpdates has its own pool
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '32'))
+TELEGRAM_POLL_POOL_SIZE = int(os.getenv('TELEGRAM_POLL_POOL_SIZE', '1'))
+# Idle connections are kept open this many seconds for reuse (httpx default: 5)
+TELEGRAM_KEEPALIVE_EXPIRY = float(os.getenv('TELEGRAM_KEEPALIVE_EXPIRY', '60'))
+# "2" multiplexes calls over fewer connections; needs h2 (pip install "python-telegram-bot[http2]")
+TELEGRAM_HTTP_VERSION = os.getenv('TELEGRAM_HTTP_VERSION', '1.1')
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', '5'))
+TELEGRAM_READ_TIMEOUT = float(os.getenv('TELEGRAM_READ_TIMEOUT', '10'))
+TELEGRAM_WRITE_TIMEOUT = float(os.getenv('TELEGRAM_WRITE_TIMEOUT', '10'))
+# Seconds a call may wait for a free connection before failing with TimedOut
+TELEGRAM_POOL_TIMEOUT = float(os.getenv('TELEGRAM_POOL_TIMEOUT', '5'))
+
+# Read timeouts of individual API methods when the caller does not pass one; callback
+# answers are useless once the client's spinner has given up. Override single values
+# with TELEGRAM_METHOD_TIMEOUTS="method=seconds,...".
+METHOD_TIMEOUTS = {'answerCallbackQuery': 3.0, 'getChat': 5.0}
+for item in os.getenv('TELEGRAM_METHOD_TIMEOUTS', '').split(','):
+    if '=' in item:
+        name, value = item.split('=', 1)
+        METHOD_TIMEOUTS[name.strip()] = float(value)
+
+def _http_version(requested: str) -> str:
+    """Requested HTTP version, falling back to 1.1 when h2 is not installed"""
+    if requested != '1.1' and importlib.util.find_spec('h2') is None:
+        logger.warning(f"HTTP/{requested} needs the h2 package, using HTTP/1.1")
+        return '1.1'
+    return requested
+
+class TunedRequest(InstrumentedRequest):
+    """InstrumentedRequest with keep-alive, per-method timeouts and a measured connection pool
+
+    Calls acquire one of pool_size slots before reaching httpx, so the time spent waiting
+    for a connection is observable (telegram_api_pool_wait_seconds) and pool_timeout
+    still bounds it.
+    """
+
+    def __init__(self, pool: str, pool_size: int, keepalive_expiry: float = TELEGRAM_KEEPALIVE_EXPIRY,
+                 http_version: str = TELEGRAM_HTTP_VERSION, connect_timeout: float = TELEGRAM_CONNECT_TIMEOUT,
+                 read_timeout: float = TELEGRAM_READ_TIMEOUT, write_timeout: float = TELEGRAM_WRITE_TIMEOUT,
+                 pool_timeout: float = TELEGRAM_POOL_TIMEOUT, method_timeouts: dict = None):
+        super().__init__(
+            connection_pool_size=pool_size, http_version=_http_version(http_version),
+            connect_timeout=connect_timeout, read_timeout=read_timeout, write_timeout=write_timeout,
+            pool_timeout=pool_timeout
+        )
+        # HTTPXRequest sets no keepalive_expiry; rebuild the (not yet opened) client with it
+        self._client_kwargs['limits'] = httpx.Limits(
+            max_connections=pool_size, max_keepalive_connections=pool_size, keepalive_expiry=keepalive_expiry
+        )
+        self._client = self._build_client()
+        self.pool = pool
+        self.pool_timeout = pool_timeout
+        self.method_timeouts = METHOD_TIMEOUTS if method_timeouts is None else method_timeouts
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        api_method = url.rsplit('/', 1)[-1]
+        if read_timeout is BaseRequest.DEFAULT_NONE and api_method in self.method_timeouts:
+            read_timeout = self.method_timeouts[api_method]
+        wait_limit = self.pool_timeout if pool_timeout is BaseRequest.DEFAULT_NONE else pool_timeout
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), wait_limit)
+        except asyncio.TimeoutError:
+            api_pool_timeouts.inc(self.pool)
+            raise TimedOut(f"No free connection in the {self.pool} pool within {wait_limit}s") from None
+        api_pool_wait.observe(self.pool, time.perf_counter() - start)
+        try:
+            return await super().do_request(
+                url, method, request_data=request_data, read_timeout=read_timeout, write_timeout=write_timeout,
+                connect_timeout=connect_timeout, pool_timeout=pool_timeout
+            )
+        finally:
+            self._slots.release()
+
+def send_request() -> TunedRequest:
+    """Request object for every Bot API call except getUpdates"""
+    return TunedRequest('send', TELEGRAM_POOL_SIZE)
+
+def poll_request() -> TunedRequest:
+    """Request object for getUpdates long polling, kept apart so sends never queue behind it"""
+    return TunedRequest('poll', TELEGRAM_POLL_POOL_SIZE)
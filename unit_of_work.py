@@ -0,0 +1,59 @@
+import logging
+from contextvars import ContextVar
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+from models import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Handler groups around the regular handlers (group 0)
+BEGIN_GROUP = -1
+END_GROUP = 1
+
+_current_session = ContextVar('current_session', default=None)
+
+def current_session():
+    """Session of the update being processed, or None outside a unit of work"""
+    return _current_session.get()
+
+def get_session():
+    """Request-scoped session when a unit of work is active, otherwise a new session"""
+    return _current_session.get() or SessionLocal()
+
+def release_session(session):
+    """Close a session from get_session() unless the unit of work owns it"""
+    if session is not _current_session.get():
+        session.close()
+
+def _finish(session, commit: bool):
+    try:
+        if commit:
+            session.commit()
+        else:
+            session.rollback()
+    except Exception as e:
+        logger.error(f"Error finishing unit of work: {e}")
+        session.rollback()
+    finally:
+        session.close()
+
+async def begin_unit_of_work(update: Update, context):
+    """Open one session for the whole update; nested calls share its identity map"""
+    leftover = _current_session.get()
+    if leftover is not None:
+        # A previous update stopped before END_GROUP ran (ApplicationHandlerStop)
+        _finish(leftover, commit=False)
+    _current_session.set(SessionLocal())
+
+async def end_unit_of_work(update: Update, context):
+    """Commit whatever the handlers left pending and close the session"""
+    session = _current_session.get()
+    if session is None:
+        return
+    _current_session.set(None)
+    _finish(session, commit=True)
+
+def install_unit_of_work(application: Application):
+    """Wrap every update in begin/end handlers registered around the handler group 0"""
+    application.add_handler(TypeHandler(Update, begin_unit_of_work), group=BEGIN_GROUP)
+    application.add_handler(TypeHandler(Update, end_unit_of_work), group=END_GROUP)